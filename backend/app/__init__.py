@@ -13,6 +13,8 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from .utils.db_pool import engine_options, instrument_pool
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
     db.init_app(app)
     jwt.init_app(app)
     ma.init_app(app)
@@ -32,6 +34,20 @@ def create_app(config_class=Config):
         return "NeoHealth Backend is Live! 🚀"
 
     with app.app_context():
+        instrument_pool(db.engine)
+
+        from .utils import instrumentation
+        instrumentation.init_app(app, db.engine)
+
+        from .utils.process_metrics import register_gauges
+        register_gauges()
+
+        from .utils.metrics import init_multiprocess
+        init_multiprocess(app.config.get('METRICS_MULTIPROC_DIR'))
+
+        from .utils import query_guard
+        query_guard.init_app(app, db.engine)
+
         from .routes import auth, health, predictions, admin, datasets
         app.register_blueprint(auth.bp, url_prefix='/api/auth')
         app.register_blueprint(health.bp, url_prefix='/api/health')
@@ -41,6 +57,9 @@ def create_app(config_class=Config):
         
         from .routes import chat
         app.register_blueprint(chat.bp, url_prefix='/api/chat')
+
+        from .routes import metrics
+        app.register_blueprint(metrics.bp)
         
         # --- AUTO DB FIX: Add missing columns if they don't exist ---
         try:
@@ -49,6 +68,8 @@ def create_app(config_class=Config):
                 print(" * Checking for missing columns...")
                 conn.execute(text("ALTER TABLE health_records ADD COLUMN IF NOT EXISTS daily_note TEXT"))
                 conn.execute(text("ALTER TABLE health_records ADD COLUMN IF NOT EXISTS sentiment_score FLOAT"))
+                conn.execute(text("ALTER TABLE health_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pred_created_at ON predictions (created_at)"))
                 conn.commit()
                 print(" * Database columns verified/added.")
         except Exception as db_err:
@@ -56,4 +77,30 @@ def create_app(config_class=Config):
 
         db.create_all()
 
+        # Upserts (ON CONFLICT) need unique (user_id, date) indexes on existing databases too
+        from .utils.bulk import ensure_unique_index
+        ensure_unique_index('predictions', 'idx_pred_user_date', ['user_id', 'date'])
+        ensure_unique_index('health_records', 'idx_health_user_date', ['user_id', 'date'])
+
+        from .services.ml_service import MLService
+        MLService.init_app(app)
+
+        from .services.analysis_service import DataAnalysisService
+        DataAnalysisService.init_app(app)
+
+        from .services.stats_service import StatsService
+        StatsService.init_app(app)
+
+        from .services.llm_service import LLMService
+        LLMService.init_app(app)
+
+        from .services.llm_cache import LLMCache
+        LLMCache.init_app(app)
+
+        from .services.history_context import HistoryContextService
+        HistoryContextService.init_app(app)
+
+        from .services.prediction_pipeline import PredictionPipeline
+        PredictionPipeline.init_app(app)
+
     return app
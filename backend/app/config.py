@@ -11,8 +11,78 @@ class Config:
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace("postgres://", "postgresql://", 1)
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool (PostgreSQL); create_app turns these into SQLALCHEMY_ENGINE_OPTIONS
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    # Recycle connections older than this (seconds) and test each checkout, so Postgres/PgBouncer restarts don't surface as errors
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Server-side statement_timeout in ms (0 = none); sent as a startup option, which PgBouncer must allow (ignore_startup_parameters)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # Per-request SQL accounting (utils/query_guard.py): 'off', 'warn' or 'strict' (tests)
+    QUERY_GUARD = os.environ.get('QUERY_GUARD', 'off')
+    # Log statements slower than this with their parameters (0 disables)
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 500))
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-456')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
     
     # ML Models Path
     ML_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_models')
+    # Seconds between checks for retrained artifacts (0 disables hot reload)
+    ML_RELOAD_INTERVAL = float(os.environ.get('ML_RELOAD_INTERVAL', 5))
+    # 'auto' loads the native bundle (model.ubj) when the manifest lists one; 'joblib' forces the pickles
+    ML_MODEL_FORMAT = os.environ.get('ML_MODEL_FORMAT', 'auto')
+    # Opt-in micro-batching of concurrent predictions: collect for up to this many ms / rows (0 disables)
+    ML_BATCH_WINDOW_MS = float(os.environ.get('ML_BATCH_WINDOW_MS', 0))
+    ML_BATCH_MAX_ROWS = int(os.environ.get('ML_BATCH_MAX_ROWS', 64))
+
+    # Estimated rows between a user's latest record and today (see services/gap_forecaster.py)
+    GAP_ESTIMATOR = os.environ.get('GAP_ESTIMATOR', 'mean_reverting')
+    GAP_FILL_MAX_DAYS = int(os.environ.get('GAP_FILL_MAX_DAYS', 90))
+    GAP_FILL_MODE = os.environ.get('GAP_FILL_MODE', 'cap') # 'cap' drops older days, 'summarize' makes weekly rows
+
+    # Score predictions when records are saved: 'off', 'async' (thread pool) or 'sync' (inline, for tests)
+    PREDICTION_PIPELINE = os.environ.get('PREDICTION_PIPELINE', 'off')
+    PREDICTION_PIPELINE_WORKERS = int(os.environ.get('PREDICTION_PIPELINE_WORKERS', 2))
+
+    # Seconds between background reconciliations of the /api/datasets/summary aggregates
+    SUMMARY_REFRESH_INTERVAL = float(os.environ.get('SUMMARY_REFRESH_INTERVAL', 600))
+
+    # Admin stats: response cache TTL and how often exact COUNT(*)s are retaken (seconds)
+    ADMIN_STATS_TTL = float(os.environ.get('ADMIN_STATS_TTL', 30))
+    ADMIN_STATS_EXACT_INTERVAL = float(os.environ.get('ADMIN_STATS_EXACT_INTERVAL', 300))
+
+    # Chat LLM calls (see services/llm_service.py). LLM_PROVIDER forces one provider, e.g. 'fake' for local load tests
+    LLM_PROVIDER = os.environ.get('LLM_PROVIDER')
+    LLM_FAKE_DELAY = float(os.environ.get('LLM_FAKE_DELAY', 0))
+    LLM_MAX_WORKERS = int(os.environ.get('LLM_MAX_WORKERS', 8))
+    # Concurrent in-flight calls per provider; extra requests wait LLM_QUEUE_TIMEOUT seconds, then get a 503
+    LLM_CONCURRENCY_GEMINI = int(os.environ.get('LLM_CONCURRENCY_GEMINI', 4))
+    LLM_CONCURRENCY_GROQ = int(os.environ.get('LLM_CONCURRENCY_GROQ', 4))
+    LLM_CONCURRENCY_DEFAULT = int(os.environ.get('LLM_CONCURRENCY_DEFAULT', 4))
+    LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', 1))
+    LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 30))
+    # Circuit breaker: open after N consecutive failures or this error rate over the last 50 calls
+    LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+    LLM_BREAKER_ERROR_RATE = float(os.environ.get('LLM_BREAKER_ERROR_RATE', 0.5))
+    LLM_BREAKER_COOLDOWN = float(os.environ.get('LLM_BREAKER_COOLDOWN', 30))
+    # Start the next provider once the first one passes its p95 latency (clamped to these bounds)
+    LLM_HEDGING = os.environ.get('LLM_HEDGING', 'true').lower() == 'true'
+    LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', 0.5))
+    LLM_HEDGE_MAX_DELAY = float(os.environ.get('LLM_HEDGE_MAX_DELAY', 5))
+
+    # Chat answer cache: 'memory' (per process), 'redis' (shared, needs the redis package) or 'off'
+    LLM_CACHE_BACKEND = os.environ.get('LLM_CACHE_BACKEND', 'memory')
+    LLM_CACHE_URL = os.environ.get('LLM_CACHE_URL', 'redis://localhost:6379/0')
+    LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 3600))
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1000))
+
+    # Rendered 7-day chat history per user; writes in this process invalidate it immediately
+    HISTORY_CONTEXT_TTL = float(os.environ.get('HISTORY_CONTEXT_TTL', 300))
+    HISTORY_CONTEXT_MAX_USERS = int(os.environ.get('HISTORY_CONTEXT_MAX_USERS', 5000))
+
+    # Bearer token required by GET /metrics when set
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Shared directory for merging metrics across worker processes (gunicorn.conf.py sets it); unset = per process
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
@@ -20,6 +20,12 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+# HealthRecord metric columns by type; METRIC_FIELDS is what write notifications carry
+NUMERIC_FIELDS = ['lh', 'estrogen', 'pdg', 'overall_score', 'deep_sleep_in_minutes',
+                  'avg_resting_heart_rate', 'stress_score', 'daily_steps']
+INTEGER_FIELDS = ['cramps', 'fatigue', 'moodswing', 'stress', 'bloating', 'sleepissue']
+METRIC_FIELDS = NUMERIC_FIELDS + INTEGER_FIELDS
+
 class HealthRecord(db.Model):
     __tablename__ = 'health_records'
     id = db.Column(db.Integer, primary_key=True)
@@ -50,9 +56,10 @@ class HealthRecord(db.Model):
     sentiment_score = db.Column(db.Float) # New field for sentiment analysis result
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # Drives the /records ETag
 
     __table_args__ = (
-        db.Index('idx_health_user_date', 'user_id', 'date'),
+        db.Index('idx_health_user_date', 'user_id', 'date', unique=True),
     )
 
 class Prediction(db.Model):
@@ -66,5 +73,6 @@ class Prediction(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     __table_args__ = (
-        db.Index('idx_pred_user_date', 'user_id', 'date'),
+        db.Index('idx_pred_user_date', 'user_id', 'date', unique=True),
+        db.Index('idx_pred_created_at', 'created_at'), # admin recent_logs
     )
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from ..models import User, db
+from ..services.history_context import HistoryContextService
+from ..signals import user_registered
 
 bp = Blueprint('auth', __name__)
 
@@ -39,6 +41,7 @@ def register():
     
     db.session.add(user)
     db.session.commit()
+    user_registered.send(current_app._get_current_object(), user_id=user.id)
     
     return jsonify({"msg": "User created successfully"}), 201
 
@@ -95,6 +98,8 @@ def update_profile():
         user.set_password(data['password'])
         
     db.session.commit()
+    # The chat prompt shows the username
+    HistoryContextService.invalidate(user_id)
     
     return jsonify({"msg": "Profile updated successfully", "user": {"id": user.id, "username": user.username, "email": user.email, "mobile": user.mobile}}), 200
 
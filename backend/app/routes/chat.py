@@ -1,24 +1,13 @@
-import os
-import google.generativeai as genai
-import requests
 import json
-from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import User, HealthRecord, Prediction, db
-from groq import Groq
+from ..services.llm_service import LLMService, LLMError, ProviderBusy
+from ..services.llm_router import ProviderUnavailable
+from ..services.llm_cache import LLMCache
+from ..services.history_context import HistoryContextService
 
 bp = Blueprint('chat', __name__)
 
-# Configure Gemini
-GENAI_API_KEY = os.environ.get('GEMINI_API_KEY')
-if GENAI_API_KEY:
-    genai.configure(api_key=GENAI_API_KEY)
-
-# Configure Groq
-GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
-groq_client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
-
 SYSTEM_INSTRUCTION_BASE = """You are 'NeoHealth AI', a user-friendly health insight assistant.
 
 YOUR GOAL: Analyze daily health data and generate simple, non-medical, easy-to-understand insights.
@@ -50,82 +39,23 @@ EDGE CASES:
 FINAL GOAL: Make the user feel understood, in control, and motivated.
 """
 
-def get_user_history_context(user_id):
-    """Fetches last 7 days of health records to build a history context."""
+def get_user_context(user_id):
+    """Name and last 7 days of health records for the prompt (cached per user, see HistoryContextService)."""
     try:
-        seven_days_ago = datetime.utcnow().date() - timedelta(days=7)
-        records = HealthRecord.query.filter(
-            HealthRecord.user_id == user_id, 
-            HealthRecord.date >= seven_days_ago
-        ).order_by(HealthRecord.date.asc()).all()
-
-        if not records:
-            return "No specific health records found for the past week."
-
-        history_lines = []
-        for r in records:
-            date_str = r.date.strftime('%Y-%m-%d')
-            # Format some key metrics
-            sleep = f"{r.deep_sleep_in_minutes}m deep sleep" if r.deep_sleep_in_minutes else "Sleep N/A"
-            stress = f"Stress lvl {r.stress}/4" if r.stress is not None else "Stress N/A"
-            mood = f"Mood {r.moodswing}/4" if r.moodswing is not None else "Mood N/A"
-            symptoms = []
-            if r.cramps and r.cramps > 0: symptoms.append(f"Cramps {r.cramps}/4")
-            if r.fatigue and r.fatigue > 0: symptoms.append(f"Fatigue {r.fatigue}/4")
-            if r.bloating and r.bloating > 0: symptoms.append(f"Bloating {r.bloating}/4")
-            
-            symptoms_str = ", ".join(symptoms) if symptoms else "No major symptoms"
-            
-            history_lines.append(f"- {date_str}: {sleep}, {stress}, {mood}. Symptoms: {symptoms_str}")
-        
-        return "\n".join(history_lines)
+        return HistoryContextService.get(user_id)
     except Exception as e:
         print(f"Error fetching history: {e}")
-        return "Could not retrieve history due to database error."
+        # No version: the answer to a degraded prompt is not cached
+        return {"name": "Friend", "history": "Could not retrieve history due to database error.", "version": None}
 
-def query_groq(prompt, system_instruction):
-    """Queries Groq API for Llama 3."""
-    if not groq_client:
-        return "Groq API Key is missing. Please configure GROQ_API_KEY in backend .env file."
-        
-    try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_instruction,
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.1-8b-instant",
-            temperature=0.7,
-            max_tokens=1024,
-            top_p=1,
-            stream=False,
-            stop=None,
-        )
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        return f"Groq API Error: {str(e)}"
-
-@bp.route('/message', methods=['POST'])
-@jwt_required()
-def chat_message():
-    user_id = int(get_jwt_identity())
-    data = request.get_json()
+def build_prompt(user_context, data):
+    """Builds the full RAG prompt for a chat request body."""
     user_message = data.get('message', '')
     context_data = data.get('context', {})
-    model_preference = data.get('model', 'gemini') # 'gemini' or 'llama' (which now means Groq Llama)
 
-    # 1. Fetch User Info
-    user = User.query.get(user_id)
-    user_name = user.username if user else "Friend"
-
-    # 2. Build RAG Context
-    history_context = get_user_history_context(user_id)
+    # 1. User Info and 2. RAG Context (both from the per-user cache)
+    user_name = user_context['name']
+    history_context = user_context['history']
     
     # Determine language
     lang_code = context_data.get('language', 'en')
@@ -135,7 +65,7 @@ def chat_message():
     # 3. Construct the Full Prompt
     user_mode = context_data.get('mode', 'normal') # Default to normal
     
-    full_prompt = f"""
+    return f"""
     TARGET LANGUAGE: {target_lang} (Reply in this language)
     USER MODE: {user_mode} (Strictly follow output format for this mode)
 
@@ -155,35 +85,132 @@ def chat_message():
     Analyze the data based on the rules provided in system instructions.
     """
 
-    # 4. Route to Model
+def missing_keys_message(model_preference):
     if model_preference == 'llama':
-        # Use Groq for Llama 3
-        response_text = query_groq(full_prompt, SYSTEM_INSTRUCTION_BASE)
-        return jsonify({"response": response_text}), 200
-    
-    # Default: Gemini
-    if not GENAI_API_KEY:
-        # Fallback to Groq if Gemini key is missing
-        if groq_client:
-             response_text = query_groq(full_prompt, SYSTEM_INSTRUCTION_BASE)
-             return jsonify({"response": response_text + " (Fallback to Groq)"}), 200
+        return "Groq API Key is missing. Please configure GROQ_API_KEY in backend .env file."
+    return "Cloud AI API Keys missing. Please configure GEMINI_API_KEY or GROQ_API_KEY."
 
-        return jsonify({"response": "Cloud AI API Keys missing. Please configure GEMINI_API_KEY or GROQ_API_KEY."}), 200
+def busy_response():
+    response = jsonify({"msg": "The AI assistant is busy right now. Please try again in a moment."})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
 
-    try:
-        # Use existing configured Gemini
-        model = genai.GenerativeModel('gemini-flash-latest', system_instruction=SYSTEM_INSTRUCTION_BASE)
-        response = model.generate_content(full_prompt)
-        return jsonify({"response": response.text}), 200
+@bp.route('/message', methods=['POST'])
+@jwt_required()
+def chat_message():
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    model_preference = data.get('model', 'gemini') # 'gemini' or 'llama' (which now means Groq Llama)
+
+    # Same question against unchanged data: answer from the cache
+    user_context = get_user_context(user_id)
+    cache_key = LLMCache.key(user_id, data, user_context['version'])
+    cached = LLMCache.get(cache_key)
+    if cached:
+        return jsonify({"response": cached['response']}), 200
 
+    full_prompt = build_prompt(user_context, data)
+
+    # 4. Route to Model: breaker-aware, hedged across the candidate providers
+    candidates = LLMService.candidates(model_preference)
+    if not candidates:
+        return jsonify({"response": missing_keys_message(model_preference)}), 200
+
+    try:
+        provider, response_text = LLMService.complete(candidates, full_prompt, SYSTEM_INSTRUCTION_BASE)
+    except (ProviderBusy, ProviderUnavailable):
+        return busy_response()
     except Exception as e:
-        error_str = str(e)
-        print(f"Gemini API Error: {error_str}")
-        
-        # Fallback to Groq on error
-        if groq_client:
-             response_text = query_groq(full_prompt, SYSTEM_INSTRUCTION_BASE)
-             return jsonify({"response": response_text}), 200
-             
+        if model_preference == 'llama':
+            return jsonify({"response": f"Groq API Error: {e}"}), 200
         msg = "I'm having trouble connecting to the Cloud AI."
         return jsonify({"response": msg + " Error details: " + str(e)}), 200
+
+    if provider.name == 'groq' and model_preference != 'llama' and not LLMService.providers['gemini'].available():
+        response_text += " (Fallback to Groq)"
+    LLMCache.set(cache_key, user_id, {"response": response_text, "provider": provider.name})
+    return jsonify({"response": response_text}), 200
+
+def sse(payload, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+def sse_response(events):
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # don't let proxies buffer the stream
+    return response
+
+@bp.route('/stream', methods=['POST'])
+@jwt_required()
+def chat_stream():
+    """
+    Same request body as /message; the answer is sent as Server-Sent Events
+    while the provider generates it:
+        data: {"token": "..."}          (repeated)
+        event: done   data: {"provider": "...", "cached": bool}
+        event: error  data: {"msg": "..."}
+    Falls back to the next provider only if the first one fails before
+    sending any token. A cached answer is sent as a single token.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    model_preference = data.get('model', 'gemini')
+
+    user_context = get_user_context(user_id)
+    cache_key = LLMCache.key(user_id, data, user_context['version'])
+    cached = LLMCache.get(cache_key)
+    if cached:
+        return sse_response(iter([
+            sse({"token": cached['response']}),
+            sse({"provider": cached['provider'], "cached": True}, event="done")
+        ]))
+
+    full_prompt = build_prompt(user_context, data)
+
+    candidates = LLMService.candidates(model_preference)
+    if not candidates:
+        return jsonify({"response": missing_keys_message(model_preference)}), 200
+
+    # Take a provider slot before the response starts so saturation is a clean 503
+    streams, errors = [], []
+    for provider in candidates:
+        try:
+            streams.append((provider, LLMService.stream(provider, full_prompt, SYSTEM_INSTRUCTION_BASE)))
+            break
+        except LLMError as e:
+            errors.append(e)
+    if not streams:
+        return busy_response()
+
+    def generate():
+        provider, tokens = streams[0]
+        remaining = candidates[candidates.index(provider) + 1:]
+        try:
+            while True:
+                sent = []
+                try:
+                    for token in tokens:
+                        sent.append(token)
+                        yield sse({"token": token})
+                    LLMCache.set(cache_key, user_id, {"response": "".join(sent), "provider": provider.name})
+                    yield sse({"provider": provider.name, "cached": False}, event="done")
+                    return
+                except Exception as e:
+                    print(f"{provider.name} stream error: {e}")
+                    if sent or not remaining:
+                        yield sse({"msg": f"I'm having trouble connecting to the Cloud AI. Error details: {e}"}, event="error")
+                        return
+                # Nothing sent yet: try the next provider
+                provider = remaining.pop(0)
+                try:
+                    tokens = LLMService.stream(provider, full_prompt, SYSTEM_INSTRUCTION_BASE)
+                except LLMError as e:
+                    yield sse({"msg": str(e)}, event="error")
+                    return
+        finally:
+            # Client disconnect: stop the producer and free a half-open breaker trial
+            tokens.close()
+
+    return sse_response(stream_with_context(generate()))
@@ -1,8 +1,8 @@
 import os
-import pandas as pd
 from flask import Blueprint, jsonify, current_app
 from flask_jwt_extended import jwt_required
 from ..services.analysis_service import DataAnalysisService
+from ..services.dataset_profiler import DatasetProfiler
 
 bp = Blueprint('datasets', __name__)
 
@@ -51,6 +51,9 @@ def list_datasets():
 @bp.route('/stats/<filename>', methods=['GET'])
 @jwt_required()
 def get_dataset_stats(filename):
+    if filename != os.path.basename(filename) or not filename.endswith('.csv'):
+        return jsonify({"msg": "File not found"}), 404
+
     # Search in both raw and processed
     raw_path = os.path.join(current_app.root_path, '../../data/raw', filename)
     processed_path = os.path.join(current_app.root_path, '../../data/processed', filename)
@@ -60,21 +63,9 @@ def get_dataset_stats(filename):
     if not os.path.exists(target_path):
         return jsonify({"msg": "File not found"}), 404
         
-    # Read a sample to get columns and summary (don't read huge files entirely)
+    # Streaming, cached profile: exact row count without loading the whole file
     try:
-        if filename == 'steps.csv':
-             # Huge file, just get header
-             df = pd.read_csv(target_path, nrows=100)
-             total_rows = "2,000,000+" # Estimated or calculated via stat
-        else:
-             df = pd.read_csv(target_path)
-             total_rows = len(df)
-             
-        return jsonify({
-            "name": filename,
-            "columns": list(df.columns),
-            "rows": total_rows,
-            "sample": df.head(5).to_dict(orient='records')
-        })
+        stats = DatasetProfiler.profile(os.path.abspath(target_path))
+        return jsonify({"name": filename, **stats})
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
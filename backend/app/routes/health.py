@@ -1,38 +1,48 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import os
-import pandas as pd
-from ..models import HealthRecord, db
-from datetime import datetime
+from ..models import HealthRecord, db, NUMERIC_FIELDS, INTEGER_FIELDS, METRIC_FIELDS
+from ..services.sample_data import SampleDataService
+from ..services.gap_forecaster import GapForecaster
+from ..services.sentiment import score_note
+from ..utils.bulk import upsert_rows
+from ..signals import health_records_saved
+from datetime import datetime, date
+import hashlib
+import json
+from sqlalchemy import func
 
 bp = Blueprint('health', __name__)
 
-@bp.route('/record', methods=['POST'])
-@jwt_required()
-def add_record():
-    user_id = int(get_jwt_identity())
-    data = request.get_json()
-    
-    date_str = data.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
-    try:
-        record_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-    except ValueError:
-        return jsonify({"msg": "Invalid date format. Use YYYY-MM-DD"}), 400
-    
-    # Clean data for HealthRecord model
+# Columns returned by GET /records (daily_note and sentiment_score only on request via fields=)
+RECORD_FIELDS = ['lh', 'estrogen', 'pdg', 'cramps', 'fatigue', 'moodswing', 'stress', 'bloating', 'sleepissue',
+                 'overall_score', 'deep_sleep_in_minutes', 'avg_resting_heart_rate', 'stress_score',
+                 'daily_steps', 'last_period_date']
+PROJECTABLE_FIELDS = RECORD_FIELDS + ['daily_note', 'sentiment_score']
+MAX_PAGE_SIZE = 1000
+MAX_BULK_RECORDS = 10000
+# Columns clean_record_data can set
+BULK_COLUMNS = METRIC_FIELDS + ['last_period_date', 'daily_note', 'sentiment_score']
+
+
+def _snapshot(record):
+    return {f: getattr(record, f) for f in METRIC_FIELDS}
+
+
+def _notify_saved(user_id, changes):
+    health_records_saved.send(current_app._get_current_object(), user_id=user_id, changes=changes)
+
+
+def clean_record_data(data):
+    """Applies the numeric/integer field rules and note sentiment to one day's payload."""
     cleaned_data = {}
-    numeric_fields = ['lh', 'estrogen', 'pdg', 'overall_score', 'deep_sleep_in_minutes', 
-                      'avg_resting_heart_rate', 'stress_score', 'daily_steps']
-    integer_fields = ['cramps', 'fatigue', 'moodswing', 'stress', 'bloating', 'sleepissue']
-    
-    for field in numeric_fields:
+    for field in NUMERIC_FIELDS:
         if field in data and data[field] is not None and data[field] != '':
             try:
                 cleaned_data[field] = float(data[field])
             except:
                 pass
                 
-    for field in integer_fields:
+    for field in INTEGER_FIELDS:
         if field in data and data[field] is not None and data[field] != '':
             try:
                 cleaned_data[field] = int(data[field])
@@ -45,38 +55,46 @@ def add_record():
         except:
             pass
 
-    # Handle Daily Note & Sentiment Analysis
-    cleaned_data['sentiment_score'] = 0.0 # Default
+    # Handle Daily Note & Sentiment Analysis (only when a note is sent, so a
+    # note-less update never resets the stored note or score)
     if 'daily_note' in data and data['daily_note']:
         note = data['daily_note'].strip()
         cleaned_data['daily_note'] = note
-        
-        # Simplified Sentiment (no external library dependency for now to ensure stability)
-        note_lower = note.lower()
-        pos_words = ['good', 'great', 'happy', 'excellent', 'amazing', 'fine', 'well', 'better']
-        neg_words = ['bad', 'sad', 'stressed', 'tired', 'pain', 'cramps', 'awful', 'terrible']
-        
-        score = 0.0
-        for w in pos_words:
-            if w in note_lower: score += 0.25
-        for w in neg_words:
-            if w in note_lower: score -= 0.25
-        
-        cleaned_data['sentiment_score'] = max(-1.0, min(1.0, score))
-            
+        cleaned_data['sentiment_score'] = score_note(note)
+
+    return cleaned_data
+
+
+@bp.route('/record', methods=['POST'])
+@jwt_required()
+def add_record():
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    date_str = data.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
+    try:
+        record_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({"msg": "Invalid date format. Use YYYY-MM-DD"}), 400
+    
+    cleaned_data = clean_record_data(data)
+
     # Check if record for this date already exists
     record = HealthRecord.query.filter_by(user_id=user_id, date=record_date).first()
+    before = _snapshot(record) if record else None
     if record:
         # Update existing
         for key, value in cleaned_data.items():
             setattr(record, key, value)
     else:
         # Create new
-        record = HealthRecord(user_id=user_id, date=record_date, **cleaned_data)
+        record = HealthRecord(user_id=user_id, date=record_date, **{'sentiment_score': 0.0, **cleaned_data})
         db.session.add(record)
+    after = _snapshot(record)
         
     try:
         db.session.commit()
+        _notify_saved(user_id, [{"date": record_date, "before": before, "after": after}])
         return jsonify({"msg": "Record saved successfully", "id": record.id}), 201
     except Exception as e:
         db.session.rollback()
@@ -98,6 +116,8 @@ def update_record_by_id(id):
         return jsonify({"msg": "Record not found"}), 404
         
     data = request.get_json()
+    old_date = record.date
+    before = _snapshot(record)
     
     # Allow date update if needed, but check conflict
     if 'date' in data:
@@ -111,168 +131,253 @@ def update_record_by_id(id):
         except ValueError:
              return jsonify({"msg": "Invalid date format"}), 400
 
-    numeric_fields = ['lh', 'estrogen', 'pdg', 'overall_score', 'deep_sleep_in_minutes', 
-                      'avg_resting_heart_rate', 'stress_score', 'daily_steps']
-    integer_fields = ['cramps', 'fatigue', 'moodswing', 'stress', 'bloating', 'sleepissue']
-    
-    for field in numeric_fields:
+    for field in NUMERIC_FIELDS:
         if field in data:  # Only update present fields
             try:
                 setattr(record, field, float(data[field]) if data[field] is not None and data[field] != '' else None)
             except:
                 pass
                 
-    for field in integer_fields:
+    for field in INTEGER_FIELDS:
         if field in data:
             try:
                 setattr(record, field, int(data[field]) if data[field] is not None and data[field] != '' else None)
             except:
                 pass
 
+    new_date = record.date
+    after = _snapshot(record)
+
     try:
         db.session.commit()
+        if new_date != old_date:
+            # A moved record reads as removed from the old day and added on the new one
+            changes = [{"date": old_date, "before": before, "after": None},
+                       {"date": new_date, "before": None, "after": after}]
+        else:
+            changes = [{"date": new_date, "before": before, "after": after}]
+        _notify_saved(user_id, changes)
         return jsonify({"msg": "Record updated successfully"}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"msg": "Database error", "error": str(e)}), 500
 
+@bp.route('/records/bulk', methods=['POST'])
+@jwt_required()
+def bulk_upsert_records():
+    """
+    Upserts many days at once (wearable syncs). Accepts a JSON array, a
+    {"records": [...]} object, or NDJSON (Content-Type: application/x-ndjson,
+    one record per line). Fields follow the same rules as POST /record; each
+    day is reported back as inserted, updated, duplicate or error.
+    """
+    user_id = int(get_jwt_identity())
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        payload = _iter_ndjson(request.stream)
+    else:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('records')
+        if not isinstance(payload, list):
+            return jsonify({"msg": "Expected a JSON array of records or NDJSON"}), 400
+
+    results = []
+    by_date = {}  # record_date -> (result index, cleaned row); later duplicates win
+    for index, item in enumerate(payload):
+        if index >= MAX_BULK_RECORDS:
+            return jsonify({"msg": f"Too many records (max {MAX_BULK_RECORDS} per request)"}), 413
+        result = {"index": index}
+        results.append(result)
+        if isinstance(item, Exception) or not isinstance(item, dict):
+            result.update(status="error", msg="Invalid JSON object")
+            continue
+        try:
+            record_date = datetime.strptime(str(item.get('date')), '%Y-%m-%d').date()
+        except ValueError:
+            result.update(status="error", msg="Invalid or missing date. Use YYYY-MM-DD")
+            continue
+
+        result["date"] = record_date.strftime('%Y-%m-%d')
+        cleaned = clean_record_data(item)
+        ignored = [f for f in NUMERIC_FIELDS + INTEGER_FIELDS
+                   if item.get(f) not in (None, '') and f not in cleaned]
+        if ignored:
+            result["ignored_fields"] = ignored
+        if record_date in by_date:
+            results[by_date[record_date][0]]["status"] = "duplicate"
+        by_date[record_date] = (index, cleaned)
+
+    if by_date:
+        existing = {row.date: dict(zip(METRIC_FIELDS, row[1:])) for row in db.session.query(
+            HealthRecord.date, *[getattr(HealthRecord, f) for f in METRIC_FIELDS]
+        ).filter(
+            HealthRecord.user_id == user_id,
+            HealthRecord.date >= min(by_date),
+            HealthRecord.date <= max(by_date)
+        )}
+        now = datetime.utcnow()
+        changes = []
+
+        # One statement for every row: a field a row omits is None and keeps the stored value
+        rows = []
+        for record_date, (index, cleaned) in by_date.items():
+            row = {"user_id": user_id, "date": record_date, "updated_at": now,
+                   **{f: None for f in BULK_COLUMNS}, **cleaned}
+            if record_date not in existing and row['sentiment_score'] is None:
+                row['sentiment_score'] = 0.0  # new days start neutral, as with POST /record
+            rows.append(row)
+            results[index]["status"] = "updated" if record_date in existing else "inserted"
+            before = existing.get(record_date)
+            after = {f: cleaned.get(f, before[f] if before else None) for f in METRIC_FIELDS}
+            changes.append({"date": record_date, "before": before, "after": after})
+
+        try:
+            upsert_rows(HealthRecord, rows, ['user_id', 'date'], BULK_COLUMNS + ['updated_at'],
+                        keep_existing=BULK_COLUMNS)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"DEBUG: Bulk Health Record Error: {e}")
+            return jsonify({"msg": "Failed to save health records to database", "error": str(e)}), 500
+        _notify_saved(user_id, changes)
+
+    counts = {status: 0 for status in ("inserted", "updated", "duplicate", "error")}
+    for result in results:
+        counts[result["status"]] += 1
+    return jsonify({**counts, "results": results}), 200
+
+
+def _iter_ndjson(stream):
+    """Yields one parsed object per non-empty line; malformed lines yield the exception."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
 @bp.route('/records', methods=['GET'])
 @jwt_required()
 def get_records():
+    """
+    Query params (all optional; without them the full history is returned as a list):
+      fields  comma-separated columns to return (id and date are always included);
+              an unknown name is a 400
+      since   / until  inclusive YYYY-MM-DD bounds
+      limit   page size; switches to a {"items", "next_cursor"} envelope
+      cursor  next_cursor from the previous page (keyset on date)
+    """
     user_id = int(get_jwt_identity())
-    records = HealthRecord.query.filter_by(user_id=user_id).order_by(HealthRecord.date.asc()).all()
-    
-    if not records:
-        # If no personal data, return sample data from processed dataset
+
+    # Without fields= rows carry every RECORD_FIELDS column, enough to seed the gap estimate
+    projected = bool(request.args.get('fields'))
+    fields = RECORD_FIELDS
+    if projected:
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in PROJECTABLE_FIELDS]
+        if unknown:
+            return jsonify({"msg": f"Unknown fields: {', '.join(unknown)}",
+                            "allowed": PROJECTABLE_FIELDS}), 400
+    try:
+        since = _parse_date_arg('since')
+        until = _parse_date_arg('until')
+        cursor = _parse_date_arg('cursor')
+        limit = min(int(request.args['limit']), MAX_PAGE_SIZE) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({"msg": "Invalid query parameter. Dates use YYYY-MM-DD, limit is an integer"}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"msg": "limit must be positive"}), 400
+
+    today = datetime.utcnow().date()
+
+    # Cheap validator: one aggregate over idx_health_user_date, no ORM objects
+    count, last_change = db.session.query(
+        func.count(HealthRecord.id),
+        func.max(func.coalesce(HealthRecord.updated_at, HealthRecord.created_at))
+    ).filter(HealthRecord.user_id == user_id).one()
+    etag = hashlib.md5(
+        f"{user_id}|{count}|{last_change}|{today}|{sorted(request.args.items(multi=True))}".encode()
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        return _with_etag(current_app.response_class(status=304), etag)
+
+    if count == 0:
+        records = []
+    else:
+        query = db.session.query(
+            HealthRecord.id, HealthRecord.date, *[getattr(HealthRecord, f) for f in fields]
+        ).filter(HealthRecord.user_id == user_id)
+        if since:
+            query = query.filter(HealthRecord.date >= since)
+        if until:
+            query = query.filter(HealthRecord.date <= until)
+        if cursor:
+            query = query.filter(HealthRecord.date > cursor)
+        query = query.order_by(HealthRecord.date.asc())
+        records = query.limit(limit + 1).all() if limit else query.all()
+
+    next_cursor = None
+    if limit and len(records) > limit:
+        records = records[:limit]
+        next_cursor = records[-1].date.strftime('%Y-%m-%d')
+
+    if count == 0:
+        # If no personal data, return sample data from processed dataset (cached, pre-serialized)
         try:
-            processed_path = os.path.join(current_app.root_path, '../../data/processed/final_dataset.csv')
-            if os.path.exists(processed_path):
-                df = pd.read_csv(processed_path).fillna(0).head(15) # Take 15 rows for sample and fill NaNs
-                sample_data = []
-                for i, row in df.iterrows():
-                    # Every 28 days, simulate a period start in sample data
-                    last_p = None
-                    if i % 28 == 0:
-                        last_p = row.get('date', f"2023-01-{i+1:02d}")
-                    
-                    sample_data.append({
-                        "id": f"sample-{i}",
-                        "date": row.get('date', f"2023-01-{i+1:02d}"),
-                        "lh": float(row.get('lh', 0)),
-                        "estrogen": float(row.get('estrogen', 0)),
-                        "pdg": float(row.get('pdg', 0)),
-                        "cramps": int(row.get('cramps', 0)),
-                        "fatigue": int(row.get('fatigue', 0)),
-                        "moodswing": int(row.get('moodswing', 0)),
-                        "stress": int(row.get('stress', 0)),
-                        "bloating": int(row.get('bloating', 0)),
-                        "sleepissue": int(row.get('sleepissue', 0)),
-                        "overall_score": float(row.get('overall_score', 0)),
-                        "deep_sleep_in_minutes": float(row.get('deep_sleep_in_minutes', 0)),
-                        "avg_resting_heart_rate": float(row.get('avg_resting_heart_rate', 0)),
-                        "stress_score": float(row.get('stress_score', 0)),
-                        "daily_steps": float(row.get('daily_steps', 0)),
-                        "last_period_date": last_p,
-                        "is_example": True
-                    })
-                return jsonify(sample_data)
+            payload = SampleDataService.sample_payload()
+            if payload is not None:
+                return _with_etag(current_app.response_class(payload, mimetype='application/json'), etag)
         except Exception as e:
             print(f"Error loading sample data: {e}")
 
-    today = datetime.utcnow().date()
-    
-    response_data = []
-    
-    # helper to process real record
-    def to_dict(r):
-        return {
-            "id": r.id,
-            "date": r.date.strftime('%Y-%m-%d'),
-            "lh": r.lh,
-            "estrogen": r.estrogen,
-            "pdg": r.pdg,
-            "cramps": r.cramps,
-            "fatigue": r.fatigue,
-            "moodswing": r.moodswing,
-            "stress": r.stress,
-            "bloating": r.bloating,
-            "sleepissue": r.sleepissue,
-            "overall_score": r.overall_score,
-            "deep_sleep_in_minutes": r.deep_sleep_in_minutes,
-            "avg_resting_heart_rate": r.avg_resting_heart_rate,
-            "stress_score": r.stress_score,
-            "daily_steps": r.daily_steps,
-            "last_period_date": r.last_period_date.strftime('%Y-%m-%d') if r.last_period_date else None,
-            "is_estimated": False,
-            "is_example": False
-        }
-
-    for r in records:
-        response_data.append(to_dict(r))
-        
-    # --- Continuous Intelligence: Extrapolate missing days up to today ---
-    if records:
-        last_record = records[-1]
-        last_date = last_record.date
-        
-        if last_date < today:
-            from datetime import timedelta
-            
-            # Simple Smoothing / Carry-forward logic
-            # In a real ML system, this would use ARIMA or LSTM.
-            # Here we use a smart "Drift" logic to simulate natural variance.
-            import random
-            
-            curr_date = last_date + timedelta(days=1)
-            
-            # Base values from last known state
-            current_steps = last_record.daily_steps or 5000
-            current_stress = last_record.stress_score or 50
-            current_sleep = last_record.deep_sleep_in_minutes or 60
-            current_hr = last_record.avg_resting_heart_rate or 70
-            
-            while curr_date <= today:
-                # Add slight "life" variation so it's not a flat line
-                # Steps vary +/- 10%
-                step_var = random.uniform(0.9, 1.1)
-                estimated_steps = int(current_steps * step_var)
-                
-                # Stress tends to revert to mean (say 30-40)
-                # If high (>70), it decays down. If low (<20), it stays low.
-                if current_stress > 50:
-                    current_stress *= 0.95 # recover
-                else:
-                    current_stress *= random.uniform(0.95, 1.05)
-                
-                # Sleep varies slightly
-                estimated_sleep = current_sleep * random.uniform(0.9, 1.1)
-                
-                response_data.append({
-                    "id": f"est-{curr_date}",
-                    "date": curr_date.strftime('%Y-%m-%d'),
-                    "lh": None, # Hormones are hard to guess without phase logic, leave null so chart connects or breaks appropriately
-                    "estrogen": None,
-                    "pdg": None,
-                    "cramps": last_record.cramps, # Symptoms likely persist or fade? Let's carry forward
-                    "fatigue": last_record.fatigue,
-                    "moodswing": last_record.moodswing,
-                    "stress": int(current_stress / 25), # approx likert from score
-                    "bloating": last_record.bloating,
-                    "sleepissue": last_record.sleepissue,
-                    "overall_score": last_record.overall_score, # Keep simple
-                    "deep_sleep_in_minutes": round(estimated_sleep, 1),
-                    "avg_resting_heart_rate": current_hr,
-                    "stress_score": round(current_stress, 1),
-                    "daily_steps": estimated_steps,
-                    "last_period_date": last_record.last_period_date.strftime('%Y-%m-%d') if last_record.last_period_date else None,
-                    "is_estimated": True, # CRITICAL FLAG
-                    "is_example": False
-                })
-                
-                # Update baseline for next loop for continuity
-                current_steps = estimated_steps
-                
-                curr_date += timedelta(days=1)
+    response_data = [_serialize_record(r, fields) for r in records]
+
+    # Estimated days are appended after the user's latest record, i.e. on the last page
+    if count and next_cursor is None and (until is None or until >= today):
+        latest = records[-1] if records and not projected else _latest_record(user_id)
+        if latest and latest.date < today:
+            estimated = GapForecaster.estimate(
+                user_id, latest, today,
+                estimator=current_app.config['GAP_ESTIMATOR'],
+                max_days=current_app.config['GAP_FILL_MAX_DAYS'],
+                mode=current_app.config['GAP_FILL_MODE']
+            )
+            if projected:
+                keep = {"id", "date", "is_estimated", "is_example", *fields}
+                estimated = [{k: v for k, v in e.items() if k in keep} for e in estimated]
+            response_data.extend(estimated)
+
+    if limit:
+        return _with_etag(jsonify({"items": response_data, "next_cursor": next_cursor}), etag)
+    return _with_etag(jsonify(response_data), etag)
+
+
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _serialize_record(r, fields):
+    item = {"id": r.id, "date": r.date.strftime('%Y-%m-%d')}
+    for f in fields:
+        value = getattr(r, f)
+        item[f] = value.strftime('%Y-%m-%d') if isinstance(value, date) else value
+    item["is_estimated"] = False
+    item["is_example"] = False
+    return item
 
 
-    return jsonify(response_data)
+def _latest_record(user_id):
+    return db.session.query(
+        HealthRecord.id, HealthRecord.date, *[getattr(HealthRecord, f) for f in RECORD_FIELDS]
+    ).filter(HealthRecord.user_id == user_id).order_by(HealthRecord.date.desc()).first()
@@ -0,0 +1,15 @@
+import hmac
+from flask import Blueprint, Response, request, current_app, jsonify
+from ..utils.metrics import render_latest
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    # Optional shared token so the endpoint can be exposed behind a public URL
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, token):
+            return jsonify({"msg": "Unauthorized"}), 401
+    return Response(render_latest(), mimetype='text/plain; version=0.0.4')
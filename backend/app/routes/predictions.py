@@ -1,11 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import HealthRecord, Prediction, db
-from ..services.ml_service import MLService
+from ..models import Prediction, db
+from ..services.feature_loader import FeatureLoader
+from ..signals import predictions_saved
 from datetime import datetime, timedelta
 
 bp = Blueprint('predictions', __name__)
 
+MAX_BATCH_DAYS = 366
+
 @bp.route('/predict', methods=['POST'])
 @jwt_required()
 def predict():
@@ -15,66 +18,73 @@ def predict():
     date_str = data.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
     target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     
-    # Get current record for this date
-    record = HealthRecord.query.filter_by(user_id=user_id, date=target_date).first()
-    if not record:
+    # Target day, its lag window and the stored prediction in one query
+    window = FeatureLoader.load(user_id, target_date, target_date)
+    if not window.days:
         return jsonify({"msg": "No health record found for this date. Please submit health data first."}), 400
-        
-    # Get previous 2 days records for historical features
-    prev1_date = target_date - timedelta(days=1)
-    prev2_date = target_date - timedelta(days=2)
-    
-    prev1 = HealthRecord.query.filter_by(user_id=user_id, date=prev1_date).first()
-    prev2 = HealthRecord.query.filter_by(user_id=user_id, date=prev2_date).first()
-    
-    def record_to_dict(r):
-        if not r: return {}
-        return {
-            "lh": r.lh or 0,
-            "estrogen": r.estrogen or 0,
-            "pdg": r.pdg or 0,
-            "cramps": r.cramps or 0,
-            "fatigue": r.fatigue or 0,
-            "moodswing": r.moodswing or 0,
-            "stress": r.stress or 0,
-            "bloating": r.bloating or 0,
-            "sleepissue": r.sleepissue or 0,
-            "overall_score": r.overall_score or 0,
-            "deep_sleep_in_minutes": r.deep_sleep_in_minutes or 0,
-            "avg_resting_heart_rate": r.avg_resting_heart_rate or 0,
-            "stress_score": r.stress_score or 0,
-            "daily_steps": r.daily_steps or 0
-        }
-        
-    current_data = record_to_dict(record)
-    historical_data = [record_to_dict(prev1), record_to_dict(prev2)]
     
     # Run ML Prediction
     try:
-        result = MLService.predict(current_data, historical_data)
+        result = FeatureLoader.score(window)[0]
     except Exception as e:
         print(f"DEBUG: ML Prediction Error: {str(e)}")
         return jsonify({"msg": "AI Prediction failed", "error": str(e)}), 500
     
-    # Store Prediction
-    prediction = Prediction.query.filter_by(user_id=user_id, date=target_date).first()
-    if prediction:
-        prediction.predicted_phase = result['phase']
-        prediction.confidence = result['confidence']
-    else:
-        prediction = Prediction(
-            user_id=user_id,
-            record_id=record.id,
-            date=target_date,
-            predicted_phase=result['phase'],
-            confidence=result['confidence']
-        )
-        db.session.add(prediction)
-        
-    db.session.commit()
+    # Store Prediction (single upsert)
+    try:
+        changes = FeatureLoader.store(window, [result])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Failed to store prediction", "error": str(e)}), 500
+    predictions_saved.send(current_app._get_current_object(), user_id=user_id, changes=changes)
     
     return jsonify(result), 200
 
+@bp.route('/predict-batch', methods=['POST'])
+@jwt_required()
+def predict_batch():
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+
+    try:
+        end_date = datetime.strptime(data.get('end_date', datetime.utcnow().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date() if data.get('start_date') else end_date - timedelta(days=29)
+    except (ValueError, TypeError):
+        return jsonify({"msg": "Invalid date format. Use YYYY-MM-DD"}), 400
+
+    if start_date > end_date:
+        return jsonify({"msg": "start_date must be on or before end_date"}), 400
+    if (end_date - start_date).days + 1 > MAX_BATCH_DAYS:
+        return jsonify({"msg": f"Date range too large (max {MAX_BATCH_DAYS} days)"}), 400
+
+    window = FeatureLoader.load(user_id, start_date, end_date)
+
+    try:
+        results = FeatureLoader.score(window)
+    except Exception as e:
+        print(f"DEBUG: ML Batch Prediction Error: {str(e)}")
+        return jsonify({"msg": "AI Prediction failed", "error": str(e)}), 500
+
+    try:
+        changes = FeatureLoader.store(window, results)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Failed to store predictions", "error": str(e)}), 500
+    predictions_saved.send(current_app._get_current_object(), user_id=user_id, changes=changes)
+
+    return jsonify({
+        "start_date": start_date.strftime('%Y-%m-%d'),
+        "end_date": end_date.strftime('%Y-%m-%d'),
+        "count": len(results),
+        "skipped_days": window.skipped_days,
+        "predictions": [
+            {"date": day.strftime('%Y-%m-%d'), **result}
+            for day, result in zip(window.days, results)
+        ]
+    }), 200
+
 @bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_prediction_history():
@@ -1,28 +1,225 @@
-
-import pandas as pd
 import os
+import threading
+import time
+import pandas as pd
+from flask import current_app
+from sqlalchemy import func
+from .. import db
+from ..models import HealthRecord, Prediction
+from ..signals import health_records_saved, predictions_saved
+from .dataset_profiler import CHUNK_ROWS
+from .ml_service import PHASE_SIMPLE
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+
+# (file in data/raw, column) feeding each raw-data aggregate
+RAW_HEART_RATE = ('resting_heart_rate.csv', 'value')
+RAW_STEPS = ('steps.csv', 'steps')
+RAW_PHASE = ('hormones_and_selfreport.csv', 'phase')
+# One row per participant-day: the base table for the raw record count
+RAW_DAYS = ('hormones_and_selfreport.csv', ['id', 'day_in_study'])
+
+EMPTY_RAW = {"records": 0, "hr_sum": 0.0, "hr_count": 0, "steps_sum": 0.0, "phases": {}}
+
 
 class DataAnalysisService:
+    """
+    Global summary over the raw study exports and the app's own tables.
+
+    Raw-file aggregates are computed in init_app and recomputed on a
+    background thread when a file's size/mtime changes; requests only read
+    the cached values (study phases are mapped to the model's labels, so
+    both sources share one phase_distribution vocabulary). A failed read is
+    retried only once the files change again. Database aggregates are loaded
+    once, then kept current by applying the before/after deltas from the health_records_saved and predictions_saved
+    signals, so a summary request never scans a table. A background
+    reconciliation every SUMMARY_REFRESH_INTERVAL seconds picks up writes
+    made by other worker processes.
+    """
+    _lock = threading.Lock()
+    _raw = None   # (signature, aggregates)
+    _raw_attempted = None  # signature of the last read, successful or not
+    _db = None    # running aggregates for health_records / predictions
+    _db_loaded_at = 0.0
+    _refreshing = False
+    _raw_refreshing = False
+    _refresh_interval = 600
+
+    @classmethod
+    def init_app(cls, app):
+        cls._refresh_interval = app.config.get('SUMMARY_REFRESH_INTERVAL', 600)
+        health_records_saved.connect(cls._on_records_saved, weak=False)
+        predictions_saved.connect(cls._on_predictions_saved, weak=False)
+        cls._refresh_raw()
+
     @staticmethod
     def get_global_summary():
-        # Define paths
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
-        
-        # Default fallback
         summary = {
             "total_records": 0,
             "avg_heart_rate": 0,
             "total_steps": 0,
             "phase_distribution": {}
         }
-        
+
         try:
-            # Try to read sample data if available to simulate stats
-            # In a real app, this would iterate over all relevant CSVs
-            # Here we just mock it safely or read one file if exists
-            pass
+            raw = DataAnalysisService._raw_aggregates()
+            app_data = DataAnalysisService._db_aggregates()
+
+            hr_count = raw['hr_count'] + app_data['hr_count']
+            phases = dict(raw['phases'])
+            for phase, count in app_data['phases'].items():
+                phases[phase] = phases.get(phase, 0) + count
+
+            summary.update({
+                "total_records": raw['records'] + app_data['records'],
+                "avg_heart_rate": round((raw['hr_sum'] + app_data['hr_sum']) / hr_count, 1) if hr_count else 0,
+                "total_steps": int(raw['steps_sum'] + app_data['steps_sum']),
+                "phase_distribution": {k: v for k, v in phases.items() if v > 0}
+            })
         except Exception as e:
             print(f"Error calculating summary: {e}")
-            
+
         return summary
+
+    # --- Raw study exports -------------------------------------------------
+
+    @staticmethod
+    def _raw_files():
+        if not os.path.isdir(RAW_DIR):
+            return []
+        return sorted(os.path.join(RAW_DIR, f) for f in os.listdir(RAW_DIR) if f.endswith('.csv'))
+
+    @classmethod
+    def _raw_signature(cls):
+        return tuple((path, os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in cls._raw_files())
+
+    @classmethod
+    def _raw_aggregates(cls):
+        """Cached aggregates; a changed export is re-read off the request."""
+        cached = cls._raw
+        if cls._raw_attempted != cls._raw_signature():
+            with cls._lock:
+                start = not cls._raw_refreshing
+                cls._raw_refreshing = True
+            if start:
+                threading.Thread(target=cls._refresh_raw, kwargs={"claimed": True}, daemon=True).start()
+        return cached[1] if cached else EMPTY_RAW
+
+    @classmethod
+    def _refresh_raw(cls, claimed=False):
+        try:
+            signature = cls._raw_signature()
+            cls._raw_attempted = signature
+            cls._raw = (signature, cls._compute_raw_aggregates())
+        except Exception as e:
+            print(f"Raw data summary failed: {e}")
+        finally:
+            if claimed:
+                cls._raw_refreshing = False
+
+    @classmethod
+    def _compute_raw_aggregates(cls):
+        aggregates = {**EMPTY_RAW, "phases": {}}
+        days = [chunk.drop_duplicates() for chunk in cls._read_columns(*RAW_DAYS)]
+        if days:
+            aggregates['records'] = len(pd.concat(days).drop_duplicates())
+        for values in cls._read_column(*RAW_HEART_RATE):
+            values = pd.to_numeric(values, errors='coerce')
+            values = values[values > 0]  # 0 marks a missing reading in the export
+            aggregates['hr_sum'] += float(values.sum())
+            aggregates['hr_count'] += int(values.count())
+        for values in cls._read_column(*RAW_STEPS):
+            aggregates['steps_sum'] += float(pd.to_numeric(values, errors='coerce').sum())
+        for values in cls._read_column(*RAW_PHASE):
+            for phase, count in values.map(lambda p: PHASE_SIMPLE.get(p, p)).value_counts().items():
+                aggregates['phases'][phase] = aggregates['phases'].get(phase, 0) + int(count)
+        return aggregates
+
+    @staticmethod
+    def _read_columns(filename, columns):
+        path = os.path.join(RAW_DIR, filename)
+        if not os.path.exists(path):
+            return
+        yield from pd.read_csv(path, usecols=columns, chunksize=CHUNK_ROWS)
+
+    @classmethod
+    def _read_column(cls, filename, column):
+        for chunk in cls._read_columns(filename, [column]):
+            yield chunk[column].dropna()
+
+    # --- Application tables ------------------------------------------------
+
+    @staticmethod
+    def _compute_db_aggregates():
+        records, hr_sum, hr_count, steps_sum = db.session.query(
+            func.count(HealthRecord.id),
+            func.sum(HealthRecord.avg_resting_heart_rate),
+            func.count(HealthRecord.avg_resting_heart_rate),
+            func.sum(HealthRecord.daily_steps)
+        ).one()
+        phases = dict(db.session.query(
+            Prediction.predicted_phase, func.count(Prediction.id)
+        ).group_by(Prediction.predicted_phase).all())
+        return {
+            "records": records or 0,
+            "hr_sum": float(hr_sum or 0),
+            "hr_count": hr_count or 0,
+            "steps_sum": float(steps_sum or 0),
+            "phases": phases
+        }
+
+    @classmethod
+    def _db_aggregates(cls):
+        with cls._lock:
+            if cls._db is None:
+                cls._db = cls._compute_db_aggregates()
+                cls._db_loaded_at = time.monotonic()
+            elif time.monotonic() - cls._db_loaded_at > cls._refresh_interval and not cls._refreshing:
+                cls._refreshing = True
+                app = current_app._get_current_object()
+                threading.Thread(target=cls._reconcile, args=(app,), daemon=True).start()
+            return {**cls._db, "phases": dict(cls._db['phases'])}
+
+    @classmethod
+    def _reconcile(cls, app):
+        try:
+            with app.app_context():
+                fresh = cls._compute_db_aggregates()
+            with cls._lock:
+                cls._db = fresh
+                cls._db_loaded_at = time.monotonic()
+        except Exception as e:
+            print(f"Summary reconciliation failed: {e}")
+        finally:
+            cls._refreshing = False
+
+    @classmethod
+    def _on_records_saved(cls, sender, user_id=None, changes=(), **kwargs):
+        with cls._lock:
+            state = cls._db
+            if state is None:
+                return  # nothing loaded yet; the first summary request reads the table
+            for change in changes:
+                for snapshot, sign in ((change['before'], -1), (change['after'], 1)):
+                    if snapshot is None:
+                        continue
+                    state['records'] += sign
+                    hr = snapshot.get('avg_resting_heart_rate')
+                    if hr is not None:
+                        state['hr_sum'] += sign * hr
+                        state['hr_count'] += sign
+                    state['steps_sum'] += sign * (snapshot.get('daily_steps') or 0)
+
+    @classmethod
+    def _on_predictions_saved(cls, sender, user_id=None, changes=(), **kwargs):
+        with cls._lock:
+            state = cls._db
+            if state is None:
+                return
+            phases = state['phases']
+            for change in changes:
+                for snapshot, sign in ((change['before'], -1), (change['after'], 1)):
+                    if snapshot is not None:
+                        phase = snapshot['predicted_phase']
+                        phases[phase] = phases.get(phase, 0) + sign
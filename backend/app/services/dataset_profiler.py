@@ -0,0 +1,134 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 100_000
+SAMPLE_ROWS = 5
+# k for the k-minimum-values distinct estimator (relative error ~ 1/sqrt(k))
+KMV_SIZE = 2048
+
+
+class _ColumnStats:
+    """Running per-column aggregates merged chunk by chunk."""
+
+    def __init__(self):
+        self.kinds = set()
+        self.nulls = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, series):
+        self.kinds.add(series.dtype.kind)
+        self.nulls += int(series.isna().sum())
+
+        values = series.dropna()
+        if values.empty:
+            return
+        if series.dtype.kind in 'biuf':
+            numeric = values.to_numpy(dtype=np.float64)
+            self.count += numeric.size
+            self.total += float(numeric.sum())
+            lo, hi = float(numeric.min()), float(numeric.max())
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+
+        # Keep the KMV_SIZE smallest distinct 64-bit hashes seen so far
+        hashed = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        self.hashes = np.union1d(self.hashes, hashed)[:KMV_SIZE]
+
+    def dtype(self):
+        if not self.kinds:
+            return 'object'
+        if self.kinds == {'b'}:
+            return 'bool'
+        if self.kinds <= {'i', 'u'}:
+            return 'int64'
+        if self.kinds <= {'i', 'u', 'f', 'b'}:
+            return 'float64'
+        return 'object'
+
+    def approx_distinct(self):
+        if self.hashes.size < KMV_SIZE:
+            return int(self.hashes.size)  # saw fewer than k distinct values: exact
+        kth = float(self.hashes[-1]) / float(np.iinfo(np.uint64).max)
+        return int(round((KMV_SIZE - 1) / kth))
+
+    def to_dict(self):
+        numeric = self.dtype() in ('int64', 'float64') and self.count
+        return {
+            "dtype": self.dtype(),
+            "nulls": self.nulls,
+            "min": self.min if numeric else None,
+            "max": self.max if numeric else None,
+            "mean": self.total / self.count if numeric else None,
+            "approx_distinct": self.approx_distinct()
+        }
+
+
+class DatasetProfiler:
+    """
+    Profiles a CSV in one streaming pass (CHUNK_ROWS rows at a time): exact
+    row count and per-column dtype, null count, min/max/mean and approximate
+    distinct count. Profiles are cached by (path, size, mtime), so repeat
+    calls for an unchanged file are dictionary lookups.
+
+    Chunks come from pandas rather than pyarrow's streaming CSV reader
+    (pyarrow is installed for feature_pipeline.py): pyarrow fixes column
+    types from the first block and fails on a later block that does not
+    fit, e.g. an id column that turns non-numeric after 20k rows. Here
+    each chunk is typed on its own and the dtypes are merged.
+    """
+    _cache = {}
+    _locks = {}
+    _guard = threading.Lock()
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return (path, stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def profile(cls, path):
+        signature = cls._signature(path)
+        cached = cls._cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        with cls._guard:
+            lock = cls._locks.setdefault(path, threading.Lock())
+        with lock:
+            cached = cls._cache.get(path)
+            if cached and cached[0] == signature:
+                return cached[1]
+            result = cls._compute(path)
+            cls._cache[path] = (signature, result)
+            return result
+
+    @staticmethod
+    def _compute(path):
+        rows = 0
+        columns = None
+        stats = {}
+        sample = []
+
+        for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS, low_memory=False):
+            if columns is None:
+                columns = list(chunk.columns)
+                stats = {col: _ColumnStats() for col in columns}
+                # to_json turns NaN into null so the sample is valid JSON
+                sample = json.loads(chunk.head(SAMPLE_ROWS).to_json(orient='records'))
+            rows += len(chunk)
+            for col in columns:
+                stats[col].update(chunk[col])
+
+        return {
+            "columns": columns or [],
+            "rows": rows,
+            "sample": sample,
+            "profile": {col: stats[col].to_dict() for col in columns or []}
+        }
@@ -0,0 +1,119 @@
+from datetime import timedelta
+import numpy as np
+from sqlalchemy import and_, delete
+from .. import db
+from ..models import HealthRecord, Prediction
+from ..utils.bulk import upsert_rows
+from .ml_service import MLService, CURRENT_COLUMNS, MAX_LAG
+
+
+class FeatureWindow:
+    """Model inputs for the days start..end of one user that have a health record."""
+
+    def __init__(self, user_id, start_date, end_date, days, record_ids, X, existing_phases, skipped_days):
+        self.user_id = user_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.days = days                        # dates that have a record, ascending
+        self.record_ids = record_ids            # HealthRecord.id per entry in days
+        self.X = X                              # (len(days), len(FEATURE_COLUMNS))
+        self.existing_phases = existing_phases  # date -> currently stored phase
+        self.skipped_days = skipped_days        # days in range without a record
+
+    def __len__(self):
+        return len(self.days)
+
+
+class FeatureLoader:
+    """
+    Shared read/score/write path for every prediction entry point (single
+    /predict, /predict-batch and background scoring).
+
+    load() runs one range query on idx_health_user_date covering the days
+    plus the MAX_LAG lag window, left-joined to predictions so the phases
+    being replaced come back in the same round trip. store() writes all
+    results with one INSERT ... ON CONFLICT (user_id, date) DO UPDATE.
+    """
+
+    @staticmethod
+    def load(user_id, start_date, end_date):
+        window_start = start_date - timedelta(days=MAX_LAG)
+        rows = db.session.query(
+            HealthRecord.id, HealthRecord.date, Prediction.predicted_phase,
+            *[getattr(HealthRecord, c) for c in CURRENT_COLUMNS]
+        ).outerjoin(
+            Prediction, and_(Prediction.user_id == HealthRecord.user_id, Prediction.date == HealthRecord.date)
+        ).filter(
+            HealthRecord.user_id == user_id,
+            HealthRecord.date >= window_start,
+            HealthRecord.date <= end_date
+        ).order_by(HealthRecord.date.asc()).all()
+
+        # Dense day-indexed array: missing days (and NULL metrics) are zeros
+        n_days = (end_date - window_start).days + 1
+        daily_values = np.zeros((n_days, len(CURRENT_COLUMNS)))
+        record_ids = np.zeros(n_days, dtype=np.int64)
+        existing_phases = {}
+        if rows:
+            idx = np.array([(r.date - window_start).days for r in rows])
+            daily_values[idx] = np.nan_to_num(np.array([r[3:] for r in rows], dtype=float))
+            record_ids[idx] = [r.id for r in rows]
+            existing_phases = {r.date: r.predicted_phase for r in rows if r.predicted_phase is not None}
+
+        # Only days that have a record are scored
+        target_ids = record_ids[MAX_LAG:]
+        has_record = target_ids > 0
+        offsets = np.flatnonzero(has_record)
+        return FeatureWindow(
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            days=[start_date + timedelta(days=int(o)) for o in offsets],
+            record_ids=[int(target_ids[o]) for o in offsets],
+            X=MLService.build_lagged_features(daily_values)[has_record],
+            existing_phases=existing_phases,
+            skipped_days=int((~has_record).sum())
+        )
+
+    @staticmethod
+    def score(window):
+        """[{"phase", "confidence"}] per day in the window."""
+        return MLService.predict_batch(window.X)
+
+    @staticmethod
+    def store(window, results):
+        """
+        Upserts the results (does not commit). Returns the changes list for
+        predictions_saved.
+        """
+        upserts = []
+        changes = []
+        for day, record_id, result in zip(window.days, window.record_ids, results):
+            upserts.append({
+                "user_id": window.user_id,
+                "record_id": record_id,
+                "date": day,
+                "predicted_phase": result['phase'],
+                "confidence": result['confidence']
+            })
+            before = window.existing_phases.get(day)
+            changes.append({
+                "date": day,
+                "before": {"predicted_phase": before} if before is not None else None,
+                "after": {"predicted_phase": result['phase']}
+            })
+        upsert_rows(Prediction, upserts, ['user_id', 'date'], ['record_id', 'predicted_phase', 'confidence'])
+        return changes
+
+    @staticmethod
+    def delete(user_id, dates):
+        """
+        Deletes the predictions stored for days that no longer have a record
+        (one DELETE ... RETURNING, no commit). Returns the changes list for
+        predictions_saved.
+        """
+        removed = db.session.execute(
+            delete(Prediction).where(Prediction.user_id == user_id, Prediction.date.in_(list(dates)))
+            .returning(Prediction.date, Prediction.predicted_phase)
+        ).all()
+        return [{"date": day, "before": {"predicted_phase": phase}, "after": None} for day, phase in removed]
@@ -0,0 +1,157 @@
+import zlib
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from functools import lru_cache
+import numpy as np
+from scipy.signal import lfilter
+
+# Last-record fields the estimators and the estimated rows are built from
+BASE_FIELDS = ('cramps', 'fatigue', 'moodswing', 'bloating', 'sleepissue', 'overall_score',
+               'deep_sleep_in_minutes', 'avg_resting_heart_rate', 'stress_score', 'daily_steps',
+               'last_period_date')
+
+ESTIMATORS = {}
+
+
+def register_estimator(cls):
+    """Class decorator: makes an estimator selectable through GAP_ESTIMATOR (an incomplete one raises TypeError here)."""
+    ESTIMATORS[cls.name] = cls()
+    return cls
+
+
+def _ar1(mean, start, phi, noise):
+    """Vectorized AR(1): x_t = mean + phi * (x_{t-1} - mean) + noise_t, x_0 = start."""
+    deviation = lfilter([1.0], [1.0, -phi], noise, zi=[phi * (start - mean)])[0]
+    return mean + deviation
+
+
+class GapEstimator(ABC):
+    """Turns the last known day into arrays of estimated values for the next n days."""
+    name = None
+
+    @abstractmethod
+    def estimate(self, base, n_days, rng_for):
+        """
+        {field: array of n_days values} for the days after base. rng_for(field)
+        returns that field's own seeded generator: draw a series from it in day
+        order so day k's value does not depend on n_days.
+        """
+
+
+@register_estimator
+class MeanRevertingEstimator(GapEstimator):
+    """
+    Steps and deep sleep wander around the last observed level, stress
+    decays toward a resting mean; heart rate is carried forward. Same
+    spirit as the old day-by-day drift loop, computed for the whole gap at once.
+    """
+    name = 'mean_reverting'
+    STRESS_MEAN = 35.0
+
+    def estimate(self, base, n_days, rng_for):
+        steps = base['daily_steps'] or 5000
+        stress = base['stress_score'] or 50
+        sleep = base['deep_sleep_in_minutes'] or 60
+
+        est_steps = _ar1(steps, steps, 0.7, rng_for('daily_steps').standard_normal(n_days) * steps * 0.08)
+        est_stress = _ar1(self.STRESS_MEAN, stress, 0.95, rng_for('stress_score').standard_normal(n_days) * 2.0)
+        est_sleep = _ar1(sleep, sleep, 0.5, rng_for('deep_sleep_in_minutes').standard_normal(n_days) * sleep * 0.05)
+
+        return {
+            'daily_steps': np.maximum(est_steps, 0).astype(int),
+            'stress_score': np.clip(est_stress, 0, 100).round(1),
+            'deep_sleep_in_minutes': np.maximum(est_sleep, 0).round(1),
+            'avg_resting_heart_rate': np.full(n_days, base['avg_resting_heart_rate'] or 70),
+        }
+
+
+@register_estimator
+class CarryForwardEstimator(GapEstimator):
+    """Repeats the last observed values (flat line)."""
+    name = 'carry_forward'
+
+    def estimate(self, base, n_days, rng_for):
+        return {
+            'daily_steps': np.full(n_days, int(base['daily_steps'] or 5000)),
+            'stress_score': np.full(n_days, float(base['stress_score'] or 50)),
+            'deep_sleep_in_minutes': np.full(n_days, float(base['deep_sleep_in_minutes'] or 60)),
+            'avg_resting_heart_rate': np.full(n_days, base['avg_resting_heart_rate'] or 70),
+        }
+
+
+class GapForecaster:
+    """
+    Fills the days between a user's latest record and today.
+    Output is deterministic for (user, last record, today): each series has
+    its own RNG seeded from the user id, last date and field, so responses are
+    stable across calls and HTTP caches, a day keeps its value as today moves
+    forward, and results are memoized until a newer record arrives.
+    """
+
+    @staticmethod
+    def estimate(user_id, last_record, today, estimator='mean_reverting', max_days=90, mode='cap'):
+        """
+        last_record: object with `date` and BASE_FIELDS attributes.
+        max_days: days closest to today that get one row each. Older days are
+        dropped (mode='cap') or collapsed into weekly rows (mode='summarize').
+        """
+        base = tuple(getattr(last_record, f) for f in BASE_FIELDS)
+        return list(_estimate_cached(user_id, last_record.date, base, today, estimator, max_days, mode))
+
+
+@lru_cache(maxsize=4096)
+def _estimate_cached(user_id, last_date, base_values, today, estimator_name, max_days, mode):
+    n_days = (today - last_date).days
+    if n_days <= 0:
+        return ()
+
+    base = dict(zip(BASE_FIELDS, base_values))
+    estimator = ESTIMATORS.get(estimator_name) or ESTIMATORS['mean_reverting']
+    def rng_for(field):
+        return np.random.default_rng(zlib.crc32(f"{user_id}:{last_date}:{field}".encode()))
+
+    series = estimator.estimate(base, n_days, rng_for)
+
+    start = last_date + timedelta(days=1)
+    older = max(0, n_days - max_days) if max_days else 0
+    rows = []
+    if older and mode == 'summarize':
+        week_starts = np.arange(0, older, 7)
+        summarized = {k: np.add.reduceat(v[:older].astype(float), week_starts) / np.diff(np.append(week_starts, older))
+                      for k, v in series.items()}
+        for i, offset in enumerate(week_starts):
+            span = int(min(7, older - offset))
+            rows.append(_build_row(base, start + timedelta(days=int(offset)), summarized, i,
+                                   id_prefix='est-week', extra={"span_days": span}))
+    for i in range(older, n_days):
+        rows.append(_build_row(base, start + timedelta(days=i), series, i))
+    return tuple(rows)
+
+
+def _build_row(base, day, series, i, id_prefix='est', extra=None):
+    stress_score = round(float(series['stress_score'][i]), 1)
+    last_period = base['last_period_date']
+    row = {
+        "id": f"{id_prefix}-{day}",
+        "date": day.strftime('%Y-%m-%d'),
+        "lh": None, # Hormones are hard to guess without phase logic, leave null so chart connects or breaks appropriately
+        "estrogen": None,
+        "pdg": None,
+        "cramps": base['cramps'], # Symptoms carried forward
+        "fatigue": base['fatigue'],
+        "moodswing": base['moodswing'],
+        "stress": min(int(stress_score / 25), 4), # approx likert from score
+        "bloating": base['bloating'],
+        "sleepissue": base['sleepissue'],
+        "overall_score": base['overall_score'],
+        "deep_sleep_in_minutes": round(float(series['deep_sleep_in_minutes'][i]), 1),
+        "avg_resting_heart_rate": float(series['avg_resting_heart_rate'][i]),
+        "stress_score": stress_score,
+        "daily_steps": int(series['daily_steps'][i]),
+        "last_period_date": last_period.strftime('%Y-%m-%d') if last_period else None,
+        "is_estimated": True, # CRITICAL FLAG
+        "is_example": False
+    }
+    if extra:
+        row.update(extra)
+    return row
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from .. import db
+from ..models import HealthRecord, User
+from ..signals import health_records_saved
+from ..utils.metrics import counter
+
+HISTORY_DAYS = 7
+# Only what the rendered block uses (no daily_note or other wide columns)
+HISTORY_COLUMNS = ('date', 'deep_sleep_in_minutes', 'stress', 'moodswing', 'cramps', 'fatigue', 'bloating')
+
+HISTORY_CACHE_LOOKUPS = counter('chat_history_cache_lookups_total', 'Chat history context cache lookups', ['result'])
+
+
+class HistoryContextService:
+    """
+    The per-user part of the chat prompt (display name and the rendered
+    "last 7 days" block), cached per user for the current day. Saving a
+    health record (single, edit or bulk) drops the user's entry through
+    health_records_saved and a profile update drops it through invalidate(),
+    so a conversation costs queries per change in the data rather than per
+    message. Entries also expire after HISTORY_CONTEXT_TTL seconds to pick up
+    writes made by other worker processes.
+
+    get() returns {"name", "history", "version"}; version is a digest of the
+    other two and is what LLMCache keys chat answers by.
+    """
+    _lock = threading.Lock()
+    _entries = OrderedDict()  # user_id -> (day, expires_at, context)
+    _ttl = 300.0
+    _max_users = 5000
+
+    @classmethod
+    def init_app(cls, app):
+        cls._ttl = app.config.get('HISTORY_CONTEXT_TTL', 300.0)
+        cls._max_users = app.config.get('HISTORY_CONTEXT_MAX_USERS', 5000)
+        health_records_saved.connect(cls._on_records_saved, weak=False)
+
+    @classmethod
+    def get(cls, user_id):
+        today = datetime.utcnow().date()
+        with cls._lock:
+            entry = cls._entries.get(user_id)
+            if entry and entry[0] == today and entry[1] > time.monotonic():
+                cls._entries.move_to_end(user_id)
+                HISTORY_CACHE_LOOKUPS.inc(result='hit')
+                return entry[2]
+        HISTORY_CACHE_LOOKUPS.inc(result='miss')
+
+        name = db.session.query(User.username).filter(User.id == user_id).scalar() or "Friend"
+        history = cls.render(user_id, today)
+        context = {
+            "name": name,
+            "history": history,
+            "version": hashlib.sha256(f"{today}|{name}|{history}".encode()).hexdigest()[:16]
+        }
+        with cls._lock:
+            cls._entries[user_id] = (today, time.monotonic() + cls._ttl, context)
+            cls._entries.move_to_end(user_id)
+            while len(cls._entries) > cls._max_users:
+                cls._entries.popitem(last=False)
+        return context
+
+    @staticmethod
+    def render(user_id, today):
+        since = today - timedelta(days=HISTORY_DAYS)
+        rows = db.session.query(*[getattr(HealthRecord, c) for c in HISTORY_COLUMNS]).filter(
+            HealthRecord.user_id == user_id,
+            HealthRecord.date >= since
+        ).order_by(HealthRecord.date.asc()).all()
+
+        if not rows:
+            return "No specific health records found for the past week."
+
+        history_lines = []
+        for r in rows:
+            date_str = r.date.strftime('%Y-%m-%d')
+            # Format some key metrics
+            sleep = f"{r.deep_sleep_in_minutes}m deep sleep" if r.deep_sleep_in_minutes else "Sleep N/A"
+            stress = f"Stress lvl {r.stress}/4" if r.stress is not None else "Stress N/A"
+            mood = f"Mood {r.moodswing}/4" if r.moodswing is not None else "Mood N/A"
+            symptoms = []
+            if r.cramps and r.cramps > 0: symptoms.append(f"Cramps {r.cramps}/4")
+            if r.fatigue and r.fatigue > 0: symptoms.append(f"Fatigue {r.fatigue}/4")
+            if r.bloating and r.bloating > 0: symptoms.append(f"Bloating {r.bloating}/4")
+
+            symptoms_str = ", ".join(symptoms) if symptoms else "No major symptoms"
+
+            history_lines.append(f"- {date_str}: {sleep}, {stress}, {mood}. Symptoms: {symptoms_str}")
+
+        return "\n".join(history_lines)
+
+    @classmethod
+    def invalidate(cls, user_id):
+        with cls._lock:
+            cls._entries.pop(user_id, None)
+
+    @classmethod
+    def _on_records_saved(cls, sender, user_id=None, changes=(), **kwargs):
+        cls.invalidate(user_id)
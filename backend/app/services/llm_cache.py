@@ -0,0 +1,176 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from ..signals import health_records_saved
+from ..utils.metrics import counter
+
+LLM_CACHE_LOOKUPS = counter('llm_cache_lookups_total', 'Chat response cache lookups', ['result'])
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.]+$')
+
+
+def normalize_message(message):
+    """'  How am I doing today?? ' and 'how am i doing today' share a key."""
+    text = _WHITESPACE.sub(' ', str(message or '')).strip().lower()
+    return _TRAILING_PUNCTUATION.sub('', text)
+
+
+def _normalize_value(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    if isinstance(value, str):
+        text = _WHITESPACE.sub(' ', value).strip().lower()
+        try:
+            return round(float(text), 2)  # "85" and 85 are the same reading
+        except ValueError:
+            return text
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    if isinstance(value, dict):
+        return normalize_context(value)
+    return str(value)
+
+
+def normalize_context(context):
+    """Drops empty values and canonicalizes the rest so key order/format doesn't matter."""
+    normalized = {}
+    for key, value in (context or {}).items():
+        value = _normalize_value(value)
+        if value not in (None, '', [], {}):
+            normalized[str(key)] = value
+    return normalized
+
+
+class MemoryBackend:
+    """In-process LRU with a per-entry TTL."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, user_id, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, user_id, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user_id, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1] == user_id]:
+                del self._entries[key]
+
+
+class RedisBackend:
+    """
+    Shared cache for several workers (requires the redis package). Entries
+    expire through Redis TTLs; stale ones are never read because the key
+    includes the user's context version, so there is no explicit purge.
+    """
+
+    def __init__(self, url, ttl, prefix='neohealth:chat:'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Chat cache read failed: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    def set(self, key, user_id, value):
+        try:
+            self.client.setex(self.prefix + key, self.ttl, json.dumps(value))
+        except Exception as e:
+            print(f"Chat cache write failed: {e}")
+
+    def invalidate_user(self, user_id):
+        pass
+
+
+class LLMCache:
+    """
+    Exact-match cache for chat answers. The key covers everything the prompt
+    is built from: user, normalized context, the version of the user's
+    cached prompt context (name + rendered history, see
+    HistoryContextService), language, mode, model and the normalized
+    question. The version comes from that in-process cache, so a lookup runs
+    no query of its own. Saving a record changes the version, and the
+    in-process backend also drops that user's entries straight away.
+    """
+    backend = None
+
+    @classmethod
+    def init_app(cls, app):
+        config = app.config
+        kind = config.get('LLM_CACHE_BACKEND', 'memory')
+        ttl = config.get('LLM_CACHE_TTL', 3600)
+        cls.backend = None
+        if kind == 'redis':
+            try:
+                cls.backend = RedisBackend(config['LLM_CACHE_URL'], ttl)
+            except Exception as e:
+                print(f"Chat cache: Redis unavailable ({e}), using in-process cache")
+                kind = 'memory'
+        if kind == 'memory':
+            cls.backend = MemoryBackend(ttl, config.get('LLM_CACHE_MAX_ENTRIES', 1000))
+        health_records_saved.connect(cls._on_records_saved, weak=False)
+
+    @classmethod
+    def key(cls, user_id, data, version):
+        """Cache key for a chat request body, or None when caching is off or there is no version."""
+        if cls.backend is None or version is None:
+            return None
+        context = normalize_context(data.get('context'))
+        parts = {
+            "user": user_id,
+            "version": version,
+            "language": context.pop('language', 'en'),
+            "mode": context.pop('mode', 'normal'),
+            "model": data.get('model', 'gemini'),
+            "context": context,
+            "message": normalize_message(data.get('message'))
+        }
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+        return f"{user_id}:{digest}"
+
+    @classmethod
+    def get(cls, key):
+        if key is None:
+            return None
+        value = cls.backend.get(key)
+        LLM_CACHE_LOOKUPS.inc(result='hit' if value is not None else 'miss')
+        return value
+
+    @classmethod
+    def set(cls, key, user_id, value):
+        if key is not None:
+            cls.backend.set(key, user_id, value)
+
+    @classmethod
+    def _on_records_saved(cls, sender, user_id=None, changes=(), **kwargs):
+        if cls.backend is not None:
+            cls.backend.invalidate_user(user_id)
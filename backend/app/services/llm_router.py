@@ -0,0 +1,286 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+from .llm_service import LLMError, ProviderBusy, ProviderTimeout
+from ..utils.metrics import counter, gauge, histogram
+
+LLM_LATENCY = histogram('llm_request_seconds', 'LLM provider call latency', ['provider', 'outcome'])
+LLM_ROUTED = counter('llm_routing_decisions_total', 'LLM routing decisions', ['provider', 'decision'])
+LLM_CIRCUIT_OPEN = gauge('llm_circuit_open', '1 while the provider circuit breaker is open', ['provider'])
+
+
+class ProviderUnavailable(LLMError):
+    """The provider's circuit breaker is open."""
+
+
+class ProviderStats:
+    """
+    Rolling window of the last `window` calls to one provider plus a
+    circuit breaker. The breaker opens after `failure_threshold` consecutive
+    failures, or when more than `max_error_rate` of a full window failed.
+    After `cooldown` seconds one trial call is let through (half-open):
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name, window, failure_threshold, max_error_rate, cooldown):
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def p95(self):
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self):
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def release_trial(self):
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+                self.consecutive_failures = 0
+                self.opened_at = None
+            else:
+                self.consecutive_failures += 1
+                full_window = len(self.outcomes) == self.outcomes.maxlen
+                failing = self.outcomes.count(False) / len(self.outcomes) > self.max_error_rate
+                if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold \
+                        or (full_window and failing):
+                    if self.opened_at is None:
+                        print(f"LLM circuit opened for {self.name}")
+                    self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+            is_open = self.opened_at is not None
+        LLM_CIRCUIT_OPEN.set(1 if is_open else 0, provider=self.name)
+
+
+class _Call:
+    """One in-flight provider call; its outcome is recorded exactly once."""
+
+    def __init__(self, router, provider, future):
+        self.router = router
+        self.provider = provider
+        self.future = future
+        self.started = time.monotonic()
+        self._recorded = False
+        self._lock = threading.Lock()
+        future.add_done_callback(self._on_done)
+
+    def finish(self, ok, latency=None):
+        with self._lock:
+            if self._recorded:
+                return
+            self._recorded = True
+        if latency is None:
+            latency = time.monotonic() - self.started
+        self.router.record(self.provider, latency, ok)
+
+    def _on_done(self, future):
+        self.finish(not future.cancelled() and future.exception() is None)
+
+
+class LLMRouter:
+    """
+    Picks providers for a chat request. Providers whose breaker is open are
+    skipped without a call. If the first provider has not answered after its
+    hedge delay (its recent p95 latency, clamped to [hedge_min, hedge_max]),
+    the next provider is started as well and the first successful answer is
+    returned. A failed primary starts the next provider immediately.
+    """
+
+    def __init__(self, executor, window=50, failure_threshold=5, max_error_rate=0.5,
+                 cooldown=30.0, hedging=True, hedge_min=0.5, hedge_max=5.0, hedge_default=2.0):
+        self.executor = executor
+        self.hedging = hedging
+        self.hedge_min = hedge_min
+        self.hedge_max = hedge_max
+        self.hedge_default = hedge_default
+        self._stats_args = (window, failure_threshold, max_error_rate, cooldown)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def stats(self, provider):
+        with self._stats_lock:
+            if provider.name not in self._stats:
+                self._stats[provider.name] = ProviderStats(provider.name, *self._stats_args)
+            return self._stats[provider.name]
+
+    def allow(self, provider):
+        if self.stats(provider).allow():
+            return True
+        LLM_ROUTED.inc(provider=provider.name, decision='skipped_open')
+        return False
+
+    def record(self, provider, latency, ok):
+        self.stats(provider).record(latency, ok)
+        LLM_LATENCY.observe(latency, provider=provider.name, outcome='ok' if ok else 'error')
+
+    def hedge_delay(self, provider):
+        p95 = self.stats(provider).p95()
+        if p95 is None:
+            return self.hedge_default
+        return min(self.hedge_max, max(self.hedge_min, p95))
+
+    def _start(self, provider, prompt, system_instruction):
+        """Starts a call; returns a _Call, or the LLMError that prevented it."""
+        if not self.allow(provider):
+            return ProviderUnavailable(f"{provider.name} is temporarily disabled after repeated failures")
+        try:
+            return _Call(self, provider, self.executor.submit(provider, prompt, system_instruction))
+        except LLMError as e:
+            # Local saturation says nothing about provider health
+            self.stats(provider).release_trial()
+            return e
+
+    def complete(self, candidates, prompt, system_instruction):
+        """
+        Returns (provider, text). Raises ProviderBusy / ProviderUnavailable if
+        no call could be started, otherwise the last provider error.
+        """
+        pending = list(candidates)
+        running = {}  # future -> _Call
+        errors = []
+        started = []
+        hedged = False
+        deadline = time.monotonic() + self.executor.timeout
+
+        def start_next():
+            while pending:
+                call = self._start(pending.pop(0), prompt, system_instruction)
+                if isinstance(call, LLMError):
+                    errors.append(call)
+                    continue
+                running[call.future] = call
+                started.append(call.provider)
+                return True
+            return False
+
+        start_next()
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = self.hedging and pending and len(running) == 1
+            timeout = remaining
+            if can_hedge:
+                only = next(iter(running.values()))
+                hedge_at = only.started + self.hedge_delay(only.provider)
+                timeout = min(remaining, max(0.0, hedge_at - time.monotonic()))
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if can_hedge and start_next():
+                    hedged = True
+                    LLM_ROUTED.inc(provider=started[-1].name, decision='hedge')
+                continue
+
+            for future in done:
+                call = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    if call.provider is started[0]:
+                        decision = 'primary'
+                    else:
+                        decision = 'hedge_win' if hedged else 'fallback'
+                    LLM_ROUTED.inc(provider=call.provider.name, decision=decision)
+                    return call.provider, future.result()
+                print(f"{call.provider.name} API Error: {error}")
+                errors.append(error if isinstance(error, LLMError) else LLMError(str(error)))
+            if not running:
+                start_next()
+
+        for call in running.values():
+            call.finish(False, latency=self.executor.timeout)
+            errors.append(ProviderTimeout(f"{call.provider.name} did not answer within {self.executor.timeout}s"))
+
+        if not errors:
+            raise ProviderUnavailable("No LLM provider available")
+        provider_errors = [e for e in errors if not isinstance(e, (ProviderBusy, ProviderUnavailable))]
+        raise provider_errors[-1] if provider_errors else errors[-1]
+
+    def track_stream(self, provider, tokens):
+        """
+        Wraps a token generator: records time to first token as the latency
+        sample, and a failure if the stream errors out. A stream that is
+        closed or dropped before it ends records nothing but frees the
+        half-open trial, so the breaker can test the provider again.
+        """
+        return _TrackedStream(self, provider, tokens)
+
+
+class _TrackedStream:
+    """Token iterator for LLMRouter.track_stream; settles the breaker exactly once."""
+
+    def __init__(self, router, provider, tokens):
+        self.router = router
+        self.provider = provider
+        self.tokens = tokens
+        self.started = time.monotonic()
+        self.first_token_at = None
+        self._settled = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            token = next(self.tokens)
+        except StopIteration:
+            self._settle(ok=True)
+            raise
+        except Exception:
+            self._settle(ok=False)
+            raise
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        return token
+
+    def close(self):
+        try:
+            self.tokens.close()
+        finally:
+            self._settle(ok=None)
+
+    def __del__(self):
+        self._settle(ok=None)
+
+    def _settle(self, ok):
+        if self._settled:
+            return
+        self._settled = True
+        if ok is None:
+            # Client went away or the stream was never read: no verdict on the provider
+            self.router.stats(self.provider).release_trial()
+        elif ok:
+            self.router.record(self.provider, (self.first_token_at or time.monotonic()) - self.started, True)
+            LLM_ROUTED.inc(provider=self.provider.name, decision='stream')
+        else:
+            self.router.record(self.provider, time.monotonic() - self.started, False)
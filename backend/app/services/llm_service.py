@@ -0,0 +1,292 @@
+import os
+from abc import ABC, abstractmethod
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import google.generativeai as genai
+from groq import Groq
+
+
+class LLMError(Exception):
+    """Provider call failed."""
+
+
+class ProviderBusy(LLMError):
+    """All concurrency slots for the provider are taken."""
+
+
+class ProviderTimeout(LLMError):
+    """The provider did not answer (or stopped streaming) within the timeout."""
+
+
+class LLMProvider(ABC):
+    name = None
+
+    def available(self):
+        return True
+
+    def complete(self, prompt, system_instruction):
+        return "".join(self.stream(prompt, system_instruction))
+
+    @abstractmethod
+    def stream(self, prompt, system_instruction):
+        """Yields the answer's text chunks as the provider produces them."""
+
+
+class GeminiProvider(LLMProvider):
+    name = 'gemini'
+    MODEL = 'gemini-flash-latest'
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._models = {}
+        self._models_lock = threading.Lock()
+        if api_key:
+            genai.configure(api_key=api_key)
+
+    def available(self):
+        return bool(self.api_key)
+
+    def _model(self, system_instruction):
+        # One GenerativeModel per system instruction (there is only one today)
+        model = self._models.get(system_instruction)
+        if model is None:
+            with self._models_lock:
+                model = self._models.setdefault(
+                    system_instruction,
+                    genai.GenerativeModel(self.MODEL, system_instruction=system_instruction)
+                )
+        return model
+
+    def complete(self, prompt, system_instruction):
+        return self._model(system_instruction).generate_content(prompt).text
+
+    def stream(self, prompt, system_instruction):
+        for chunk in self._model(system_instruction).generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class GroqProvider(LLMProvider):
+    """Llama 3 via Groq."""
+    name = 'groq'
+    MODEL = 'llama-3.1-8b-instant'
+
+    def __init__(self, api_key):
+        self.client = Groq(api_key=api_key) if api_key else None
+
+    def available(self):
+        return self.client is not None
+
+    def _create(self, prompt, system_instruction, stream):
+        return self.client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_instruction},
+                {"role": "user", "content": prompt}
+            ],
+            model=self.MODEL,
+            temperature=0.7,
+            max_tokens=1024,
+            top_p=1,
+            stream=stream,
+            stop=None,
+        )
+
+    def complete(self, prompt, system_instruction):
+        return self._create(prompt, system_instruction, stream=False).choices[0].message.content
+
+    def stream(self, prompt, system_instruction):
+        for chunk in self._create(prompt, system_instruction, stream=True):
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+
+class FakeProvider(LLMProvider):
+    """Local stand-in for tests and load checks: echoes the question word by word."""
+    name = 'fake'
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+
+    def stream(self, prompt, system_instruction):
+        if self.fail:
+            raise LLMError("fake provider failure")
+        question = prompt.split('USER QUESTION:')[-1].split('\n')[0].strip().strip('"')
+        for word in f"(fake) You asked: {question}".split(' '):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word + ' '
+
+
+_DONE = object()
+
+
+class LLMExecutor:
+    """
+    Runs provider calls on a bounded thread pool. Each provider has its own
+    slot limit: a request that cannot get a slot within `acquire_timeout`
+    fails fast with ProviderBusy instead of queueing, so slow LLM traffic can
+    only ever hold that many request threads.
+    """
+
+    def __init__(self, max_workers, limits, timeout, acquire_timeout):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+        self.limits = limits
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+    def _slot(self, provider):
+        with self._slots_lock:
+            if provider.name not in self._slots:
+                limit = self.limits.get(provider.name, self.limits.get('default', 4))
+                self._slots[provider.name] = threading.BoundedSemaphore(limit)
+            return self._slots[provider.name]
+
+    def _acquire(self, provider):
+        slot = self._slot(provider)
+        if not slot.acquire(timeout=self.acquire_timeout):
+            raise ProviderBusy(f"{provider.name} is at its concurrency limit")
+        return slot
+
+    def submit(self, provider, prompt, system_instruction):
+        """Takes a slot and starts provider.complete on the pool; returns the Future."""
+        slot = self._acquire(provider)
+
+        def call():
+            try:
+                return provider.complete(prompt, system_instruction)
+            finally:
+                slot.release()
+
+        try:
+            return self.pool.submit(call)
+        except Exception:
+            slot.release()
+            raise
+
+    def complete(self, provider, prompt, system_instruction):
+        future = self.submit(provider, prompt, system_instruction)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise ProviderTimeout(f"{provider.name} did not answer within {self.timeout}s")
+
+    def stream(self, provider, prompt, system_instruction):
+        """
+        Returns a generator of tokens. The provider is iterated on the pool;
+        tokens are handed over through a queue. Closing the generator (client
+        disconnect) stops the producer at the next token.
+        """
+        slot = self._acquire(provider)
+        tokens = queue.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for token in provider.stream(prompt, system_instruction):
+                    if cancelled.is_set():
+                        break
+                    tokens.put(token)
+                tokens.put(_DONE)
+            except Exception as e:
+                tokens.put(e)
+            finally:
+                slot.release()
+
+        try:
+            self.pool.submit(produce)
+        except Exception:
+            slot.release()
+            raise
+
+        def consume():
+            try:
+                while True:
+                    try:
+                        item = tokens.get(timeout=self.timeout)
+                    except queue.Empty:
+                        raise ProviderTimeout(f"{provider.name} stalled for {self.timeout}s")
+                    if item is _DONE:
+                        return
+                    if isinstance(item, Exception):
+                        raise item if isinstance(item, LLMError) else LLMError(str(item))
+                    yield item
+            finally:
+                cancelled.set()
+
+        return consume()
+
+
+class LLMService:
+    """Provider registry plus the shared executor, configured once in create_app."""
+    providers = {}
+    executor = None
+    router = None
+    forced_provider = None
+
+    @classmethod
+    def init_app(cls, app):
+        config = app.config
+        cls.providers = {}
+        cls.register_provider(GeminiProvider(os.environ.get('GEMINI_API_KEY')))
+        cls.register_provider(GroqProvider(os.environ.get('GROQ_API_KEY')))
+        cls.register_provider(FakeProvider(delay=config.get('LLM_FAKE_DELAY', 0.0)))
+        cls.forced_provider = config.get('LLM_PROVIDER') or None
+        cls.executor = LLMExecutor(
+            max_workers=config.get('LLM_MAX_WORKERS', 8),
+            limits={
+                'gemini': config.get('LLM_CONCURRENCY_GEMINI', 4),
+                'groq': config.get('LLM_CONCURRENCY_GROQ', 4),
+                'default': config.get('LLM_CONCURRENCY_DEFAULT', 4)
+            },
+            timeout=config.get('LLM_TIMEOUT', 30.0),
+            acquire_timeout=config.get('LLM_QUEUE_TIMEOUT', 1.0)
+        )
+        from .llm_router import LLMRouter
+        cls.router = LLMRouter(
+            cls.executor,
+            failure_threshold=config.get('LLM_BREAKER_FAILURES', 5),
+            max_error_rate=config.get('LLM_BREAKER_ERROR_RATE', 0.5),
+            cooldown=config.get('LLM_BREAKER_COOLDOWN', 30.0),
+            hedging=config.get('LLM_HEDGING', True),
+            hedge_min=config.get('LLM_HEDGE_MIN_DELAY', 0.5),
+            hedge_max=config.get('LLM_HEDGE_MAX_DELAY', 5.0)
+        )
+
+    @classmethod
+    def register_provider(cls, provider):
+        cls.providers[provider.name] = provider
+
+    @classmethod
+    def candidates(cls, preference):
+        """Providers to try, in order. 'llama' means Groq only; default is Gemini then Groq."""
+        if cls.forced_provider:
+            names = [cls.forced_provider]
+        elif preference == 'llama':
+            names = ['groq']
+        else:
+            names = ['gemini', 'groq']
+        return [cls.providers[n] for n in names if n in cls.providers and cls.providers[n].available()]
+
+    @classmethod
+    def complete(cls, candidates, prompt, system_instruction):
+        """Routes through the breaker/hedging router; returns (provider, text)."""
+        return cls.router.complete(candidates, prompt, system_instruction)
+
+    @classmethod
+    def stream(cls, provider, prompt, system_instruction):
+        from .llm_router import ProviderUnavailable
+        if not cls.router.allow(provider):
+            raise ProviderUnavailable(f"{provider.name} is temporarily disabled after repeated failures")
+        try:
+            tokens = cls.executor.stream(provider, prompt, system_instruction)
+        except Exception:
+            # Local saturation says nothing about provider health
+            cls.router.stats(provider).release_trial()
+            raise
+        return cls.router.track_stream(provider, tokens)
@@ -1,21 +1,396 @@
+import hashlib
+import json
 import os
+import queue
+import time
+import threading
+from concurrent.futures import Future
 import joblib
-import pandas as pd
 import numpy as np
+import xgboost as xgb
 from flask import current_app
+from ..utils.metrics import histogram
+
+# Model input order (matches train_and_save_model.py)
+CURRENT_COLUMNS = ["lh","estrogen","pdg","cramps","fatigue","moodswing","stress","bloating","sleepissue",
+                   "overall_score","deep_sleep_in_minutes","avg_resting_heart_rate","stress_score","daily_steps"]
+# (column, days back) for the historical features appended after CURRENT_COLUMNS
+LAG_FEATURES = [("lh", 1), ("lh", 2), ("estrogen", 1), ("pdg", 1), ("stress", 1)]
+FEATURE_COLUMNS = CURRENT_COLUMNS + [f"{col}_prev{lag}" for col, lag in LAG_FEATURES]
+MAX_LAG = max(lag for _, lag in LAG_FEATURES)
+# Study phase labels (data/raw) -> the classes the model predicts (feature_pipeline.py applies it)
+PHASE_SIMPLE = {
+    "Menstrual": "Low Hormone",
+    "Follicular": "Rising Hormone",
+    "Fertility": "Peak Hormone",
+    "Luteal": "High Progesterone"
+}
+
+ML_INFERENCE = histogram(
+    'ml_inference_seconds', 'Phase model scoring time (features to labels)', ['kind'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+)
+ML_BATCH_ROWS = histogram(
+    'ml_microbatch_rows', 'Rows per coalesced scoring call',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+ML_BATCH_WAIT = histogram(
+    'ml_microbatch_queue_wait_seconds', 'Time a request waited for its micro-batch to run',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+
+def _softmax(margins):
+    shifted = margins - margins.max(axis=1, keepdims=True)
+    np.exp(shifted, out=shifted)
+    shifted /= shifted.sum(axis=1, keepdims=True)
+    return shifted
+
+
+class InferenceEngine:
+    """
+    Precompiled scorer built once from the loaded artifacts.
+    The StandardScaler is folded into a plain affine transform and the
+    XGBoost model is called through its native Booster, so a request costs
+    one margin pass plus a softmax instead of sklearn's validation paths
+    and separate predict/predict_proba calls.
+    """
+
+    def __init__(self, classes, mean=None, scale=None, booster=None, model=None):
+        self.classes = np.asarray(classes)
+        self.n_features = len(FEATURE_COLUMNS)
+
+        mean = np.zeros(self.n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(self.n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+        # (x - mean) / scale == x * inv_scale + offset
+        self.inv_scale = 1.0 / scale
+        self.offset = -mean * self.inv_scale
+
+        self.model = model
+        self.booster = booster
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, label_encoder):
+        mean = getattr(scaler, 'mean_', None) if getattr(scaler, 'with_mean', True) else None
+        scale = getattr(scaler, 'scale_', None) if getattr(scaler, 'with_std', True) else None
+        booster = model.get_booster() if hasattr(model, 'get_booster') else None
+        return cls(label_encoder.classes_, mean, scale, booster=booster, model=model)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        X *= self.inv_scale
+        X += self.offset
+        return X
+
+    def predict_proba(self, X):
+        X_scaled = self.transform(X)
+        if self.booster is None:
+            return self.model.predict_proba(X_scaled)
+
+        margins = self.booster.inplace_predict(X_scaled, predict_type='margin')
+        margins = np.asarray(margins, dtype=np.float64)
+        if margins.ndim == 1:
+            # Binary objective: single logit per row
+            p = 1.0 / (1.0 + np.exp(-margins))
+            return np.column_stack([1.0 - p, p])
+        return _softmax(margins)
+
+    def predict(self, X):
+        """Returns (labels, confidences) from a single probability pass."""
+        probs = self.predict_proba(X)
+        best = probs.argmax(axis=1)
+        return self.classes[best], probs[np.arange(len(best)), best]
+
+
+ARTIFACT_FILES = ('model.joblib', 'scaler.joblib', 'label_encoder.joblib')
+# Native bundle (no pickles): XGBoost UBJSON booster + JSON preprocessing parameters
+NATIVE_MODEL_FILE = 'model.ubj'
+PREPROCESS_FILE = 'preprocess.json'
+NATIVE_FORMAT = 'xgboost-ubj-v1'
+# Written by train_and_save_model.py: names the active directory under versions/
+LATEST_POINTER = 'LATEST'
+VERSIONS_DIR = 'versions'
+MANIFEST_FILE = 'manifest.json'
+
+
+def resolve_model_dir(base_dir):
+    """Returns (directory, version) of the active artifacts under ML_MODEL_PATH."""
+    pointer = os.path.join(base_dir, LATEST_POINTER)
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            version = f.read().strip()
+        if version:
+            return os.path.join(base_dir, VERSIONS_DIR, version), version
+    return base_dir, 'default'
+
+
+def artifact_signature(base_dir):
+    """Cheap change detector: active directory plus manifest/artifact mtimes."""
+    model_dir, version = resolve_model_dir(base_dir)
+    manifest = os.path.join(model_dir, MANIFEST_FILE)
+    paths = [manifest] if os.path.exists(manifest) else [os.path.join(model_dir, f) for f in ARTIFACT_FILES]
+    return (model_dir, version) + tuple(os.stat(p).st_mtime_ns for p in paths)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(model_dir):
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_native_bundle(out_dir, model, scaler, label_encoder, feature_columns=FEATURE_COLUMNS):
+    """
+    Writes model.ubj and preprocess.json for a fitted XGBClassifier,
+    StandardScaler and LabelEncoder. Returns {file name: sha256}.
+    """
+    model.get_booster().save_model(os.path.join(out_dir, NATIVE_MODEL_FILE))
+    preprocess = {
+        "format": NATIVE_FORMAT,
+        "feature_columns": list(feature_columns),
+        "classes": [str(c) for c in label_encoder.classes_],
+        "scaler": {
+            "mean": scaler.mean_.tolist() if getattr(scaler, 'with_mean', True) else None,
+            "scale": scaler.scale_.tolist() if getattr(scaler, 'with_std', True) else None
+        }
+    }
+    with open(os.path.join(out_dir, PREPROCESS_FILE), 'w') as f:
+        json.dump(preprocess, f, indent=2)
+    return {name: file_sha256(os.path.join(out_dir, name)) for name in (NATIVE_MODEL_FILE, PREPROCESS_FILE)}
+
+
+class ModelBundle:
+    """
+    One consistent set of loaded artifacts; swapped as a whole on reload.
+    Prefers the native bundle when the manifest lists one (checksums are
+    verified first); otherwise loads the joblib pickles. model / scaler /
+    label_encoder are only set for the joblib format.
+    """
+
+    def __init__(self, model_dir, version, signature, prefer_native=True):
+        self.model_dir = model_dir
+        self.version = version
+        self.signature = signature
+        self.model = self.scaler = self.label_encoder = None
+        manifest = read_manifest(model_dir)
+        if prefer_native and manifest and manifest.get('native'):
+            self.format = 'native'
+            self.engine = self._load_native(manifest)
+        else:
+            self.format = 'joblib'
+            self.model = joblib.load(os.path.join(model_dir, 'model.joblib'))
+            self.scaler = joblib.load(os.path.join(model_dir, 'scaler.joblib'))
+            self.label_encoder = joblib.load(os.path.join(model_dir, 'label_encoder.joblib'))
+            self.engine = InferenceEngine.from_sklearn(self.model, self.scaler, self.label_encoder)
+        self.loaded_at = time.time()
+
+    def _load_native(self, manifest):
+        native = manifest['native']
+        checksums = manifest.get('checksums', {})
+        for name in (native['model'], native['preprocess']):
+            expected = checksums.get(name)
+            if expected and file_sha256(os.path.join(self.model_dir, name)) != expected:
+                raise ValueError(f"Checksum mismatch for {name} in {self.model_dir}")
+
+        with open(os.path.join(self.model_dir, native['preprocess'])) as f:
+            preprocess = json.load(f)
+        if preprocess.get('format') != NATIVE_FORMAT:
+            raise ValueError(f"Unsupported model bundle format: {preprocess.get('format')}")
+        if preprocess['feature_columns'] != FEATURE_COLUMNS:
+            raise ValueError("Model bundle feature order does not match FEATURE_COLUMNS")
+
+        booster = xgb.Booster()
+        booster.load_model(os.path.join(self.model_dir, native['model']))
+        scaler = preprocess['scaler']
+        return InferenceEngine(preprocess['classes'], scaler['mean'], scaler['scale'], booster=booster)
+
+    def warm_up(self):
+        # First booster call allocates predictor buffers; pay that here, not on a request
+        self.engine.predict(np.zeros((1, len(FEATURE_COLUMNS))))
+
+
+class MicroBatcher:
+    """
+    Coalesces small scoring calls from concurrent requests. A dispatcher
+    thread takes the first waiting request, keeps collecting for up to
+    `window` seconds or `max_rows` rows, scores the stacked matrix in one
+    pass and hands each caller its slice. Requests carry the engine they
+    resolved, so a hot reload mid-window never mixes model versions.
+    """
+
+    def __init__(self, window, max_rows):
+        self.window = window
+        self.max_rows = max_rows
+        self._queue = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads don't survive fork: a batcher created in a preloading
+        # master starts its dispatcher in each worker on first use
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._loop, args=(self._queue,), name='ml-microbatch', daemon=True).start()
+                self._pid = os.getpid()
+
+    def predict(self, engine, X):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((engine, X, future, time.perf_counter()))
+        return future.result()
+
+    def _loop(self, pending):
+        while True:
+            batch = [pending.get()]
+            rows = len(batch[0][1])
+            deadline = time.perf_counter() + self.window
+            while rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows += len(item[1])
+
+            by_engine = {}
+            for item in batch:
+                by_engine.setdefault(id(item[0]), []).append(item)
+            for items in by_engine.values():
+                self._run(items)
+
+    @staticmethod
+    def _run(items):
+        started = time.perf_counter()
+        for _, _, _, queued_at in items:
+            ML_BATCH_WAIT.observe(started - queued_at)
+        try:
+            X = np.vstack([item[1] for item in items])
+            ML_BATCH_ROWS.observe(len(X))
+            labels, confidences = items[0][0].predict(X)
+            ML_INFERENCE.observe(time.perf_counter() - started, kind='microbatch')
+        except Exception as e:
+            for _, _, future, _ in items:
+                future.set_exception(e)
+            return
+        offset = 0
+        for _, rows, future, _ in items:
+            n = len(rows)
+            future.set_result((labels[offset:offset + n], confidences[offset:offset + n]))
+            offset += n
+
 
 class MLService:
-    _model = None
-    _scaler = None
-    _le = None
+    _bundle = None
+    _lock = threading.Lock()
+    _base_dir = None
+    _reload_interval = 5.0
+    _next_check = 0.0
+    _failed_signature = None
+    _reloading = False
+    _batcher = None
+    _prefer_native = True
 
     @classmethod
-    def load_resources(cls):
-        if cls._model is None:
-            model_dir = current_app.config['ML_MODEL_PATH']
-            cls._model = joblib.load(os.path.join(model_dir, 'model.joblib'))
-            cls._scaler = joblib.load(os.path.join(model_dir, 'scaler.joblib'))
-            cls._le = joblib.load(os.path.join(model_dir, 'label_encoder.joblib'))
+    def init_app(cls, app):
+        """Loads and warms the model bundle at startup so no request pays the cold start."""
+        cls._base_dir = app.config['ML_MODEL_PATH']
+        cls._reload_interval = app.config.get('ML_RELOAD_INTERVAL', 5.0)
+        cls._prefer_native = app.config.get('ML_MODEL_FORMAT', 'auto') != 'joblib'
+        window_ms = app.config.get('ML_BATCH_WINDOW_MS', 0)
+        if window_ms > 0 and cls._batcher is None:
+            cls._batcher = MicroBatcher(window_ms / 1000.0, app.config.get('ML_BATCH_MAX_ROWS', 64))
+        try:
+            bundle = cls.load_resources()
+            print(f" * ML model loaded (version: {bundle.version}, format: {bundle.format}).")
+        except Exception as e:
+            print(f" * ML model not loaded at startup: {e}")
+
+    @classmethod
+    def load_resources(cls, model_dir=None):
+        """
+        Returns the active ModelBundle, loading it on first use. When the
+        artifacts in ML_MODEL_PATH change (checked at most every
+        ML_RELOAD_INTERVAL seconds; 0 disables hot reload) the new version is
+        loaded and warmed on a background thread and swapped in atomically;
+        requests keep using the current bundle meanwhile.
+        """
+        bundle = cls._bundle
+        now = time.monotonic()
+        if bundle is not None and (cls._reload_interval <= 0 or now < cls._next_check):
+            return bundle
+
+        base_dir = model_dir or cls._base_dir or current_app.config['ML_MODEL_PATH']
+        with cls._lock:
+            bundle = cls._bundle
+            if bundle is not None and now < cls._next_check:
+                return bundle  # another thread checked while we waited
+            cls._next_check = now + cls._reload_interval
+
+            try:
+                signature = artifact_signature(base_dir)
+            except OSError:
+                if bundle is not None:
+                    return bundle  # artifacts mid-replace; keep serving the current model
+                raise
+
+            if bundle is None:
+                bundle = cls._load_bundle(signature)
+                cls._bundle = bundle
+                return bundle
+
+            if signature not in (bundle.signature, cls._failed_signature) and not cls._reloading:
+                cls._reloading = True
+                threading.Thread(target=cls._reload, args=(signature,), daemon=True).start()
+            return bundle
+
+    @staticmethod
+    def _load_bundle(signature):
+        bundle = ModelBundle(signature[0], signature[1], signature, prefer_native=MLService._prefer_native)
+        bundle.warm_up()
+        return bundle
+
+    @classmethod
+    def _reload(cls, signature):
+        old_version = cls._bundle.version
+        try:
+            new_bundle = cls._load_bundle(signature)
+        except Exception as e:
+            cls._failed_signature = signature
+            print(f"ML model reload failed, keeping version {old_version}: {e}")
+        else:
+            cls._bundle = new_bundle
+            print(f"ML model reloaded: {old_version} -> {new_bundle.version}")
+        finally:
+            cls._reloading = False
+
+    @staticmethod
+    def build_features(data_dict, historical_records=None):
+        """
+        data_dict: current day's health metrics
+        historical_records: list of previous days' records, most recent first (if available)
+        Returns one feature row in FEATURE_COLUMNS order; missing values are 0.
+        """
+        historical_records = historical_records or []
+        features = [data_dict.get(col, 0) for col in CURRENT_COLUMNS]
+        for col, lag in LAG_FEATURES:
+            prev = historical_records[lag - 1] if len(historical_records) >= lag else {}
+            features.append(prev.get(col, 0))
+        return features
 
     @classmethod
     def predict(cls, data_dict, historical_records=None):
@@ -23,46 +398,61 @@ class MLService:
         data_dict: current day's health metrics
         historical_records: list of previous 2 days' records (if available)
         """
-        cls.load_resources()
-
-        # Prepare features array (matching training features)
-        # ["lh","estrogen","pdg","cramps","fatigue","moodswing","stress","bloating","sleepissue",
-        #  "overall_score","deep_sleep_in_minutes","avg_resting_heart_rate","stress_score","daily_steps",
-        #  "lh_prev1","lh_prev2","estrogen_prev1","pdg_prev1","stress_prev1"]
-        
-        features = []
-        # Current day features
-        current_cols = ["lh","estrogen","pdg","cramps","fatigue","moodswing","stress","bloating","sleepissue",
-                        "overall_score","deep_sleep_in_minutes","avg_resting_heart_rate","stress_score","daily_steps"]
-        
-        for col in current_cols:
-            features.append(data_dict.get(col, 0))
-            
-        # Historical features (defaults to 0 if not available)
-        prev1 = historical_records[0] if historical_records and len(historical_records) > 0 else {}
-        prev2 = historical_records[1] if historical_records and len(historical_records) > 1 else {}
-        
-        features.append(prev1.get('lh', 0))
-        features.append(prev2.get('lh', 0))
-        features.append(prev1.get('estrogen', 0))
-        features.append(prev1.get('pdg', 0))
-        features.append(prev1.get('stress', 0))
-        
-        # Convert to numpy and reshape for prediction
-        X = np.array(features).reshape(1, -1)
-        
-        # Scale
-        X_scaled = cls._scaler.transform(X)
-        
-        # Predict
-        prediction_encoded = cls._model.predict(X_scaled)[0]
-        prediction_label = cls._le.inverse_transform([prediction_encoded])[0]
-        
-        # Get probability/confidence
-        probs = cls._model.predict_proba(X_scaled)[0]
-        confidence = float(np.max(probs))
-        
+        engine = cls.load_resources().engine
+
+        labels, confidences = cls._score(engine, cls.build_features(data_dict, historical_records), 'single')
+
         return {
-            "phase": prediction_label,
-            "confidence": confidence
+            "phase": str(labels[0]),
+            "confidence": float(confidences[0])
         }
+
+    @classmethod
+    def _score(cls, engine, X, kind):
+        """Small inputs go through the micro-batcher when it is enabled."""
+        X = np.array(X, dtype=float, ndmin=2)
+        batcher = cls._batcher
+        if batcher is not None and len(X) < batcher.max_rows:
+            return batcher.predict(engine, X)
+        started = time.perf_counter()
+        labels, confidences = engine.predict(X)
+        ML_INFERENCE.observe(time.perf_counter() - started, kind=kind)
+        return labels, confidences
+
+    @staticmethod
+    def build_lagged_features(daily_values):
+        """
+        daily_values: (D, len(CURRENT_COLUMNS)) array with one row per consecutive
+        calendar day, zeros for days without data.
+        Returns the (D - MAX_LAG, len(FEATURE_COLUMNS)) feature matrix for days
+        MAX_LAG..D-1, lag columns taken by shifting the same array.
+        """
+        daily_values = np.asarray(daily_values, dtype=float)
+        n = daily_values.shape[0] - MAX_LAG
+        if n <= 0:
+            return np.empty((0, len(FEATURE_COLUMNS)))
+
+        lag_cols = [
+            daily_values[MAX_LAG - lag:MAX_LAG - lag + n, CURRENT_COLUMNS.index(col)]
+            for col, lag in LAG_FEATURES
+        ]
+        return np.column_stack([daily_values[MAX_LAG:]] + lag_cols)
+
+    @classmethod
+    def predict_batch(cls, X):
+        """
+        X: (N, len(FEATURE_COLUMNS)) feature matrix.
+        Scores all rows with a single probability pass.
+        """
+        engine = cls.load_resources().engine
+
+        X = np.asarray(X, dtype=float)
+        if X.shape[0] == 0:
+            return []
+
+        labels, confidences = cls._score(engine, X, 'batch')
+
+        return [
+            {"phase": str(label), "confidence": float(conf)}
+            for label, conf in zip(labels, confidences)
+        ]
@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from .. import db
+from ..signals import health_records_saved, predictions_saved
+from ..utils.metrics import counter, gauge, histogram
+from ..utils.query_guard import unmetered
+from .feature_loader import FeatureLoader
+from .ml_service import MAX_LAG
+
+# A job never spans more than this many days (bulk imports are split)
+MAX_JOB_DAYS = 366
+
+PIPELINE_QUEUE_DEPTH = gauge('prediction_pipeline_queue_depth', 'Scoring jobs queued or running')
+PIPELINE_JOBS = counter('prediction_pipeline_jobs_total', 'Background scoring jobs', ['outcome'])
+PIPELINE_JOB_LATENCY = histogram('prediction_pipeline_job_seconds', 'Background scoring job duration')
+
+
+def affected_ranges(dates):
+    """
+    Saved dates -> contiguous (start, end) ranges to rescore: each saved day
+    plus the MAX_LAG days after it, whose lag features include it.
+    """
+    days = sorted({d + timedelta(days=k) for d in dates for k in range(MAX_LAG + 1)})
+    ranges = []
+    for day in days:
+        if ranges and (day - ranges[-1][1]).days == 1 and (day - ranges[-1][0]).days < MAX_JOB_DAYS:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(r) for r in ranges]
+
+
+class PredictionPipeline:
+    """
+    Scores predictions when health records are saved, so clients don't need
+    a /predict round trip after /record. PREDICTION_PIPELINE selects:
+
+        'off'    nothing is scored on save (default)
+        'async'  jobs run on a small in-process thread pool after the response
+        'sync'   jobs run inline in the saving request (tests)
+
+    Each job loads the window through FeatureLoader, scores it and upserts
+    the results, then sends predictions_saved like /predict-batch. Days that
+    lost their record (a record moved to another date) have their stored
+    prediction deleted, and the days after them are rescored. Jobs live
+    in the worker process: one lost to a restart is recomputed by the next
+    save for that user or an explicit /predict.
+    """
+    mode = 'off'
+    _executor = None
+    _pending = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def init_app(cls, app):
+        cls.mode = app.config.get('PREDICTION_PIPELINE', 'off')
+        if cls.mode == 'off':
+            return
+        if cls.mode == 'async' and cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=app.config.get('PREDICTION_PIPELINE_WORKERS', 2),
+                thread_name_prefix='predict'
+            )
+        health_records_saved.connect(cls._on_records_saved, weak=False)
+
+    @classmethod
+    def _on_records_saved(cls, sender, user_id=None, changes=(), **kwargs):
+        if cls.mode == 'off':
+            return
+        # Removed days count too: the days after them had it in their lag features
+        dates = [c['date'] for c in changes]
+        removed = {c['date'] for c in changes if c['after'] is None}
+        for start, end in affected_ranges(dates):
+            cls.enqueue(sender, user_id, start, end, tuple(sorted(d for d in removed if start <= d <= end)))
+
+    @classmethod
+    def enqueue(cls, app, user_id, start_date, end_date, removed=()):
+        if cls.mode == 'sync':
+            cls._run(app, user_id, start_date, end_date, removed, inline=True)
+            return
+        key = (user_id, start_date, end_date, removed)
+        with cls._lock:
+            if key in cls._pending:
+                return  # an identical job is already waiting
+            cls._pending.add(key)
+        PIPELINE_QUEUE_DEPTH.inc()
+        cls._executor.submit(cls._run, app, user_id, start_date, end_date, removed)
+
+    @classmethod
+    def _run(cls, app, user_id, start_date, end_date, removed=(), inline=False):
+        started = time.perf_counter()
+        if not inline:
+            with cls._lock:
+                # Later saves for this range can queue a fresh job from here on
+                cls._pending.discard((user_id, start_date, end_date, removed))
+        try:
+            if inline:
+                # Runs inside the saving request; its queries belong to the job, not the endpoint
+                with unmetered():
+                    cls._score(app, user_id, start_date, end_date, removed)
+            else:
+                with app.app_context():
+                    cls._score(app, user_id, start_date, end_date, removed)
+            PIPELINE_JOBS.inc(outcome='ok')
+        except Exception as e:
+            PIPELINE_JOBS.inc(outcome='error')
+            print(f"Background prediction failed for user {user_id} ({start_date}..{end_date}): {e}")
+        finally:
+            PIPELINE_JOB_LATENCY.observe(time.perf_counter() - started)
+            if not inline:
+                PIPELINE_QUEUE_DEPTH.dec()
+
+    @staticmethod
+    def _score(app, user_id, start_date, end_date, removed=()):
+        window = FeatureLoader.load(user_id, start_date, end_date)
+        # A removed day may have been filled again by the same save
+        vacated = set(removed) - set(window.days)
+        if not window.days and not vacated:
+            db.session.rollback()
+            return
+        try:
+            changes = FeatureLoader.delete(user_id, vacated) if vacated else []
+            if window.days:
+                changes += FeatureLoader.store(window, FeatureLoader.score(window))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        predictions_saved.send(app, user_id=user_id, changes=changes)
@@ -0,0 +1,96 @@
+import re
+from datetime import datetime
+from sqlalchemy import update
+from .. import db
+from ..models import HealthRecord
+
+# Lexicon: token -> weight. Editing it and running rescore_sentiment.py
+# brings stored scores in line with the new list.
+LEXICON = {
+    'good': 0.25, 'great': 0.25, 'happy': 0.25, 'excellent': 0.25,
+    'amazing': 0.25, 'fine': 0.25, 'well': 0.25, 'better': 0.25,
+    'bad': -0.25, 'sad': -0.25, 'stressed': -0.25, 'tired': -0.25,
+    'pain': -0.25, 'cramps': -0.25, 'awful': -0.25, 'terrible': -0.25
+}
+NEGATORS = frozenset(['not', 'no', 'never', 'nothing', 'hardly', 'barely', 'without',
+                      'dont', 'didnt', 'isnt', 'wasnt', 'cant', 'wont', 'aint'])
+# A negator flips the next NEGATION_WINDOW tokens ("not feeling well"), up to a clause break
+NEGATION_WINDOW = 3
+CLAUSE_BREAKS = frozenset('.,;:!?')
+
+# Whole words (with an optional apostrophe part, "don't") or clause punctuation
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.,;:!?]")
+# Typographic apostrophes (mobile keyboards) read as "'"
+_APOSTROPHES = str.maketrans({'\u2019': "'", '\u2018': "'", '\u02bc': "'"})
+
+RESCORE_CHUNK = 5000
+
+
+def score_note(note):
+    """Sentiment of a daily note in [-1, 1]; 0.0 for empty notes."""
+    if not note:
+        return 0.0
+    score = 0.0
+    negated = 0
+    for token in _TOKEN.findall(note.lower().translate(_APOSTROPHES)):
+        if token in CLAUSE_BREAKS:
+            negated = 0
+            continue
+        if token in NEGATORS or token.endswith("n't"):
+            negated = NEGATION_WINDOW
+            continue
+        weight = LEXICON.get(token)
+        if weight:
+            score += -weight if negated else weight
+        if negated:
+            negated -= 1
+    return max(-1.0, min(1.0, score))
+
+
+class SentimentService:
+
+    @staticmethod
+    def rescore(chunk_size=RESCORE_CHUNK, user_id=None, dry_run=False, progress=None):
+        """
+        Recomputes sentiment_score for every record with a daily note.
+
+        Walks the table in primary-key order, chunk_size rows per query
+        (id > last seen id), so memory stays flat however large the table is
+        and each chunk commits on its own. Only rows whose score changed are
+        written, in one executemany UPDATE per chunk.
+
+        Returns {"scanned": n, "updated": n}.
+        """
+        scanned = updated = 0
+        last_id = 0
+        while True:
+            query = db.session.query(HealthRecord.id, HealthRecord.daily_note, HealthRecord.sentiment_score).filter(
+                HealthRecord.id > last_id,
+                HealthRecord.daily_note.isnot(None)
+            )
+            if user_id is not None:
+                query = query.filter(HealthRecord.user_id == user_id)
+            rows = query.order_by(HealthRecord.id).limit(chunk_size).all()
+            if not rows:
+                break
+
+            now = datetime.utcnow()
+            changed = []
+            for record_id, note, current in rows:
+                new_score = score_note(note)
+                if current is None or abs(current - new_score) > 1e-9:
+                    changed.append({"id": record_id, "sentiment_score": new_score, "updated_at": now})
+
+            if changed and not dry_run:
+                db.session.execute(update(HealthRecord), changed)
+                db.session.commit()
+            else:
+                db.session.rollback()  # end the read transaction between chunks
+
+            scanned += len(rows)
+            updated += len(changed)
+            last_id = rows[-1][0]
+            if progress:
+                progress(scanned, updated)
+
+        return {"scanned": scanned, "updated": updated}
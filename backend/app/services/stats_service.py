@@ -0,0 +1,153 @@
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from .. import db
+from ..models import User, Prediction, HealthRecord
+from ..signals import health_records_saved, predictions_saved, user_registered
+
+# Response key -> model counted for it
+COUNTED_TABLES = {"users": User, "predictions": Prediction, "records": HealthRecord}
+RECENT_LOGS = 10
+
+
+class StatsService:
+    """
+    Admin dashboard counters without three COUNT(*) scans per request.
+
+    Exact counts are taken at most every ADMIN_STATS_EXACT_INTERVAL seconds,
+    on a background thread once the first set exists. Between recounts, rows
+    inserted by this process (records, predictions and registered users) are
+    added from the write signals. On PostgreSQL,
+    the very first response uses pg_class.reltuples estimates (flagged
+    approximate) while the exact recount runs. The full payload, including
+    recent_logs, is cached for ADMIN_STATS_TTL seconds.
+    """
+    _lock = threading.Lock()
+    _payload = None   # (expires_at, dict)
+    _exact = None     # {"users": n, "predictions": n, "records": n}
+    _exact_at = 0.0
+    _recounting = False
+    _ttl = 30.0
+    _exact_interval = 300.0
+
+    @classmethod
+    def init_app(cls, app):
+        cls._ttl = app.config.get('ADMIN_STATS_TTL', 30.0)
+        cls._exact_interval = app.config.get('ADMIN_STATS_EXACT_INTERVAL', 300.0)
+        health_records_saved.connect(cls._on_records_saved, weak=False)
+        predictions_saved.connect(cls._on_predictions_saved, weak=False)
+        user_registered.connect(cls._on_user_registered, weak=False)
+
+    @classmethod
+    def get_stats(cls):
+        cached = cls._payload
+        if cached and time.monotonic() < cached[0]:
+            return cached[1]
+
+        counts, approximate = cls._counts()
+        recent_predictions = Prediction.query.order_by(Prediction.created_at.desc()).limit(RECENT_LOGS).all()
+
+        payload = {
+            **counts,
+            "approximate": approximate,
+            "recent_logs": [{
+                "id": p.id,
+                "user_id": p.user_id,
+                "phase": p.predicted_phase,
+                "confidence": p.confidence,
+                "date": p.created_at.strftime('%Y-%m-%d %H:%M')
+            } for p in recent_predictions]
+        }
+        cls._payload = (time.monotonic() + cls._ttl, payload)
+        return payload
+
+    @classmethod
+    def _counts(cls):
+        """Returns (counts, approximate)."""
+        with cls._lock:
+            exact = dict(cls._exact) if cls._exact else None
+            due = time.monotonic() - cls._exact_at > cls._exact_interval
+
+        if exact is not None:
+            if due:
+                cls._start_recount()
+            return exact, False
+
+        estimates = cls._estimated_counts()
+        if estimates is not None:
+            cls._start_recount()
+            return estimates, True
+
+        counts = cls._exact_counts()
+        cls._store_exact(counts)
+        return counts, False
+
+    @classmethod
+    def _start_recount(cls):
+        with cls._lock:
+            if cls._recounting:
+                return
+            cls._recounting = True
+        app = current_app._get_current_object()
+        threading.Thread(target=cls._recount_in_background, args=(app,), daemon=True).start()
+
+    @staticmethod
+    def _exact_counts():
+        return {key: model.query.count() for key, model in COUNTED_TABLES.items()}
+
+    @staticmethod
+    def _estimated_counts():
+        """Planner row estimates (PostgreSQL only); None if unavailable or never analyzed."""
+        if db.engine.dialect.name != 'postgresql':
+            return None
+        rows = db.session.execute(
+            text("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(:names) AND relkind = 'r'"),
+            {"names": [m.__tablename__ for m in COUNTED_TABLES.values()]}
+        ).all()
+        by_table = {name: tuples for name, tuples in rows}
+        estimates = {}
+        for key, model in COUNTED_TABLES.items():
+            tuples = by_table.get(model.__tablename__)
+            if tuples is None or tuples < 0:
+                return None
+            estimates[key] = int(tuples)
+        return estimates
+
+    @classmethod
+    def _store_exact(cls, counts):
+        with cls._lock:
+            cls._exact = dict(counts)
+            cls._exact_at = time.monotonic()
+
+    @classmethod
+    def _recount_in_background(cls, app):
+        try:
+            with app.app_context():
+                cls._store_exact(cls._exact_counts())
+        except Exception as e:
+            print(f"Admin stats recount failed: {e}")
+        finally:
+            cls._recounting = False
+
+    @classmethod
+    def _apply_inserts(cls, key, changes):
+        inserted = sum(1 for c in changes if c['before'] is None and c['after'] is not None)
+        removed = sum(1 for c in changes if c['before'] is not None and c['after'] is None)
+        if inserted == removed:
+            return
+        with cls._lock:
+            if cls._exact is not None:
+                cls._exact[key] += inserted - removed
+
+    @classmethod
+    def _on_records_saved(cls, sender, user_id=None, changes=(), **kwargs):
+        cls._apply_inserts("records", changes)
+
+    @classmethod
+    def _on_predictions_saved(cls, sender, user_id=None, changes=(), **kwargs):
+        cls._apply_inserts("predictions", changes)
+
+    @classmethod
+    def _on_user_registered(cls, sender, user_id=None, **kwargs):
+        cls._apply_inserts("users", [{"before": None, "after": {"id": user_id}}])
@@ -0,0 +1,22 @@
+"""
+In-process write notifications. Routes send these after a successful commit
+so caches and running aggregates can update themselves instead of
+re-querying. The record signals are sent with the app as sender and keyword args:
+
+    user_id  the owner of the rows
+    changes  list of {"date", "before", "after"}; before is None for new
+             rows and after is None for rows that left that date, otherwise
+             they are dicts of the previous / new values
+"""
+from blinker import Namespace
+
+_signals = Namespace()
+
+# before/after hold the HealthRecord metric fields (models.METRIC_FIELDS)
+health_records_saved = _signals.signal('health-records-saved')
+
+# before/after hold {"predicted_phase": ...}
+predictions_saved = _signals.signal('predictions-saved')
+
+# Sent with user_id only, after a new account is committed
+user_registered = _signals.signal('user-registered')
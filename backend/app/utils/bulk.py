@@ -0,0 +1,78 @@
+from sqlalchemy import func, inspect, text
+from .. import db
+
+
+def _dialect_insert(model):
+    """Returns a dialect-specific INSERT that supports ON CONFLICT."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(model)
+
+
+def upsert_rows(model, rows, index_elements, update_columns, keep_existing=()):
+    """
+    Inserts `rows` (list of dicts) into `model`'s table in a single
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE statement.
+    Requires a unique index on `index_elements`. Does not commit.
+    For columns in `keep_existing` a None in the row leaves the stored value
+    as it is, so rows carrying different fields can share one statement.
+    """
+    if not rows:
+        return 0
+
+    stmt = _dialect_insert(model)
+    if stmt is None:
+        # Dialect without ON CONFLICT support: fall back to per-row merge
+        for row in rows:
+            filters = {k: row[k] for k in index_elements}
+            existing = model.query.filter_by(**filters).first()
+            if existing:
+                for col in update_columns:
+                    if col in row and not (col in keep_existing and row[col] is None):
+                        setattr(existing, col, row[col])
+            else:
+                db.session.add(model(**row))
+        return len(rows)
+
+    table = model.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            col: func.coalesce(stmt.excluded[col], table.c[col]) if col in keep_existing else stmt.excluded[col]
+            for col in update_columns
+        }
+    )
+    # render_nulls: the ORM would otherwise split rows with None values into one statement per key set
+    db.session.execute(stmt, rows, execution_options={"render_nulls": True})
+    return len(rows)
+
+
+def ensure_unique_index(table, name, columns):
+    """
+    Makes sure `table` has a unique index on `columns`. Databases created
+    before the index was declared unique get it rebuilt in one transaction,
+    so a failure (e.g. duplicate rows) leaves the old index in place.
+    """
+    try:
+        indexes = inspect(db.engine).get_indexes(table)
+    except Exception as e:
+        print(f" * Unique index check skipped for {table}: {e}")
+        return
+
+    if any(ix.get('unique') and list(ix['column_names']) == list(columns) for ix in indexes):
+        return
+
+    cols = ", ".join(columns)
+    try:
+        with db.engine.begin() as conn:
+            if any(ix['name'] == name for ix in indexes):
+                conn.execute(text(f"DROP INDEX {name}"))
+            conn.execute(text(f"CREATE UNIQUE INDEX {name} ON {table} ({cols})"))
+        print(f" * Unique index {name} created on {table}({cols}).")
+    except Exception as e:
+        print(f" * Could not create unique index {name}: {e} (remove duplicate rows and restart)")
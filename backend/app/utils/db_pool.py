@@ -0,0 +1,75 @@
+"""
+Engine/pool options from the DB_* settings and connection-pool metrics.
+
+PostgreSQL gets a sized QueuePool with pre-ping, recycling and an optional
+server-side statement timeout. File-based SQLite keeps SQLAlchemy's own
+pool sizing but uses the instrumented pool class; in-memory SQLite is left
+to Flask-SQLAlchemy's defaults.
+"""
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+from .metrics import counter, gauge, histogram
+
+POOL_CHECKOUT_WAIT = histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled DB connection',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+POOL_CHECKOUT_TIMEOUTS = counter('db_pool_checkout_timeouts_total', 'Checkouts that hit DB_POOL_TIMEOUT')
+POOL_CONNECTIONS = counter('db_pool_connections_created_total', 'New DB connections opened')
+POOL_INVALIDATED = counter('db_pool_connections_invalidated_total', 'Connections discarded (failed pre-ping, errors)')
+POOL_STATE = gauge('db_pool_connections', 'Pool connections by state', ['state'])
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def _is_memory_sqlite(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URI."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        if _is_memory_sqlite(uri):
+            return {}
+        return {"poolclass": InstrumentedQueuePool, "pool_pre_ping": config['DB_POOL_PRE_PING']}
+
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config['DB_POOL_SIZE'],
+        "max_overflow": config['DB_MAX_OVERFLOW'],
+        "pool_timeout": config['DB_POOL_TIMEOUT'],
+        "pool_recycle": config['DB_POOL_RECYCLE'],
+        "pool_pre_ping": config['DB_POOL_PRE_PING']
+    }
+    if uri.startswith('postgresql') and config['DB_STATEMENT_TIMEOUT_MS']:
+        options["connect_args"] = {"options": f"-c statement_timeout={int(config['DB_STATEMENT_TIMEOUT_MS'])}"}
+    return options
+
+
+def instrument_pool(engine):
+    """Connection counters plus checked-out / idle / overflow gauges read at scrape time."""
+    event.listen(engine, 'connect', lambda *args: POOL_CONNECTIONS.inc())
+    event.listen(engine, 'invalidate', lambda *args: POOL_INVALIDATED.inc())
+
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    POOL_STATE.set_function(pool.checkedout, state='in_use')
+    POOL_STATE.set_function(pool.checkedin, state='idle')
+    POOL_STATE.set_function(lambda: max(pool.overflow(), 0), state='overflow')
+    POOL_STATE.set_function(pool.size, state='size')
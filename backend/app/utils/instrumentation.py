@@ -0,0 +1,79 @@
+"""
+Request and database instrumentation feeding the /metrics registry.
+
+HTTP metrics are labelled by blueprint and endpoint (the Flask view name,
+e.g. "health.get_records"), never by raw path, so ids in URLs don't create
+new series. For streamed responses (chat SSE) the duration covers the time
+to the response headers, not the whole stream.
+"""
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from .metrics import counter, histogram
+
+HTTP_REQUESTS = counter('http_requests_total', 'HTTP requests', ['blueprint', 'endpoint', 'method', 'status'])
+HTTP_ERRORS = counter('http_request_errors_total', 'HTTP responses with 4xx/5xx status', ['blueprint', 'endpoint', 'kind'])
+HTTP_LATENCY = histogram('http_request_duration_seconds', 'HTTP request latency', ['blueprint', 'endpoint', 'method'])
+
+DB_QUERY_LATENCY = histogram(
+    'db_query_duration_seconds', 'SQL statement execution time',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+DB_QUERIES_PER_REQUEST = histogram(
+    'db_queries_per_request', 'SQL statements issued per HTTP request', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+)
+DB_TIME_PER_REQUEST = histogram('db_time_per_request_seconds', 'SQL time per HTTP request', ['endpoint'])
+
+
+def _labels():
+    endpoint = request.endpoint or 'unmatched'
+    return request.blueprint or 'app', endpoint
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+
+
+def _after_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return response
+    blueprint, endpoint = _labels()
+    HTTP_LATENCY.observe(time.perf_counter() - started, blueprint=blueprint, endpoint=endpoint, method=request.method)
+    HTTP_REQUESTS.inc(blueprint=blueprint, endpoint=endpoint, method=request.method, status=response.status_code)
+    if response.status_code >= 400:
+        kind = 'server' if response.status_code >= 500 else 'client'
+        HTTP_ERRORS.inc(blueprint=blueprint, endpoint=endpoint, kind=kind)
+    DB_QUERIES_PER_REQUEST.observe(g.get('db_queries', 0), endpoint=endpoint)
+    DB_TIME_PER_REQUEST.observe(g.get('db_time', 0.0), endpoint=endpoint)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    DB_QUERY_LATENCY.observe(elapsed)
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + elapsed
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    conn = context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+
+def init_app(app, engine):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
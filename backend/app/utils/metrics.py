@@ -0,0 +1,341 @@
+"""
+Minimal in-process metrics registry rendered in the Prometheus text format
+(served by routes/metrics.py).
+
+    from ..utils.metrics import counter
+    ROUTED = counter('llm_routed_total', 'LLM answers by provider', ['provider'])
+    ROUTED.inc(provider='gemini')
+
+Metrics are created at import time and looked up by name, so importing a
+module twice (or calling create_app more than once) reuses the same series.
+
+Several worker processes (gunicorn): with METRICS_MULTIPROC_DIR set, every
+process writes a snapshot of its values to <dir>/<pid>.json every
+FLUSH_INTERVAL seconds (and at exit), and a scrape merges all snapshots:
+counters and histograms are summed over every process that ever wrote one,
+dead workers included, so they stay monotonic; gauges are taken from live
+processes only and get a pid label (unless they already have one). The
+answering worker flushes before merging, the others are at most
+FLUSH_INTERVAL behind. Clear the directory when the server starts
+(gunicorn.conf.py does).
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+FLUSH_INTERVAL = 1.0
+_multiproc_dir = None
+_flusher_pid = None
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        """Yields (suffix, label values, extra label pairs, value)."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, (), value
+
+    def snapshot(self):
+        """[[label values, value], ...] for the multiprocess files."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def merged(self, snapshots):
+        """A copy of this metric holding the sum of snapshots (one per process)."""
+        copy = type(self)(self.name, self.documentation, self.labelnames)
+        for _, values in snapshots:
+            for key, value in values:
+                key = tuple(key)
+                copy._values[key] = copy._values.get(key, 0) + value
+        return copy
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        """Reads the value from fn() at scrape time instead of storing it."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._functions.clear()
+
+    def samples(self):
+        yield from super().samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if value is not None:
+                yield '', key, (), value
+
+    def snapshot(self):
+        # Scrape-time functions are read here, in the process they describe
+        return [[list(key), value] for _, key, _, value in self.samples()]
+
+    def reset(self):
+        # Set values are current state, not history: a forked worker keeps them
+        pass
+
+    def merged(self, snapshots):
+        """Live processes' values side by side, told apart by a pid label."""
+        per_process = 'pid' not in self.labelnames
+        copy = Gauge(self.name, self.documentation, self.labelnames + (('pid',) if per_process else ()))
+        for pid, values in snapshots:
+            for key, value in values:
+                copy._values[tuple(key) + ((str(pid),) if per_process else ())] = value
+        return copy
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield '_bucket', key, (('le', _format_value(bound)),), cumulative
+            yield '_sum', key, (), total
+            yield '_count', key, (), count
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), [list(s[0]), s[1], s[2]]] for key, s in self._values.items()]
+
+    def merged(self, snapshots):
+        copy = Histogram(self.name, self.documentation, self.labelnames, self.buckets[:-1])
+        for _, values in snapshots:
+            for key, (counts, total, count) in values:
+                state = copy._values.setdefault(tuple(key), [[0] * len(copy.buckets), 0.0, 0])
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+        return copy
+
+
+def _get_or_create(cls, name, documentation, labelnames, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, documentation, labelnames, **kwargs)
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} already registered with a different type or labels")
+        return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return _get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def _reset_locks_in_child():
+    # A lock held by another thread at fork time would stay held forever in the child
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    for metric in _registry.values():
+        metric._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_locks_in_child)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def init_multiprocess(path):
+    """Shares values through snapshot files in path; called by create_app and again in each forked worker."""
+    global _multiproc_dir, _flusher_pid
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    _multiproc_dir = path
+    if _flusher_pid == os.getpid():
+        return
+    if _flusher_pid is not None:
+        # Forked: the parent's counts are in the parent's file, start this process at zero
+        with _registry_lock:
+            metrics = list(_registry.values())
+        for metric in metrics:
+            metric.reset()
+    _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, args=(_flusher_pid,), name='metrics-flush', daemon=True).start()
+
+
+def _flush_loop(pid):
+    while _flusher_pid == pid:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"Metrics flush failed: {e}")
+
+
+def flush():
+    """Writes this process's snapshot (multiprocess mode only)."""
+    if _multiproc_dir is None:
+        return
+    with _registry_lock:
+        metrics = list(_registry.values())
+    data = {m.name: m.snapshot() for m in metrics}
+    path = os.path.join(_multiproc_dir, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+def _read_snapshots():
+    """{pid: {metric name: snapshot}} for every process that wrote one."""
+    snapshots = {}
+    for path in glob.glob(os.path.join(_multiproc_dir, '*.json')):
+        try:
+            with open(path) as f:
+                snapshots[int(os.path.basename(path)[:-5])] = json.load(f)
+        except (OSError, ValueError):
+            continue  # removed or replaced while listing
+    return snapshots
+
+
+def render_latest():
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    if _multiproc_dir is not None:
+        flush()
+        snapshots = _read_snapshots()
+        merged = []
+        for metric in metrics:
+            alive_only = isinstance(metric, Gauge)
+            merged.append(metric.merged([
+                (pid, data[metric.name]) for pid, data in sorted(snapshots.items())
+                if metric.name in data and (not alive_only or _pid_alive(pid))
+            ]))
+        metrics = merged
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
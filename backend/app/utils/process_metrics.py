@@ -0,0 +1,43 @@
+"""
+Per-process memory readings for the preload/copy-on-write setup.
+
+RSS counts every page a worker touches, shared or not, so with preloaded
+workers the sum of RSS overstates real usage; PSS splits shared pages
+between the processes mapping them and is the number to compare. Both are
+read from /proc on Linux and are unavailable (None) elsewhere.
+"""
+import os
+from .metrics import gauge
+
+PROCESS_MEMORY = gauge('process_memory_bytes', 'Worker memory by kind (rss, pss, shared)', ['pid', 'kind'])
+
+_SMAPS_FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared'}
+
+
+def memory_usage():
+    """{"rss", "pss", "shared"} in bytes for this process, or {} if /proc is unavailable."""
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                kind = _SMAPS_FIELDS.get(key)
+                if kind:
+                    usage[kind] = usage.get(kind, 0) + int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        return {}
+    return usage
+
+
+def format_usage(usage):
+    if not usage:
+        return "memory stats unavailable"
+    return ", ".join(f"{kind.upper()} {value / 2**20:.1f} MiB" for kind, value in usage.items())
+
+
+def register_gauges():
+    """Scrape-time gauges for the current process; call again after fork so the pid label is right."""
+    pid = str(os.getpid())
+    PROCESS_MEMORY.clear()  # drop the series inherited from the master
+    for kind in ('rss', 'pss', 'shared'):
+        PROCESS_MEMORY.set_function(lambda kind=kind: memory_usage().get(kind), pid=pid, kind=kind)
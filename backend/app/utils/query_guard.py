@@ -0,0 +1,165 @@
+"""
+Per-request SQL statement accounting for development and tests.
+
+With QUERY_GUARD = 'warn' every request counts its statements, prints N+1
+candidates (the same statement text run N_PLUS_ONE_THRESHOLD or more times)
+and prints a warning when an endpoint exceeds its budget. 'strict' raises
+QueryBudgetExceeded instead, so a test client gets a 500 naming the
+endpoint. Either mode adds an X-Query-Count response header. 'off' (the
+default) registers nothing per request.
+
+Slow statements (SLOW_QUERY_MS, 0 disables) are logged with their
+parameters in every mode.
+
+    with assert_max_queries(2):
+        client.post('/api/predictions/predict', json=...)
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from .. import db
+
+# Statements allowed per request, by endpoint. Endpoints not listed are only
+# checked for N+1 patterns. Override or extend with app.config['QUERY_BUDGETS'].
+QUERY_BUDGETS = {
+    'auth.register': 4,
+    'auth.login': 1,
+    'auth.me': 1,
+    'health.add_record': 3,
+    'health.update_record_by_id': 3,
+    'health.get_records': 3,
+    'health.bulk_upsert_records': 3,
+    'predictions.predict': 2,
+    'predictions.predict_batch': 2,
+    'predictions.get_prediction_history': 2,
+    'admin.get_stats': 4,
+    'datasets.get_global_summary': 3,
+    'chat.chat_message': 2,
+    'chat.chat_stream': 2
+}
+N_PLUS_ONE_THRESHOLD = 3
+SLOW_PARAMS_CHARS = 300
+
+
+class QueryBudgetExceeded(Exception):
+    """An endpoint ran more SQL statements than its QUERY_BUDGETS entry allows."""
+
+
+class _Recorder:
+    """Statement texts and how often each ran while the recorder was active."""
+
+    def __init__(self):
+        self.statements = Counter()
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n >= threshold]
+
+
+_recorders = []  # active assert_max_queries blocks
+_settings = {"slow_ms": 0.0}
+
+
+def _short(text, limit):
+    text = ' '.join(str(text).split())
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('guard_started', []).append(time.perf_counter())
+    recorder = g.get('_query_recorder') if has_request_context() else None
+    if recorder is not None:
+        recorder.statements[statement] += 1
+    for active in _recorders:
+        active.statements[statement] += 1
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['guard_started'].pop()) * 1000
+    if _settings['slow_ms'] and elapsed_ms >= _settings['slow_ms']:
+        where = request.endpoint if has_request_context() else 'background'
+        print(f"SLOW QUERY ({elapsed_ms:.0f} ms, {where}): {_short(statement, 500)} "
+              f"params={_short(repr(parameters), SLOW_PARAMS_CHARS)}")
+
+
+def _handle_error(context):
+    conn = context.connection
+    if conn is not None and conn.info.get('guard_started'):
+        conn.info['guard_started'].pop()
+
+
+def init_app(app, engine):
+    _settings['slow_ms'] = app.config.get('SLOW_QUERY_MS', 0)
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+    mode = app.config.get('QUERY_GUARD', 'off')
+    if mode not in ('warn', 'strict'):
+        return
+    budgets = {**QUERY_BUDGETS, **app.config.get('QUERY_BUDGETS', {})}
+
+    @app.before_request
+    def _start_recording():
+        g._query_recorder = _Recorder()
+
+    @app.after_request
+    def _check_queries(response):
+        recorder = g.pop('_query_recorder', None)
+        if recorder is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        response.headers['X-Query-Count'] = str(recorder.count)
+
+        for statement, n in recorder.repeated():
+            print(f"N+1 CANDIDATE in {endpoint}: {n}x {_short(statement, 200)}")
+
+        budget = budgets.get(endpoint)
+        if budget is not None and recorder.count > budget:
+            msg = f"{endpoint} ran {recorder.count} SQL statements (budget {budget})"
+            if mode == 'strict':
+                raise QueryBudgetExceeded(msg)
+            print(f"QUERY BUDGET: {msg}")
+        return response
+
+
+@contextmanager
+def unmetered():
+    """
+    Statements in the block don't count against the current request's budget
+    (work that normally runs off the request, e.g. the 'sync' prediction
+    pipeline). assert_max_queries blocks still see them.
+    """
+    recorder = g.pop('_query_recorder', None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if recorder is not None:
+            g._query_recorder = recorder
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """Fails with AssertionError if the block runs more than `limit` statements."""
+    engine = engine or db.engine
+    recorder = _Recorder()
+    registered = event.contains(engine, 'before_cursor_execute', _before_cursor_execute)
+    if not registered:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    _recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorders.remove(recorder)
+        if not registered:
+            event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.remove(engine, 'after_cursor_execute', _after_cursor_execute)
+    if recorder.count > limit:
+        listing = '\n'.join(f"  {n}x {_short(s, 200)}" for s, n in recorder.statements.most_common())
+        raise AssertionError(f"Expected at most {limit} SQL statements, got {recorder.count}:\n{listing}")
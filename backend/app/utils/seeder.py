@@ -1,23 +1,35 @@
-import pandas as pd
-from ..models import User, HealthRecord, Prediction, db
+from flask import current_app
+from ..models import User, HealthRecord, Prediction, db, METRIC_FIELDS
+from ..signals import health_records_saved, predictions_saved
+from ..services.sample_data import SampleDataService, PROCESSED_DATASET, SEED_ROWS
 from datetime import datetime, timedelta
-import os
 
 def seed_data(user_id):
-    csv_path = os.path.join(os.path.dirname(__file__), '../../../data/processed/final_dataset.csv')
-    if not os.path.exists(csv_path):
-        print(f"CSV not found at {csv_path}")
+    """Imports SEED_ROWS sample days ending yesterday; days the user already has are left alone."""
+    user_id = int(user_id)
+    df = SampleDataService.load_frame()
+    if df is None:
+        print(f"CSV not found at {PROCESSED_DATASET}")
         return
 
-    df = pd.read_csv(csv_path)
     # Take first 30 days of data for the user
-    user_data = df.head(30)
+    user_data = df.head(SEED_ROWS)
     
     start_date = datetime.utcnow().date() - timedelta(days=30)
+    end_date = start_date + timedelta(days=len(user_data) - 1)
+
+    # (user_id, date) is unique for both tables: skip days that are already taken
+    taken_records = {d for (d,) in db.session.query(HealthRecord.date).filter(
+        HealthRecord.user_id == user_id, HealthRecord.date.between(start_date, end_date))}
+    taken_predictions = {d for (d,) in db.session.query(Prediction.date).filter(
+        Prediction.user_id == user_id, Prediction.date.between(start_date, end_date))}
     
     records = []
+    prediction_changes = []
     for i, row in user_data.iterrows():
         date = start_date + timedelta(days=i)
+        if date in taken_records:
+            continue
         record = HealthRecord(
             user_id=user_id,
             date=date,
@@ -40,7 +52,7 @@ def seed_data(user_id):
         
         # Also add prediction if phase info is available
         phase = row.get('phase_simple')
-        if phase:
+        if phase and date not in taken_predictions:
             pred = Prediction(
                 user_id=user_id,
                 date=date,
@@ -48,7 +60,14 @@ def seed_data(user_id):
                 confidence=0.95
             )
             db.session.add(pred)
+            prediction_changes.append({"date": date, "before": None, "after": {"predicted_phase": phase}})
 
     db.session.add_all(records)
+    record_changes = [{"date": r.date, "before": None, "after": {f: getattr(r, f) for f in METRIC_FIELDS}}
+                      for r in records]
     db.session.commit()
-    print(f"Imported {len(records)} records for user {user_id}")
+
+    app = current_app._get_current_object()
+    health_records_saved.send(app, user_id=int(user_id), changes=record_changes)
+    predictions_saved.send(app, user_id=int(user_id), changes=prediction_changes)
+    print(f"Imported {len(records)} records for user {user_id} ({len(taken_records)} existing days skipped)")
@@ -0,0 +1,105 @@
+"""
+Microbenchmark for single-prediction latency.
+
+Compares the legacy sklearn path (scaler.transform -> model.predict ->
+inverse_transform -> model.predict_proba) with MLService's InferenceEngine.
+With --concurrency, also compares throughput of concurrent single-row
+calls with and without the micro-batcher (--batch-window-ms/--batch-max-rows).
+
+Usage (from the backend directory):
+    python benchmark_ml.py [--iterations 2000] [--concurrency 32]
+"""
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+from app.config import Config
+from app.services.ml_service import MLService, MicroBatcher, FEATURE_COLUMNS
+
+warnings.filterwarnings("ignore")
+
+
+def legacy_predict(model, scaler, le, row):
+    X = np.array(row).reshape(1, -1)
+    X_scaled = scaler.transform(X)
+    prediction_encoded = model.predict(X_scaled)[0]
+    label = le.inverse_transform([prediction_encoded])[0]
+    probs = model.predict_proba(X_scaled)[0]
+    return label, float(np.max(probs))
+
+
+def engine_predict(engine, row):
+    labels, confidences = engine.predict(row)
+    return labels[0], float(confidences[0])
+
+
+def measure(fn, rows):
+    timings = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        fn(row)
+        timings[i] = time.perf_counter() - start
+    return timings * 1000.0
+
+
+def report(name, timings):
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"{name:<10} p50={p50:.3f} ms  p99={p99:.3f} ms  mean={timings.mean():.3f} ms")
+    return p50, p99
+
+
+def throughput(engine, rows, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda r: MLService._score(engine, r, 'single'), rows))
+        return len(rows) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--model-dir", default=Config.ML_MODEL_PATH)
+    parser.add_argument("--concurrency", type=int, default=0, help="threads for the micro-batching comparison")
+    parser.add_argument("--batch-window-ms", type=float, default=2.0)
+    parser.add_argument("--batch-max-rows", type=int, default=64)
+    args = parser.parse_args()
+
+    bundle = MLService.load_resources(args.model_dir)
+    engine = bundle.engine
+    # The bundle may be native (no sklearn objects): load the pickles for the legacy path
+    model, scaler, le = (joblib.load(os.path.join(bundle.model_dir, f))
+                         for f in ('model.joblib', 'scaler.joblib', 'label_encoder.joblib'))
+
+    rng = np.random.default_rng(42)
+    rows = [list(r) for r in rng.uniform(0, 100, size=(args.iterations, len(FEATURE_COLUMNS)))]
+
+    # Sanity check: both paths agree
+    for row in rows[:200]:
+        a, b = legacy_predict(model, scaler, le, row), engine_predict(engine, row)
+        assert a[0] == b[0] and abs(a[1] - b[1]) < 1e-5, (a, b)
+
+    # Warm up both paths
+    for row in rows[:50]:
+        legacy_predict(model, scaler, le, row)
+        engine_predict(engine, row)
+
+    print(f"{args.iterations} single-row predictions")
+    before = report("legacy", measure(lambda r: legacy_predict(model, scaler, le, r), rows))
+    after = report("engine", measure(lambda r: engine_predict(engine, r), rows))
+    print(f"speedup   p50 x{before[0] / after[0]:.1f}  p99 x{before[1] / after[1]:.1f}")
+
+    if args.concurrency:
+        print(f"\n{args.concurrency} concurrent callers")
+        MLService._batcher = None
+        direct = throughput(engine, rows, args.concurrency)
+        MLService._batcher = MicroBatcher(args.batch_window_ms / 1000.0, args.batch_max_rows)
+        batched = throughput(engine, rows, args.concurrency)
+        print(f"direct    {direct:,.0f} predictions/s")
+        print(f"batched   {batched:,.0f} predictions/s  (window {args.batch_window_ms} ms, max {args.batch_max_rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Load-time and size comparison of the joblib pickles and the native bundle
+(model.ubj + preprocess.json).
+
+Exports a native bundle from the joblib artifacts into a temporary
+directory, checks both formats predict the same, then loads each format in
+fresh processes (spawn, so nothing is cached in the interpreter) and
+reports artifact size, load time and RSS growth.
+
+Usage (from the backend directory):
+    python benchmark_model_load.py [--runs 5] [--model-dir ml_models]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+import warnings
+import joblib
+import numpy as np
+from app.config import Config
+from app.services.ml_service import (
+    ModelBundle, FEATURE_COLUMNS, ARTIFACT_FILES, MANIFEST_FILE, NATIVE_MODEL_FILE, PREPROCESS_FILE,
+    resolve_model_dir, write_native_bundle
+)
+from app.utils.process_metrics import memory_usage
+
+warnings.filterwarnings("ignore")
+
+
+def _load_in_child(model_dir, prefer_native, queue):
+    # Library imports are paid before timing: a worker imports them either way
+    import xgboost  # noqa: F401
+    import sklearn  # noqa: F401
+    rss_before = memory_usage().get('rss', 0)
+    start = time.perf_counter()
+    bundle = ModelBundle(model_dir, 'bench', None, prefer_native=prefer_native)
+    elapsed = time.perf_counter() - start
+    queue.put((bundle.format, elapsed, memory_usage().get('rss', 0) - rss_before))
+
+
+def measure(model_dir, prefer_native, runs):
+    ctx = mp.get_context('spawn')
+    results = []
+    for _ in range(runs):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_load_in_child, args=(model_dir, prefer_native, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+    return results
+
+
+def size_of(model_dir, files):
+    return sum(os.path.getsize(os.path.join(model_dir, f)) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--model-dir", default=Config.ML_MODEL_PATH)
+    args = parser.parse_args()
+
+    source_dir, _ = resolve_model_dir(args.model_dir)
+    work_dir = tempfile.mkdtemp(prefix="model-bundle-")
+    try:
+        for name in ARTIFACT_FILES:
+            shutil.copy(os.path.join(source_dir, name), work_dir)
+        model, scaler, le = (joblib.load(os.path.join(work_dir, f)) for f in ARTIFACT_FILES)
+        checksums = write_native_bundle(work_dir, model, scaler, le)
+        with open(os.path.join(work_dir, MANIFEST_FILE), "w") as f:
+            json.dump({"version": "bench", "checksums": checksums,
+                       "native": {"model": NATIVE_MODEL_FILE, "preprocess": PREPROCESS_FILE}}, f)
+
+        # Both formats must score identically
+        joblib_bundle = ModelBundle(work_dir, 'bench', None, prefer_native=False)
+        native_bundle = ModelBundle(work_dir, 'bench', None)
+        X = np.random.default_rng(42).uniform(0, 100, size=(5000, len(FEATURE_COLUMNS)))
+        a_labels, a_conf = joblib_bundle.engine.predict(X)
+        b_labels, b_conf = native_bundle.engine.predict(X)
+        assert (a_labels == b_labels).all() and np.allclose(a_conf, b_conf, atol=1e-6)
+        print(f"Predictions identical on {len(X)} rows")
+
+        sizes = {
+            'joblib': size_of(work_dir, ARTIFACT_FILES),
+            'native': size_of(work_dir, (NATIVE_MODEL_FILE, PREPROCESS_FILE))
+        }
+        for prefer_native in (False, True):
+            results = measure(work_dir, prefer_native, args.runs)
+            fmt = results[0][0]
+            load_ms = np.array([r[1] for r in results]) * 1000.0
+            rss_mib = np.median([r[2] for r in results]) / 2 ** 20
+            print(f"{fmt:<7} size={sizes[fmt] / 1024:.0f} KiB  load median={np.median(load_ms):.1f} ms "
+                  f"min={load_ms.min():.1f} ms  rss +{rss_mib:.1f} MiB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
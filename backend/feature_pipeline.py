@@ -0,0 +1,291 @@
+"""
+Feature pipeline: data/raw exports -> training set (the steps of
+notebook/data_cleaning_merging.ipynb as a rerunnable script).
+
+Stages:
+    1. one per raw source: the file is read in chunks and reduced to one
+       table keyed by (id, day_in_study); per-day sources are averaged or
+       summed chunk by chunk.
+    2. features: left joins onto the hormones table, mean imputation,
+       Likert mapping, per-participant lag features (*_prev1, *_prev2),
+       simplified phase labels, hormone min-max scaling, dropna.
+    3. output: Parquet dataset partitioned by participant (id=<n>/...)
+       plus _manifest.json; optionally the flat CSV train_and_save_model.py reads.
+
+Every stage result is cached under CACHE_DIR keyed by a hash of its inputs
+(raw file sha256 + stage definition), so after one raw export grows only
+that source and the stages after it are recomputed.
+
+Requires pyarrow.
+
+Usage (from the backend directory):
+    python feature_pipeline.py [--raw-dir ../data/raw] [--out-dir ../data/processed/features]
+                               [--csv PATH] [--allow-missing steps] [--force]
+
+Every raw source feeds model features, so a missing file is an error.
+--allow-missing fills that source's columns with 0 (what the backend
+imputes for a missing metric) and records it in the manifest; a model
+trained on such a dataset has never seen that signal.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.services.ml_service import PHASE_SIMPLE
+
+# Constants
+RAW_DIR = "../data/raw"
+OUT_DIR = "../data/processed/features"
+CACHE_DIR = "../data/processed/.cache"
+CHUNK_ROWS = 50_000
+# Bump when a stage's logic changes so cached results are not reused
+PIPELINE_VERSION = "1"
+
+KEYS = ["id", "day_in_study"]
+
+# name -> raw file, columns kept, per-day reduction (None = already daily), renames
+SOURCES = {
+    "hormones": {
+        "file": "hormones_and_selfreport.csv",
+        "columns": ["phase", "lh", "estrogen", "pdg", "cramps", "fatigue", "moodswing", "stress", "bloating", "sleepissue"],
+        "agg": None
+    },
+    "sleep": {
+        "file": "sleep_score.csv",
+        "columns": ["overall_score", "deep_sleep_in_minutes", "resting_heart_rate"],
+        "agg": None
+    },
+    "stress": {
+        "file": "stress_score.csv",
+        "columns": ["stress_score"],
+        "agg": "mean"
+    },
+    "heart": {
+        "file": "resting_heart_rate.csv",
+        "columns": ["value"],
+        "agg": "mean",
+        "rename": {"value": "avg_resting_heart_rate"}
+    },
+    "steps": {
+        "file": "steps.csv",
+        "columns": ["steps"],
+        "agg": "sum",
+        "rename": {"steps": "daily_steps"}
+    }
+}
+JOIN_ORDER = ["sleep", "stress", "heart", "steps"]
+
+LIKERT_MAPPING = {
+    "Not at all": 0,
+    "Low": 1,
+    "Mild": 1,
+    "Moderate": 2,
+    "High": 3,
+    "Very high": 4,
+    "Very High": 4
+}
+SYMPTOM_COLUMNS = ["cramps", "fatigue", "moodswing", "stress", "bloating", "sleepissue"]
+HISTORY_COLUMNS = ["lh", "estrogen", "pdg", "stress", "overall_score", "daily_steps"]
+HORMONE_COLUMNS = ["lh", "estrogen", "pdg"]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise SystemExit("feature_pipeline needs pyarrow for Parquet output: pip install pyarrow")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_key(*parts):
+    digest = hashlib.sha256(PIPELINE_VERSION.encode())
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True).encode())
+    return digest.hexdigest()[:20]
+
+
+def _cached(name, key, compute, cache_dir, force=False):
+    """Returns the stage result from cache_dir, computing and storing it on a miss."""
+    path = os.path.join(cache_dir, f"{name}-{key}.parquet")
+    if os.path.exists(path) and not force:
+        print(f"  {name}: cached ({key})")
+        return pd.read_parquet(path)
+    start = time.perf_counter()
+    df = compute()
+    tmp = path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    print(f"  {name}: computed {len(df)} rows in {time.perf_counter() - start:.2f}s ({key})")
+    return df
+
+
+def read_source(path, spec, chunk_rows=CHUNK_ROWS):
+    """Streams one raw CSV and returns it reduced to the spec's columns (one row per day if agg is set)."""
+    columns = spec["columns"]
+    parts = []
+    for chunk in pd.read_csv(path, usecols=KEYS + columns, chunksize=chunk_rows):
+        if spec["agg"] is None:
+            parts.append(chunk[KEYS + columns])
+        else:
+            # Partial sums/counts per chunk; a day split across chunks is combined below
+            grouped = chunk.groupby(KEYS)[columns]
+            parts.append(pd.concat({"sum": grouped.sum(), "count": grouped.count()}, axis=1))
+
+    if spec["agg"] is None:
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=KEYS + columns)
+    else:
+        totals = pd.concat(parts).groupby(level=KEYS).sum()
+        values = totals["sum"]
+        if spec["agg"] == "mean":
+            values = values / totals["count"].replace(0, np.nan)
+        df = values.reset_index()
+    return df.rename(columns=spec.get("rename", {}))
+
+
+def build_features(tables):
+    """Joins the per-source tables and derives the model features (vectorized, per participant)."""
+    df = tables["hormones"]
+    for name in JOIN_ORDER:
+        df = df.merge(tables[name], on=KEYS, how="left")
+
+    numeric_cols = df.select_dtypes(include=np.number).columns
+    df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
+
+    for col in SYMPTOM_COLUMNS:
+        df[col] = df[col].map(LIKERT_MAPPING)
+
+    # Lags by row within each participant (kind="stable" keeps same-day rows in file order)
+    df = df.sort_values(KEYS, kind="stable").reset_index(drop=True)
+    by_participant = df.groupby("id", sort=False)
+    lags = {}
+    for col in HISTORY_COLUMNS:
+        lags[f"{col}_prev1"] = by_participant[col].shift(1)
+        lags[f"{col}_prev2"] = by_participant[col].shift(2)
+    df = pd.concat([df, pd.DataFrame(lags)], axis=1)
+
+    df["phase_simple"] = df["phase"].replace(PHASE_SIMPLE)
+
+    # Same as sklearn's MinMaxScaler over all rows (before dropna)
+    lo = df[HORMONE_COLUMNS].min()
+    span = (df[HORMONE_COLUMNS].max() - lo).replace(0, 1.0)
+    df[HORMONE_COLUMNS] = (df[HORMONE_COLUMNS] - lo) / span
+
+    return df.dropna().reset_index(drop=True)
+
+
+def write_dataset(df, out_dir, manifest):
+    """Replaces out_dir with a Parquet dataset partitioned by participant id."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tmp_dir = out_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), tmp_dir, partition_cols=["id"])
+    with open(os.path.join(tmp_dir, "_manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = out_dir.rstrip("/") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def read_manifest(out_dir):
+    path = os.path.join(out_dir, "_manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_dataset(out_dir=OUT_DIR):
+    """The written training set as one DataFrame, ordered by (id, day_in_study)."""
+    _require_pyarrow()
+    df = pd.read_parquet(out_dir)
+    df["id"] = df["id"].astype(np.int64)
+    columns = read_manifest(out_dir)["columns"]
+    return df[columns].sort_values(KEYS, kind="stable").reset_index(drop=True)
+
+
+def run(raw_dir=RAW_DIR, out_dir=OUT_DIR, cache_dir=CACHE_DIR, csv_path=None, force=False, allow_missing=()):
+    """Runs the pipeline; returns the output manifest. allow_missing names sources that may be absent."""
+    _require_pyarrow()
+    os.makedirs(cache_dir, exist_ok=True)
+    print(f"Feature pipeline: {raw_dir} -> {out_dir}")
+
+    tables = {}
+    source_keys = {}
+    missing = []
+    for name, spec in SOURCES.items():
+        path = os.path.join(raw_dir, spec["file"])
+        if not os.path.exists(path):
+            if name == "hormones" or name not in allow_missing:
+                raise SystemExit(f"{path} not found. Its columns are model features; pass "
+                                 f"--allow-missing {name} to build the dataset with them set to 0.")
+            columns = [spec.get("rename", {}).get(c, c) for c in spec["columns"]]
+            print(f"  WARNING: {name}: {spec['file']} not found; {', '.join(columns)} (and their lags) "
+                  f"will be 0 for every row. A model trained on this output never sees that signal.")
+            # hormones comes first in SOURCES, so its days are known here
+            tables[name] = tables["hormones"][KEYS].drop_duplicates().assign(**{c: 0.0 for c in columns})
+            missing.append(name)
+            source_keys[name] = stage_key(name, spec, None)
+            continue
+        source_keys[name] = stage_key(name, spec, file_sha256(path))
+        tables[name] = _cached(name, source_keys[name], lambda p=path, s=spec: read_source(p, s), cache_dir, force)
+
+    features_key = stage_key("features", source_keys)
+    previous = read_manifest(out_dir)
+    if previous and previous.get("key") == features_key and not force:
+        print(f"  output: up to date ({features_key})")
+        manifest = previous
+    else:
+        df = _cached("features", features_key, lambda: build_features(tables), cache_dir, force)
+        manifest = {
+            "key": features_key,
+            "pipeline_version": PIPELINE_VERSION,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "raw_dir": raw_dir,
+            "sources": source_keys,
+            "missing_sources": missing,
+            "rows": len(df),
+            "participants": int(df["id"].nunique()),
+            "columns": list(df.columns)
+        }
+        write_dataset(df, out_dir, manifest)
+        print(f"  output: {len(df)} rows, {manifest['participants']} participants")
+
+    if csv_path:
+        load_dataset(out_dir).to_csv(csv_path, index=False)
+        print(f"  csv: {csv_path}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--csv", metavar="PATH", default=None, help="also write the flat CSV to PATH")
+    parser.add_argument("--allow-missing", nargs="+", default=[], choices=[n for n in SOURCES if n != "hormones"],
+                        help="sources that may be absent (their columns become 0)")
+    parser.add_argument("--force", action="store_true", help="ignore cached stage results")
+    args = parser.parse_args()
+    run(args.raw_dir, args.out_dir, args.cache_dir, args.csv, args.force, args.allow_missing)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Gunicorn settings for the backend (run from the backend directory):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app (including the ML model bundle) is loaded once in the master and
+workers are forked from it, so they share those pages copy-on-write
+instead of each deserializing its own model on the first request.
+Every worker logs its RSS/PSS after fork; /metrics exports the same as
+process_memory_bytes.
+
+/metrics merges every worker's values through METRICS_MULTIPROC_DIR
+(default: a directory under the system temp dir, cleared at startup), so
+a scrape reaching any worker sees the totals.
+"""
+import gc
+import glob
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threads per worker: chat streams (SSE) hold a thread for their duration
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# LLM calls may take up to LLM_TIMEOUT plus a fallback attempt
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 90))
+preload_app = True
+
+os.environ.setdefault('METRICS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), f"neohealth-metrics-{bind.rsplit(':', 1)[-1]}"))
+
+
+def on_starting(server):
+    # Snapshots of a previous run's workers would be summed into this one's counters
+    for path in glob.glob(os.path.join(os.environ['METRICS_MULTIPROC_DIR'], '*.json')):
+        if path != os.path.join(os.environ['METRICS_MULTIPROC_DIR'], f"{os.getpid()}.json"):
+            os.remove(path)
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded, just before the first fork.
+    # Moving everything allocated so far into the permanent GC generation keeps
+    # the collector from writing to (and so un-sharing) those pages in workers.
+    gc.freeze()
+    from app.utils.process_metrics import memory_usage, format_usage
+    server.log.info(f"Master {os.getpid()} preloaded app: {format_usage(memory_usage())}")
+
+
+def post_fork(server, worker):
+    from app import db
+    from app.utils.metrics import init_multiprocess
+    from app.utils.process_metrics import memory_usage, format_usage, register_gauges
+
+    app = worker.app.wsgi()
+    # Pooled DB connections opened by the master must not be shared across processes
+    with app.app_context():
+        db.engine.dispose(close=False)
+    register_gauges()
+    # Counters restart at zero here (the master's stay in its own snapshot)
+    init_multiprocess(app.config.get('METRICS_MULTIPROC_DIR'))
+    server.log.info(f"Worker {worker.pid} forked: {format_usage(memory_usage())}")
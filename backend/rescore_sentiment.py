@@ -0,0 +1,38 @@
+"""
+Recomputes health_records.sentiment_score from daily_note with the current
+lexicon in app/services/sentiment.py. Run it after editing the word lists.
+
+Usage (from the backend directory):
+    python rescore_sentiment.py [--chunk-size 5000] [--user-id N] [--dry-run]
+"""
+import argparse
+import time
+from app import create_app
+from app.services.sentiment import SentimentService, RESCORE_CHUNK
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK)
+    parser.add_argument("--user-id", type=int, default=None, help="only rescore this user's notes")
+    parser.add_argument("--dry-run", action="store_true", help="count changes without writing them")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+
+        def progress(scanned, updated):
+            rate = scanned / max(time.perf_counter() - started, 1e-9)
+            print(f"  scanned {scanned:,} notes, {updated:,} changed ({rate:,.0f} rows/s)")
+
+        result = SentimentService.rescore(
+            chunk_size=args.chunk_size, user_id=args.user_id, dry_run=args.dry_run, progress=progress
+        )
+        verb = "would change" if args.dry_run else "updated"
+        print(f"Done: {result['scanned']:,} notes scanned, {result['updated']:,} {verb} "
+              f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
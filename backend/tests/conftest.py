@@ -0,0 +1,59 @@
+import itertools
+import os
+import pytest
+from app import create_app, db
+from app.config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    QUERY_GUARD = 'strict'
+    SLOW_QUERY_MS = 0
+    PREDICTION_PIPELINE = 'sync'
+    ML_RELOAD_INTERVAL = 0
+    LLM_PROVIDER = 'fake'
+    LLM_HEDGING = False
+    LLM_CACHE_BACKEND = 'memory'
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    # File-backed SQLite so every pooled connection sees the same database
+    TestConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp_path_factory.mktemp('db'), 'test.db')
+    app = create_app(TestConfig)
+    # First user gets id 1, the demo admin (routes/admin.py)
+    app.test_client().post('/api/auth/register', json=ADMIN)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+ADMIN = {"username": "admin", "email": "admin@example.com", "password": "secret"}
+_user_ids = itertools.count(1)
+
+
+def login(client, credentials):
+    token = client.post('/api/auth/login', json=credentials).get_json()['access_token']
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def admin_headers(client):
+    return login(client, ADMIN)
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Registers a fresh user and returns its bearer header."""
+    n = next(_user_ids)
+    credentials = {"username": f"user{n}", "email": f"user{n}@example.com", "password": "secret"}
+    assert client.post('/api/auth/register', json=credentials).status_code == 201
+    return login(client, credentials)
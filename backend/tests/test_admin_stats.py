@@ -0,0 +1,23 @@
+"""GET /api/admin/stats counters kept current from the write signals."""
+from app.models import User
+from app.services.stats_service import StatsService
+
+
+def stats(client, headers, monkeypatch):
+    monkeypatch.setattr(StatsService, '_payload', None)  # skip the ADMIN_STATS_TTL response cache
+    return client.get('/api/admin/stats', headers=headers).get_json()
+
+
+def test_registration_updates_the_user_count(app, client, admin_headers, monkeypatch):
+    before = stats(client, admin_headers, monkeypatch)
+    assert not before['approximate']
+    # No recount between the two reads: only the signal can move the count
+    monkeypatch.setattr(StatsService, '_start_recount', classmethod(lambda cls: None))
+
+    credentials = {"username": "stats-user", "email": "stats-user@example.com", "password": "secret"}
+    assert client.post('/api/auth/register', json=credentials).status_code == 201
+
+    after = stats(client, admin_headers, monkeypatch)
+    assert after['users'] == before['users'] + 1
+    with app.app_context():
+        assert after['users'] == User.query.count()
@@ -0,0 +1,110 @@
+"""POST /api/health/records/bulk: body formats, per-day statuses and write notifications."""
+import json
+from datetime import date, timedelta
+import pytest
+from app.routes import health
+from app.signals import health_records_saved
+
+DAY = date(2026, 1, 20)
+URL = '/api/health/records/bulk'
+
+
+def day(k):
+    return (DAY + timedelta(days=k)).isoformat()
+
+
+def stored(client, headers):
+    items = client.get('/api/health/records?fields=lh,stress,daily_steps,daily_note,sentiment_score',
+                       headers=headers).get_json()
+    # A user without records gets the sample dataset instead
+    return {r['date']: r for r in items if not r.get('is_estimated') and not r.get('is_example')}
+
+
+@pytest.fixture
+def notifications():
+    sent = []
+
+    def receiver(sender, **kwargs):
+        sent.append(kwargs)
+
+    health_records_saved.connect(receiver)
+    yield sent
+    health_records_saved.disconnect(receiver)
+
+
+def test_json_array_and_envelope(client, auth_headers):
+    body = client.post(URL, json=[{"date": day(0), "lh": 4.0}], headers=auth_headers).get_json()
+    assert (body['inserted'], body['updated']) == (1, 0)
+    body = client.post(URL, json={"records": [{"date": day(0), "lh": 6.0}, {"date": day(1), "lh": 7.0}]},
+                       headers=auth_headers).get_json()
+    assert (body['inserted'], body['updated']) == (1, 1)
+    assert [r['status'] for r in body['results']] == ['updated', 'inserted']
+    rows = stored(client, auth_headers)
+    assert rows[day(0)]['lh'] == 6.0 and rows[day(1)]['lh'] == 7.0
+
+
+def test_ndjson_body_with_a_bad_line(client, auth_headers):
+    lines = [json.dumps({"date": day(0), "lh": 3.0}), "", "{not json", json.dumps({"date": day(1), "stress": 2})]
+    response = client.post(URL, data="\n".join(lines) + "\n", headers={**auth_headers, 'Content-Type': 'application/x-ndjson'})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body['inserted'], body['error']) == (2, 1)
+    assert [r['status'] for r in body['results']] == ['inserted', 'error', 'inserted']
+    assert set(stored(client, auth_headers)) == {day(0), day(1)}
+
+
+def test_invalid_rows_are_reported_per_row(client, auth_headers):
+    body = client.post(URL, json=[{"date": "2026-13-01"}, "text", {"date": day(0), "lh": "high"}],
+                       headers=auth_headers).get_json()
+    assert [r['status'] for r in body['results']] == ['error', 'error', 'inserted']
+    assert body['results'][2]['ignored_fields'] == ['lh']
+    assert client.post(URL, json={"date": day(0)}, headers=auth_headers).status_code == 400
+
+
+def test_duplicate_dates_keep_the_last_entry(client, auth_headers):
+    payload = [{"date": day(0), "lh": 1.0}, {"date": day(1), "lh": 2.0}, {"date": day(0), "lh": 3.0}]
+    body = client.post(URL, json=payload, headers=auth_headers).get_json()
+    assert [r['status'] for r in body['results']] == ['duplicate', 'inserted', 'inserted']
+    assert (body['inserted'], body['duplicate']) == (2, 1)
+    assert stored(client, auth_headers)[day(0)]['lh'] == 3.0
+
+
+def test_record_limit(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(health, 'MAX_BULK_RECORDS', 3)
+    payload = [{"date": day(k), "lh": 1.0} for k in range(4)]
+    response = client.post(URL, json=payload, headers=auth_headers)
+    assert response.status_code == 413
+    assert stored(client, auth_headers) == {}
+    assert client.post(URL, json=payload[:3], headers=auth_headers).get_json()['inserted'] == 3
+
+
+def test_mixed_key_sets_never_overwrite_omitted_fields(client, auth_headers):
+    client.post(URL, json=[{"date": day(0), "lh": 4.0, "stress": 3, "daily_note": "feeling great"},
+                           {"date": day(1), "lh": 5.0, "daily_steps": 8000}], headers=auth_headers)
+    # Different fields per row, some rows without a note
+    client.post(URL, json=[{"date": day(0), "daily_steps": 9000},
+                           {"date": day(1), "stress": 1},
+                           {"date": day(2), "lh": 6.0}], headers=auth_headers)
+    rows = stored(client, auth_headers)
+    assert (rows[day(0)]['lh'], rows[day(0)]['stress'], rows[day(0)]['daily_steps']) == (4.0, 3, 9000)
+    assert rows[day(0)]['daily_note'] == "feeling great" and rows[day(0)]['sentiment_score'] > 0
+    assert (rows[day(1)]['lh'], rows[day(1)]['stress'], rows[day(1)]['daily_steps']) == (5.0, 1, 8000)
+    assert rows[day(2)]['sentiment_score'] == 0.0 and rows[day(2)]['stress'] is None
+
+
+def test_saved_signal_carries_before_and_after(client, auth_headers, notifications):
+    client.post(URL, json=[{"date": day(0), "lh": 4.0, "stress": 2}], headers=auth_headers)
+    notifications.clear()
+
+    client.post(URL, json=[{"date": day(0), "lh": 5.0}, {"date": day(1), "stress": 1}], headers=auth_headers)
+    assert len(notifications) == 1
+    changes = {c['date'].isoformat(): c for c in notifications[0]['changes']}
+    assert set(changes) == {day(0), day(1)}
+
+    updated = changes[day(0)]
+    assert (updated['before']['lh'], updated['before']['stress']) == (4.0, 2)
+    assert (updated['after']['lh'], updated['after']['stress']) == (5.0, 2)
+
+    inserted = changes[day(1)]
+    assert inserted['before'] is None
+    assert inserted['after']['stress'] == 1 and inserted['after']['lh'] is None
@@ -0,0 +1,61 @@
+import os
+import pytest
+from app.services import dataset_profiler
+from app.services.dataset_profiler import DatasetProfiler
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(dataset_profiler, 'CHUNK_ROWS', 4)
+    monkeypatch.setattr(DatasetProfiler, '_cache', {})
+
+
+def write_csv(path, lines):
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_exact_counts_and_stats_across_chunks(tmp_path, small_chunks):
+    # 10 rows over three 4-row chunks; nulls and extremes fall in different chunks
+    lines = ["id,value,label"] + [f"{i},{'' if i in (2, 9) else i * 1.5},{'ab'[i % 2]}" for i in range(10)]
+    profile = DatasetProfiler.profile(write_csv(tmp_path / "data.csv", lines))
+
+    assert profile['rows'] == 10
+    assert profile['columns'] == ['id', 'value', 'label']
+    assert profile['sample'][2] == {'id': 2, 'value': None, 'label': 'a'}  # NaN sent as null
+    value = profile['profile']['value']
+    assert value['dtype'] == 'float64'
+    assert value['nulls'] == 2
+    present = [i * 1.5 for i in range(10) if i not in (2, 9)]
+    assert (value['min'], value['max']) == (min(present), max(present))
+    assert value['mean'] == pytest.approx(sum(present) / len(present))
+    assert profile['profile']['id']['approx_distinct'] == 10
+    label = profile['profile']['label']
+    assert label['dtype'] == 'object' and label['min'] is None and label['approx_distinct'] == 2
+
+
+def test_column_that_changes_type_in_a_later_chunk(tmp_path, small_chunks):
+    lines = ["id"] + [str(i) for i in range(8)] + ["x9"]
+    profile = DatasetProfiler.profile(write_csv(tmp_path / "mixed.csv", lines))
+    assert profile['rows'] == 9
+    assert profile['profile']['id']['dtype'] == 'object'
+
+
+def test_cache_is_keyed_by_size_and_mtime(tmp_path, small_chunks, monkeypatch):
+    calls = []
+    compute = DatasetProfiler._compute
+    monkeypatch.setattr(DatasetProfiler, '_compute', staticmethod(lambda path: calls.append(path) or compute(path)))
+    path = write_csv(tmp_path / "data.csv", ["a", "1", "2"])
+
+    assert DatasetProfiler.profile(path)['rows'] == 2
+    assert DatasetProfiler.profile(path)['rows'] == 2
+    assert len(calls) == 1
+
+    write_csv(tmp_path / "data.csv", ["a", "1", "2", "3"])  # new size
+    assert DatasetProfiler.profile(path)['rows'] == 3
+    assert len(calls) == 2
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))  # same size, new mtime
+    DatasetProfiler.profile(path)
+    assert len(calls) == 3
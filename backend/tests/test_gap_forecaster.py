@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+import pytest
+from app.services.gap_forecaster import BASE_FIELDS, ESTIMATORS, GapEstimator, GapForecaster, register_estimator
+
+LAST = date(2026, 3, 1)
+
+
+def last_record(day=LAST, **fields):
+    values = {f: None for f in BASE_FIELDS}
+    values.update(daily_steps=6000, stress_score=55.0, deep_sleep_in_minutes=70.0, avg_resting_heart_rate=64.0)
+    values.update(fields)
+    return SimpleNamespace(date=day, **values)
+
+
+def by_date(rows):
+    return {r['date']: r for r in rows}
+
+
+def test_same_inputs_give_identical_output():
+    first = GapForecaster.estimate(1, last_record(), LAST + timedelta(days=10))
+    second = GapForecaster.estimate(1, last_record(), LAST + timedelta(days=10))
+    assert first == second
+    assert [r['date'] for r in first] == [(LAST + timedelta(days=k)).isoformat() for k in range(1, 11)]
+
+
+@pytest.mark.parametrize('estimator', ['mean_reverting', 'carry_forward'])
+def test_shown_days_keep_their_values_as_today_moves(estimator):
+    shorter = GapForecaster.estimate(1, last_record(), LAST + timedelta(days=5), estimator=estimator)
+    longer = GapForecaster.estimate(1, last_record(), LAST + timedelta(days=6), estimator=estimator)
+    assert len(longer) == len(shorter) + 1
+    assert longer[:len(shorter)] == shorter
+
+
+def test_newer_record_changes_the_estimate():
+    today = LAST + timedelta(days=10)
+    before = by_date(GapForecaster.estimate(1, last_record(), today))
+    after = by_date(GapForecaster.estimate(1, last_record(LAST + timedelta(days=3), daily_steps=9000), today))
+    assert len(after) == len(before) - 3
+    assert all(after[d]['daily_steps'] != before[d]['daily_steps'] for d in after)
+
+
+def test_cap_drops_the_older_days():
+    rows = GapForecaster.estimate(1, last_record(), LAST + timedelta(days=30), max_days=10, mode='cap')
+    assert [r['date'] for r in rows] == [(LAST + timedelta(days=k)).isoformat() for k in range(21, 31)]
+    # The kept days are the same as in the uncapped series
+    full = by_date(GapForecaster.estimate(1, last_record(), LAST + timedelta(days=30), max_days=0))
+    assert all(full[r['date']] == r for r in rows)
+
+
+def test_summarize_collapses_older_days_into_weeks():
+    rows = GapForecaster.estimate(1, last_record(), LAST + timedelta(days=30), max_days=10, mode='summarize')
+    weeks = [r for r in rows if r['id'].startswith('est-week')]
+    days = [r for r in rows if not r['id'].startswith('est-week')]
+    # 20 older days: two full weeks and a 6-day remainder
+    assert [w['span_days'] for w in weeks] == [7, 7, 6]
+    assert [w['date'] for w in weeks] == [(LAST + timedelta(days=k)).isoformat() for k in (1, 8, 15)]
+    assert len(days) == 10 and days[0]['date'] == (LAST + timedelta(days=21)).isoformat()
+
+
+def test_estimator_without_estimate_fails_at_registration():
+    with pytest.raises(TypeError):
+        @register_estimator
+        class Incomplete(GapEstimator):
+            name = 'incomplete'
+
+    assert 'incomplete' not in ESTIMATORS
+    assert {'mean_reverting', 'carry_forward'} <= set(ESTIMATORS)
@@ -0,0 +1,81 @@
+"""GET /api/health/records: conditional requests, keyset pages and projection."""
+from datetime import date, timedelta
+
+DAY = date(2026, 2, 10)
+
+
+def record(day, **fields):
+    return {"date": day.isoformat(), "lh": 5.0, "estrogen": 120.0, "pdg": 4.0, "stress": 2, **fields}
+
+
+def seed(client, headers, n=5):
+    payload = [record(DAY - timedelta(days=k), lh=1.0 + k) for k in range(n)]
+    assert client.post('/api/health/records/bulk', json=payload, headers=headers).status_code == 200
+
+
+def stored(items):
+    return [r for r in items if not r['is_estimated']]
+
+
+def test_etag_round_trip_and_change_after_update(client, auth_headers):
+    seed(client, auth_headers)
+    first = client.get('/api/health/records', headers=auth_headers)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag
+
+    again = client.get('/api/health/records', headers={**auth_headers, 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert again.get_data() == b''
+
+    # Same row count, new updated_at: the validator must still change
+    record_id = stored(first.get_json())[0]['id']
+    response = client.put(f'/api/health/record/{record_id}', json={"lh": 9.5}, headers=auth_headers)
+    assert response.status_code == 200
+    after = client.get('/api/health/records', headers={**auth_headers, 'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+    assert next(r for r in after.get_json() if r['id'] == record_id)['lh'] == 9.5
+
+
+def test_etag_depends_on_the_query(client, auth_headers):
+    seed(client, auth_headers)
+    full = client.get('/api/health/records', headers=auth_headers).headers['ETag']
+    paged = client.get('/api/health/records?limit=2', headers={**auth_headers, 'If-None-Match': full})
+    assert paged.status_code == 200
+    assert paged.headers['ETag'] != full
+
+
+def test_cursor_walks_every_record_once(client, auth_headers):
+    seed(client, auth_headers, n=5)
+    dates, cursor, pages = [], None, 0
+    while True:
+        url = '/api/health/records?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(url, headers=auth_headers).get_json()
+        pages += 1
+        dates += [r['date'] for r in stored(body['items'])]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+        # Estimated days only come with the last page
+        assert not any(r['is_estimated'] for r in body['items'])
+    assert pages == 3
+    assert dates == sorted((DAY - timedelta(days=k)).isoformat() for k in range(5))
+
+
+def test_fields_projection(client, auth_headers):
+    client.post('/api/health/record', json=record(DAY, daily_note="feeling good"), headers=auth_headers)
+    items = client.get('/api/health/records?fields=lh,daily_note', headers=auth_headers).get_json()
+    for item in items:
+        assert set(item) <= {"id", "date", "lh", "daily_note", "is_estimated", "is_example"}
+    row = stored(items)[0]
+    assert row['lh'] == 5.0 and row['daily_note'] == "feeling good"
+    # Notes are not part of the default columns
+    assert 'daily_note' not in stored(client.get('/api/health/records', headers=auth_headers).get_json())[0]
+
+
+def test_unknown_fields_are_rejected(client, auth_headers):
+    seed(client, auth_headers, n=1)
+    response = client.get('/api/health/records?fields=lh,password_hash', headers=auth_headers)
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['msg']
@@ -0,0 +1,82 @@
+"""Chat answer cache: keys, versioning and the in-process backend."""
+from datetime import datetime
+import pytest
+from app.services import llm_cache
+from app.services.llm_cache import LLMCache, MemoryBackend, normalize_message, normalize_context
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    monkeypatch.setattr(LLMCache, 'backend', MemoryBackend(ttl=60, max_entries=100))
+    return LLMCache
+
+
+def test_message_normalization():
+    assert normalize_message("  How am I   doing TODAY?? ") == normalize_message("how am i doing today")
+    assert normalize_message("how am i doing") != normalize_message("how was i doing")
+
+
+def test_context_normalization():
+    assert normalize_context({"steps": "8000", "mood": " Happy ", "symptoms": ""}) == \
+        normalize_context({"mood": "happy", "steps": 8000.0, "note": None})
+
+
+def test_key_ignores_case_whitespace_and_key_order(memory_cache):
+    a = {"message": "How am I doing?", "context": {"language": "en", "steps": 8000, "mode": "normal"}}
+    b = {"message": " how am i   doing ", "context": {"mode": "normal", "steps": "8000"}}
+    assert LLMCache.key(1, a, 'v1') == LLMCache.key(1, b, 'v1')
+    assert LLMCache.key(1, a, 'v1') != LLMCache.key(2, a, 'v1')
+    assert LLMCache.key(1, a, 'v1') != LLMCache.key(1, {**a, "model": "llama"}, 'v1')
+    assert LLMCache.key(1, a, 'v1') != LLMCache.key(1, a, 'v2')
+    # No version (degraded prompt) or no backend: nothing is cached
+    assert LLMCache.key(1, a, None) is None
+
+
+def test_memory_backend_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, 'monotonic', lambda: now[0])
+    backend = MemoryBackend(ttl=10, max_entries=10)
+    backend.set('k', 1, {"response": "hi"})
+    now[0] += 9
+    assert backend.get('k') == {"response": "hi"}
+    now[0] += 2
+    assert backend.get('k') is None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(ttl=60, max_entries=2)
+    backend.set('a', 1, "A")
+    backend.set('b', 1, "B")
+    assert backend.get('a') == "A"  # a is now the most recent
+    backend.set('c', 1, "C")
+    assert backend.get('b') is None
+    assert (backend.get('a'), backend.get('c')) == ("A", "C")
+
+
+def test_invalidate_user_drops_only_that_user():
+    backend = MemoryBackend(ttl=60, max_entries=10)
+    backend.set('1:x', 1, "one")
+    backend.set('2:x', 2, "two")
+    backend.invalidate_user(1)
+    assert backend.get('1:x') is None and backend.get('2:x') == "two"
+
+
+def test_saving_a_record_changes_the_answer_key(client, auth_headers):
+    body = {"message": "How is my week?", "context": {"language": "en"}}
+    first = client.post('/api/chat/message', json=body, headers=auth_headers)
+    cached = client.post('/api/chat/message', json=body, headers=auth_headers)
+    assert cached.get_json() == first.get_json()
+    assert cached.headers['X-Query-Count'] == '0'
+
+    user_id = client.get('/api/auth/me', headers=auth_headers).get_json()['id']
+    from app.services.history_context import HistoryContextService
+    with client.application.app_context():
+        version = HistoryContextService.get(user_id)['version']
+
+    today = datetime.utcnow().date().isoformat()
+    client.post('/api/health/record', json={"date": today, "stress": 3}, headers=auth_headers)
+    with client.application.app_context():
+        new_version = HistoryContextService.get(user_id)['version']
+    assert new_version != version
+    assert LLMCache.key(user_id, body, new_version) != LLMCache.key(user_id, body, version)
+    assert LLMCache.get(LLMCache.key(user_id, body, new_version)) is None
@@ -0,0 +1,66 @@
+"""Circuit breaker bookkeeping for streamed calls (no app needed)."""
+import gc
+import pytest
+from app.services.llm_service import LLMExecutor, LLMService, FakeProvider, ProviderBusy
+from app.services.llm_router import LLMRouter
+
+
+@pytest.fixture
+def service(monkeypatch):
+    executor = LLMExecutor(max_workers=2, limits={'default': 1}, timeout=2.0, acquire_timeout=0.05)
+    router = LLMRouter(executor, failure_threshold=1, cooldown=0.0, hedging=False)
+    monkeypatch.setattr(LLMService, 'executor', executor)
+    monkeypatch.setattr(LLMService, 'router', router)
+    return LLMService
+
+
+def half_open(service, provider):
+    """Opens the breaker with one failed stream; cooldown 0 makes the next allow() the trial."""
+    provider.fail = True
+    with pytest.raises(Exception):
+        list(service.stream(provider, 'USER QUESTION: hi', ''))
+    provider.fail = False
+    assert service.router.stats(provider).opened_at is not None
+
+
+def prompt(text='hi'):
+    return f'USER QUESTION: {text}'
+
+
+def test_successful_trial_closes_breaker(service):
+    provider = FakeProvider()
+    half_open(service, provider)
+    assert ''.join(service.stream(provider, prompt(), '')).startswith('(fake)')
+    assert service.router.stats(provider).opened_at is None
+
+
+def test_disconnect_releases_trial(service):
+    provider = FakeProvider()
+    half_open(service, provider)
+    tokens = service.stream(provider, prompt('a b c'), '')
+    next(tokens)
+    tokens.close()
+    stats = service.router.stats(provider)
+    assert not stats.trial_in_flight and stats.allow()
+
+
+def test_unread_stream_releases_trial(service):
+    provider = FakeProvider()
+    half_open(service, provider)
+    service.stream(provider, prompt(), '')
+    gc.collect()
+    assert service.router.stats(provider).allow()
+
+
+def test_busy_executor_releases_trial(service):
+    provider = FakeProvider(delay=0.2)
+    half_open(service, provider)
+    stats = service.router.stats(provider)
+    stats.opened_at -= 1  # keep it open while the slot is held below
+    hold = service.executor._acquire(provider)
+    try:
+        with pytest.raises(ProviderBusy):
+            service.stream(provider, prompt(), '')
+    finally:
+        hold.release()
+    assert not stats.trial_in_flight
@@ -0,0 +1,11 @@
+import pytest
+from app.services.llm_service import LLMProvider, FakeProvider
+
+
+def test_provider_without_stream_cannot_be_created():
+    class Incomplete(LLMProvider):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    assert FakeProvider().complete('USER QUESTION: hi', '')
@@ -0,0 +1,58 @@
+"""Metrics merged across worker processes (METRICS_MULTIPROC_DIR)."""
+import multiprocessing as mp
+import os
+import pytest
+from app.utils import metrics
+
+REQUESTS = metrics.counter('test_worker_requests_total', 'Requests by worker test', ['route'])
+LATENCY = metrics.histogram('test_worker_seconds', 'Latency by worker test', buckets=(0.1, 1.0))
+DEPTH = metrics.gauge('test_worker_queue_depth', 'Queue depth by worker test')
+
+
+@pytest.fixture
+def multiproc_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, '_multiproc_dir', None)
+    monkeypatch.setattr(metrics, '_flusher_pid', None)  # also stops the flush thread on teardown
+    for metric in (REQUESTS, LATENCY, DEPTH):
+        metric._values.clear()
+    metrics.init_multiprocess(str(tmp_path))
+    return tmp_path
+
+
+def _worker(path):
+    # What gunicorn's post_fork does, then a few requests
+    metrics.init_multiprocess(path)
+    REQUESTS.inc(2, route='a')
+    LATENCY.observe(0.5)
+    DEPTH.set(7)
+    metrics.flush()
+
+
+def sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+
+def test_scrape_sums_counters_across_workers(multiproc_dir):
+    REQUESTS.inc(route='a')
+    LATENCY.observe(0.05)
+    DEPTH.set(3)
+
+    worker = mp.get_context('fork').Process(target=_worker, args=(str(multiproc_dir),))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+
+    text = metrics.render_latest()
+    # The worker started from zero, so the value it inherited is not counted twice
+    assert sample(text, 'test_worker_requests_total{') == ['test_worker_requests_total{route="a"} 3']
+    assert sample(text, 'test_worker_seconds_count') == ['test_worker_seconds_count 2']
+    assert 'test_worker_seconds_bucket{le="0.1"} 1' in text
+    # Gauges come from live processes only, labelled with the pid
+    assert sample(text, 'test_worker_queue_depth{') == [f'test_worker_queue_depth{{pid="{os.getpid()}"}} 3']
+
+
+def test_without_a_directory_values_are_per_process(monkeypatch):
+    monkeypatch.setattr(metrics, '_multiproc_dir', None)
+    REQUESTS._values.clear()
+    REQUESTS.inc(route='b')
+    assert 'test_worker_requests_total{route="b"} 1' in metrics.render_latest()
@@ -0,0 +1,66 @@
+"""PREDICTION_PIPELINE = 'sync': saving records scores them in the same request."""
+from datetime import date, timedelta
+from app.models import Prediction
+from app.utils.query_guard import assert_max_queries
+
+DAY = date(2026, 5, 20)
+
+
+def record(day, lh=5.0):
+    return {"date": day.isoformat(), "lh": lh, "estrogen": 120.0, "pdg": 4.0, "stress": 2}
+
+
+def stored_predictions(app, headers, client):
+    history = client.get('/api/predictions/history', headers=headers).get_json()
+    return {p['date']: p for p in history}
+
+
+def test_saving_a_record_scores_it(app, client, auth_headers):
+    client.post('/api/health/record', json=record(DAY), headers=auth_headers)
+    assert DAY.isoformat() in stored_predictions(app, auth_headers, client)
+
+
+def test_bulk_save_matches_predict_batch(app, client, auth_headers):
+    payload = [record(DAY - timedelta(days=k), lh=3.0 + k) for k in range(10)]
+    client.post('/api/health/records/bulk', json=payload, headers=auth_headers)
+    background = stored_predictions(app, auth_headers, client)
+    assert len(background) == 10
+
+    batch = client.post('/api/predictions/predict-batch',
+                        json={"start_date": (DAY - timedelta(days=9)).isoformat(), "end_date": DAY.isoformat()},
+                        headers=auth_headers).get_json()
+    for p in batch['predictions']:
+        assert background[p['date']]['phase'] == p['phase']
+        assert abs(background[p['date']]['confidence'] - p['confidence']) < 1e-9
+
+
+def test_scoring_job_query_count(app, client, auth_headers):
+    client.post('/api/health/record', json=record(DAY), headers=auth_headers)
+    from app.services.prediction_pipeline import PredictionPipeline
+    user_id = client.get('/api/auth/me', headers=auth_headers).get_json()['id']
+    with app.test_request_context():
+        with assert_max_queries(2):  # FeatureLoader.load + one upsert
+            PredictionPipeline._score(app, user_id, DAY - timedelta(days=5), DAY)
+        assert Prediction.query.filter_by(user_id=user_id).count() == 1
+
+
+def test_moving_a_record_rescores_the_vacated_day(app, client, auth_headers):
+    payload = [record(DAY - timedelta(days=k), lh=2.0 + 3 * k) for k in range(6)]
+    client.post('/api/health/records/bulk', json=payload, headers=auth_headers)
+    records = client.get('/api/health/records', headers=auth_headers).get_json()
+    old_day = DAY - timedelta(days=3)
+    record_id = next(r['id'] for r in records if r['date'] == old_day.isoformat() and not r['is_estimated'])
+
+    new_day = DAY + timedelta(days=10)
+    response = client.put(f'/api/health/record/{record_id}', json={"date": new_day.isoformat()}, headers=auth_headers)
+    assert response.status_code == 200
+
+    stored = stored_predictions(app, auth_headers, client)
+    assert old_day.isoformat() not in stored
+    assert new_day.isoformat() in stored
+    # The days after the vacated one were rescored without it in their lags
+    batch = client.post('/api/predictions/predict-batch',
+                        json={"start_date": (DAY - timedelta(days=5)).isoformat(), "end_date": DAY.isoformat()},
+                        headers=auth_headers).get_json()
+    for p in batch['predictions']:
+        assert abs(stored[p['date']]['confidence'] - p['confidence']) < 1e-9
@@ -0,0 +1,64 @@
+"""POST /api/predictions/predict-batch against the per-day /predict."""
+from datetime import date, timedelta
+from app.routes.predictions import MAX_BATCH_DAYS
+
+DAY = date(2026, 4, 15)
+
+
+def record(day, lh):
+    return {"date": day.isoformat(), "lh": lh, "estrogen": 90.0 + 10 * lh, "pdg": 2.0 + lh / 4,
+            "stress": int(lh) % 4, "overall_score": 70 + lh, "daily_steps": 4000 + 500 * lh}
+
+
+def batch(client, headers, start, end):
+    return client.post('/api/predictions/predict-batch',
+                       json={"start_date": start.isoformat(), "end_date": end.isoformat()}, headers=headers)
+
+
+def test_batch_matches_per_day_predict(client, auth_headers):
+    # Days 0-9 with 3 and 6 missing, so some lag features come from before a gap
+    days = [DAY - timedelta(days=k) for k in range(10) if k not in (3, 6)]
+    payload = [record(day, lh=1.0 + 1.5 * i) for i, day in enumerate(days)]
+    assert client.post('/api/health/records/bulk', json=payload, headers=auth_headers).status_code == 200
+
+    response = batch(client, auth_headers, DAY - timedelta(days=9), DAY)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == len(days)
+    assert [p['date'] for p in body['predictions']] == sorted(d.isoformat() for d in days)
+
+    for p in body['predictions']:
+        single = client.post('/api/predictions/predict', json={"date": p['date']}, headers=auth_headers)
+        assert single.status_code == 200
+        single = single.get_json()
+        assert single['phase'] == p['phase']
+        assert abs(single['confidence'] - p['confidence']) < 1e-9
+
+
+def test_days_without_a_record_are_skipped(client, auth_headers):
+    payload = [record(DAY, lh=4.0), record(DAY - timedelta(days=4), lh=6.0)]
+    client.post('/api/health/records/bulk', json=payload, headers=auth_headers)
+
+    body = batch(client, auth_headers, DAY - timedelta(days=6), DAY).get_json()
+    assert body['count'] == 2
+    assert body['skipped_days'] == 5
+    assert [p['date'] for p in body['predictions']] == [(DAY - timedelta(days=4)).isoformat(), DAY.isoformat()]
+
+    # A range with no records at all is an empty result, not an error
+    empty = batch(client, auth_headers, DAY + timedelta(days=1), DAY + timedelta(days=3))
+    assert empty.status_code == 200
+    assert empty.get_json()['predictions'] == [] and empty.get_json()['skipped_days'] == 3
+
+
+def test_range_limits(client, auth_headers):
+    end = DAY
+    ok = batch(client, auth_headers, end - timedelta(days=MAX_BATCH_DAYS - 1), end)
+    assert ok.status_code == 200
+
+    too_long = batch(client, auth_headers, end - timedelta(days=MAX_BATCH_DAYS), end)
+    assert too_long.status_code == 400
+    assert str(MAX_BATCH_DAYS) in too_long.get_json()['msg']
+
+    assert batch(client, auth_headers, end, end - timedelta(days=1)).status_code == 400
+    bad = client.post('/api/predictions/predict-batch', json={"start_date": "15/04/2026"}, headers=auth_headers)
+    assert bad.status_code == 400
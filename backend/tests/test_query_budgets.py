@@ -0,0 +1,92 @@
+"""
+Every endpoint in QUERY_BUDGETS, called with QUERY_GUARD = 'strict': a
+request over its budget (or an unexpected N+1) fails with a 500 naming the
+endpoint, so a change that adds queries fails here.
+"""
+from datetime import date, datetime, timedelta
+from app.utils.query_guard import QUERY_BUDGETS
+
+DAY = date(2026, 3, 10)
+
+
+def record(day, **fields):
+    return {"date": day.isoformat(), "lh": 5.0, "estrogen": 120.0, "pdg": 4.0, "stress": 2,
+            "overall_score": 80, "daily_steps": 6000, **fields}
+
+
+def seed_days(client, headers, n=5):
+    payload = [record(DAY - timedelta(days=k)) for k in range(n)]
+    response = client.post('/api/health/records/bulk', json=payload, headers=headers)
+    assert response.status_code == 200, response.get_json()
+
+
+def check(response, endpoint, status=200):
+    assert response.status_code == status, (endpoint, response.status_code, response.get_data(as_text=True)[:300])
+    assert int(response.headers['X-Query-Count']) <= QUERY_BUDGETS[endpoint]
+
+
+def test_auth_endpoints(client):
+    credentials = {"username": "budget", "email": "budget@example.com", "password": "secret"}
+    check(client.post('/api/auth/register', json=credentials), 'auth.register', 201)
+    response = client.post('/api/auth/login', json=credentials)
+    check(response, 'auth.login')
+    headers = {"Authorization": f"Bearer {response.get_json()['access_token']}"}
+    check(client.get('/api/auth/me', headers=headers), 'auth.me')
+
+
+def test_health_endpoints(client, auth_headers):
+    check(client.post('/api/health/record', json=record(DAY), headers=auth_headers), 'health.add_record', 201)
+    record_id = client.post('/api/health/record', json=record(DAY - timedelta(days=1)), headers=auth_headers).get_json()['id']
+    check(client.put(f'/api/health/record/{record_id}', json={"lh": 6.0}, headers=auth_headers),
+          'health.update_record_by_id')
+    payload = [record(DAY - timedelta(days=k)) for k in range(2, 40)]
+    check(client.post('/api/health/records/bulk', json=payload, headers=auth_headers), 'health.bulk_upsert_records')
+    check(client.get('/api/health/records', headers=auth_headers), 'health.get_records')
+    check(client.get('/api/health/records?limit=10&fields=lh,daily_note', headers=auth_headers), 'health.get_records')
+
+
+def test_prediction_endpoints(client, auth_headers):
+    seed_days(client, auth_headers)
+    check(client.post('/api/predictions/predict', json={"date": DAY.isoformat()}, headers=auth_headers),
+          'predictions.predict')
+    response = client.post('/api/predictions/predict-batch',
+                           json={"start_date": (DAY - timedelta(days=4)).isoformat(), "end_date": DAY.isoformat()},
+                           headers=auth_headers)
+    check(response, 'predictions.predict_batch')
+    assert response.get_json()['count'] == 5
+    check(client.get('/api/predictions/history', headers=auth_headers), 'predictions.get_prediction_history')
+
+
+def test_admin_and_dataset_endpoints(client, admin_headers):
+    check(client.get('/api/admin/stats', headers=admin_headers), 'admin.get_stats')
+    check(client.get('/api/datasets/summary'), 'datasets.get_global_summary')
+
+
+def test_chat_endpoints_with_fake_provider(client, auth_headers):
+    seed_days(client, auth_headers)
+    body = {"message": "How am I doing?", "context": {"language": "en"}}
+
+    response = client.post('/api/chat/message', json=body, headers=auth_headers)
+    check(response, 'chat.chat_message')
+    assert response.get_json()['response'].startswith('(fake) You asked: How am I doing?')
+
+    response = client.post('/api/chat/stream', json={**body, "message": "And tomorrow?"}, headers=auth_headers)
+    check(response, 'chat.chat_stream')
+    text = response.get_data(as_text=True)
+    assert '"token": "(fake) "' in text and 'event: done' in text
+
+    # Same question again: served from the answer cache
+    response = client.post('/api/chat/message', json=body, headers=auth_headers)
+    check(response, 'chat.chat_message')
+    # Same user, same day: neither the lookup nor a new question touches the database
+    assert response.headers['X-Query-Count'] == '0'
+    response = client.post('/api/chat/message', json={**body, "message": "Why?"}, headers=auth_headers)
+    check(response, 'chat.chat_message')
+    assert response.headers['X-Query-Count'] == '0'
+
+    # A record in the history window changes the context version: the answer is regenerated
+    today = datetime.utcnow().date()
+    check(client.post('/api/health/record', json=record(today), headers=auth_headers), 'health.add_record', 201)
+    response = client.post('/api/chat/message', json=body, headers=auth_headers)
+    check(response, 'chat.chat_message')
+    assert int(response.headers['X-Query-Count']) > 0
@@ -0,0 +1,19 @@
+"""POST /api/admin/seed for a user who already has records."""
+from datetime import datetime, timedelta
+from app.models import HealthRecord
+from app.services.sample_data import SEED_ROWS
+
+
+def test_seeding_skips_existing_days_and_can_repeat(app, client, auth_headers):
+    own_day = datetime.utcnow().date() - timedelta(days=25)
+    client.post('/api/health/record', json={"date": own_day.isoformat(), "lh": 42.0}, headers=auth_headers)
+    user_id = client.get('/api/auth/me', headers=auth_headers).get_json()['id']
+
+    for _ in range(2):
+        assert client.post('/api/admin/seed', headers=auth_headers).status_code == 200
+
+    with app.app_context():
+        rows = HealthRecord.query.filter_by(user_id=user_id).all()
+        assert len(rows) == SEED_ROWS
+        assert len({r.date for r in rows}) == SEED_ROWS
+        assert next(r for r in rows if r.date == own_day).lh == 42.0
@@ -0,0 +1,37 @@
+import pytest
+from app.services.sentiment import score_note
+
+
+@pytest.mark.parametrize('note, expected', [
+    ("", 0.0),
+    (None, 0.0),
+    ("I feel good", 0.25),
+    ("I feel bad", -0.25),
+    ("I don't feel good", -0.25),
+    ("I don’t feel good", -0.25),
+    ("I don‘t feel good", -0.25),
+    ("I do not feel good", -0.25),
+    ("not tired", 0.25),
+])
+def test_negation(note, expected):
+    assert score_note(note) == pytest.approx(expected)
+
+
+def test_negation_covers_the_next_three_words():
+    assert score_note("not feeling very good") == pytest.approx(-0.25)
+    assert score_note("not feeling so very good") == pytest.approx(0.25)
+
+
+def test_negation_stops_at_a_clause_break():
+    assert score_note("not great, but good") == pytest.approx(0.0)
+    assert score_note("not great but good") == pytest.approx(-0.5)
+
+
+def test_only_whole_words_count():
+    assert score_note("goodness, wellness and a badge") == 0.0
+    assert score_note("notably good") == pytest.approx(0.25)
+
+
+def test_score_is_clamped():
+    assert score_note("great " * 10) == 1.0
+    assert score_note("awful " * 10) == -1.0
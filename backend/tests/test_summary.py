@@ -0,0 +1,45 @@
+"""GET /api/datasets/summary over the raw study exports plus app data."""
+import time
+from app.services.ml_service import PHASE_SIMPLE
+
+
+def test_summary_uses_one_phase_vocabulary(client):
+    summary = client.get('/api/datasets/summary').get_json()
+    assert set(summary['phase_distribution']) <= set(PHASE_SIMPLE.values())
+
+
+def test_raw_records_count_participant_days(app):
+    from app.services.analysis_service import DataAnalysisService, RAW_DIR
+    import os
+    import pandas as pd
+    days = pd.read_csv(os.path.join(RAW_DIR, 'hormones_and_selfreport.csv'), usecols=['id', 'day_in_study'])
+    assert DataAnalysisService._raw[1]['records'] == len(days.drop_duplicates())
+
+
+def test_failed_raw_read_is_not_retried_until_the_files_change(app, monkeypatch):
+    from app.services.analysis_service import DataAnalysisService
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise OSError("unreadable export")
+
+    monkeypatch.setattr(DataAnalysisService, '_compute_raw_aggregates', failing)
+    monkeypatch.setattr(DataAnalysisService, '_raw', None)
+    monkeypatch.setattr(DataAnalysisService, '_raw_attempted', None)
+    signature = [('a.csv', 1, 1)]
+    monkeypatch.setattr(DataAnalysisService, '_raw_signature', classmethod(lambda cls: tuple(signature)))
+
+    def request_summary():
+        assert DataAnalysisService._raw_aggregates()['records'] == 0
+        deadline = time.monotonic() + 5
+        while DataAnalysisService._raw_refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    for _ in range(3):
+        request_summary()
+    assert len(calls) == 1
+
+    signature[0] = ('a.csv', 2, 2)
+    request_summary()
+    assert len(calls) == 2
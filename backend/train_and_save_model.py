@@ -1,66 +1,305 @@
+"""
+Trains the phase classifier and publishes it as a new ml_models version.
+
+    0. a participant-grouped test split (TEST_FRACTION) is set aside; the
+       search and early stopping only see the remaining participants.
+    1. hyperparameter search: every PARAM_GRID candidate is scored with
+       participant-grouped K-fold CV. The (candidate, fold) fits run in a
+       process pool, each fit with n_jobs // workers threads.
+    2. final model: early stopping on a participant-grouped validation split
+       picks the number of trees, the early-stopped model is scored on the
+       test participants, then the model is refit on all rows.
+    3. artifacts, training_report.json (wall times, per-fold accuracy,
+       inference latency of the published bundle) and the manifest.
+
+Tree models don't need feature scaling: scaler.joblib is a passthrough kept
+so the joblib format and the native bundle have the same layout.
+
+Usage (from the backend directory):
+    python train_and_save_model.py [--data ../data/processed/features] [--folds 5] [--workers 4] [--n-jobs 8] [--no-search]
+"""
+import argparse
 import pandas as pd
 import numpy as np
 import os
+import json
+import time
+import itertools
 import joblib
-from sklearn.preprocessing import LabelEncoder, StandardScaler, MinMaxScaler
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import GroupKFold, GroupShuffleSplit
+from sklearn.preprocessing import LabelEncoder, StandardScaler
 from xgboost import XGBClassifier
+from app.services.ml_service import (
+    ModelBundle, write_native_bundle, file_sha256, NATIVE_MODEL_FILE, PREPROCESS_FILE
+)
 
 # Constants
 DATA_PATH = "../data/processed/final_dataset.csv"
 MODEL_DIR = "ml_models"
+REPORT_FILE = "training_report.json"
+RANDOM_STATE = 42
+
+# Select Features (as per notebook)
+FEATURES = [
+    "lh","estrogen","pdg",
+    "cramps","fatigue","moodswing",
+    "stress","bloating","sleepissue",
+    "overall_score","deep_sleep_in_minutes",
+    "avg_resting_heart_rate","stress_score","daily_steps",
+    "lh_prev1","lh_prev2","estrogen_prev1","pdg_prev1","stress_prev1"
+]
+
+# Fixed booster settings; n_estimators is an upper bound cut by early stopping
+BASE_PARAMS = {
+    "tree_method": "hist",
+    "objective": "multi:softprob",
+    "eval_metric": "mlogloss",
+    "n_estimators": 1000,
+    "random_state": RANDOM_STATE
+}
+EARLY_STOPPING_ROUNDS = 30
+VALIDATION_FRACTION = 0.2
+# Participants never used for search or early stopping (test_accuracy)
+TEST_FRACTION = 0.2
+
+# Search space (the notebook's GridSearchCV grid); DEFAULT_PARAMS is used with --no-search
+PARAM_GRID = {
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.05, 0.1],
+    "subsample": [0.8, 1.0]
+}
+DEFAULT_PARAMS = {"max_depth": 6, "learning_rate": 0.1, "subsample": 0.8}
+
+
+def load_data(data_path):
+    """Training rows from the flat CSV or a feature_pipeline.py Parquet dataset.
+    Returns (df, data_sha256, sources built without their raw file)."""
+    if os.path.isdir(data_path):
+        import feature_pipeline
+        manifest = feature_pipeline.read_manifest(data_path)
+        if manifest is None:
+            raise FileNotFoundError(f"{data_path} has no _manifest.json; run feature_pipeline.py first")
+        missing = manifest.get("missing_sources", [])
+        if missing:
+            print(f"WARNING: {data_path} was built without {', '.join(missing)}; "
+                  "those features are constant 0 and the model will ignore them")
+        return feature_pipeline.load_dataset(data_path), manifest["key"], missing
+    return pd.read_csv(data_path), file_sha256(data_path), []
+
+
+def grouped_split(groups, fraction, seed=RANDOM_STATE):
+    """(train_idx, valid_idx) with whole participants on each side."""
+    splitter = GroupShuffleSplit(n_splits=1, test_size=fraction, random_state=seed)
+    return next(splitter.split(np.zeros(len(groups)), groups=groups))
+
+
+def fit_early_stopped(params, X, y, groups, n_jobs):
+    """Fits on a participant-grouped split of (X, y), stopping on the held-out participants."""
+    train_idx, valid_idx = grouped_split(groups, VALIDATION_FRACTION)
+    model = XGBClassifier(**BASE_PARAMS, **params, n_jobs=n_jobs, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    model.fit(X[train_idx], y[train_idx], eval_set=[(X[valid_idx], y[valid_idx])], verbose=False)
+    return model, valid_idx
+
+
+# Set once per pool worker so tasks only carry indices
+_worker_data = {}
+
+
+def _init_worker(X, y, groups, n_jobs):
+    _worker_data.update(X=X, y=y, groups=groups, n_jobs=n_jobs)
+
+
+def _score_fold(candidate, fold, train_idx, test_idx):
+    X, y, groups = _worker_data["X"], _worker_data["y"], _worker_data["groups"]
+    start = time.perf_counter()
+    model, _ = fit_early_stopped(candidate, X[train_idx], y[train_idx], groups[train_idx], _worker_data["n_jobs"])
+    return {
+        "fold": fold,
+        "accuracy": float(accuracy_score(y[test_idx], model.predict(X[test_idx]))),
+        "best_iteration": int(model.best_iteration),
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def search(X, y, groups, candidates, folds, workers, n_jobs):
+    """Grouped K-fold accuracy of every candidate; (candidate, fold) fits run in parallel."""
+    splits = list(GroupKFold(n_splits=folds).split(X, y, groups))
+    threads = max(1, n_jobs // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y, groups, threads)) as pool:
+        futures = {
+            (i, fold): pool.submit(_score_fold, candidate, fold, train_idx, test_idx)
+            for i, candidate in enumerate(candidates)
+            for fold, (train_idx, test_idx) in enumerate(splits)
+        }
+        results = []
+        for i, candidate in enumerate(candidates):
+            fold_results = [futures[(i, fold)].result() for fold in range(folds)]
+            accuracies = [r["accuracy"] for r in fold_results]
+            results.append({
+                "params": candidate,
+                "mean_accuracy": float(np.mean(accuracies)),
+                "std_accuracy": float(np.std(accuracies)),
+                "folds": fold_results
+            })
+            print(f"  {candidate}: {np.mean(accuracies):.4f} +/- {np.std(accuracies):.4f}")
+    return results
 
-def train():
-    if not os.path.exists(MODEL_DIR):
-        os.makedirs(MODEL_DIR)
+
+def inference_latency(model_dir, X, iterations=500):
+    """Single-row and batch latency of the published bundle through MLService's engine."""
+    engine = ModelBundle(model_dir, "report", None).engine
+    rows = X[np.random.default_rng(RANDOM_STATE).integers(0, len(X), iterations)]
+    for row in rows[:50]:
+        engine.predict(row)
+    timings = np.empty(iterations)
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        engine.predict(row)
+        timings[i] = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.predict(X)
+    batch_seconds = time.perf_counter() - start
+    p50, p99 = np.percentile(timings * 1000.0, [50, 99])
+    return {
+        "single_row_p50_ms": round(float(p50), 4),
+        "single_row_p99_ms": round(float(p99), 4),
+        "batch_rows": len(X),
+        "batch_ms": round(batch_seconds * 1000.0, 3)
+    }
+
+
+def publish(version, out_dir, files, data_path, data_sha256, native=None):
+    """Writes the version manifest, then atomically points ml_models/LATEST at it.
+    A running backend picks the new version up without a restart.
+    The manifest records a sha256 per artifact and of the training data, and
+    names the native bundle (model.ubj + preprocess.json) the backend loads
+    in preference to the joblib pickles."""
+    manifest = {
+        "version": version,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "data_path": data_path,
+        "data_sha256": data_sha256,
+        "files": files,
+        "checksums": {name: file_sha256(os.path.join(out_dir, name)) for name in files}
+    }
+    if native:
+        manifest["native"] = native
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    pointer_tmp = os.path.join(MODEL_DIR, "LATEST.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(MODEL_DIR, "LATEST"))
+
+
+def train(data_path=DATA_PATH, folds=5, workers=None, n_jobs=None, run_search=True):
+    started = time.perf_counter()
+    timings = {}
+    n_jobs = n_jobs or os.cpu_count() or 1
+    workers = max(1, min(workers or n_jobs, n_jobs))
+
+    # Each run gets its own directory so the live artifacts are never overwritten in place
+    version = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    out_dir = os.path.join(MODEL_DIR, "versions", version)
+    os.makedirs(out_dir, exist_ok=True)
 
     # Load data
-    df = pd.read_csv(DATA_PATH)
-    
+    df, data_sha256, missing_sources = load_data(data_path)
+
     # Encode Target
     le = LabelEncoder()
-    df["phase_encoded"] = le.fit_transform(df["phase_simple"])
-    
-    # Save LabelEncoder
-    joblib.dump(le, os.path.join(MODEL_DIR, "label_encoder.joblib"))
-    
-    # Select Features (as per notebook)
-    features = [
-        "lh","estrogen","pdg",
-        "cramps","fatigue","moodswing",
-        "stress","bloating","sleepissue",
-        "overall_score","deep_sleep_in_minutes",
-        "avg_resting_heart_rate","stress_score","daily_steps",
-        "lh_prev1","lh_prev2","estrogen_prev1","pdg_prev1","stress_prev1"
-    ]
-    
-    X = df[features].astype(float)
-    y = df["phase_encoded"].astype(int)
-    
-    # Scalers
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    
-    # Save Scaler
-    joblib.dump(scaler, os.path.join(MODEL_DIR, "scaler.joblib"))
-    
-    # Train Model (BestParams roughly from notebook)
-    model = XGBClassifier(
-        n_estimators=300,
-        max_depth=6,
-        learning_rate=0.1,
-        subsample=0.8,
-        objective="multi:softmax",
-        num_class=len(le.classes_),
-        eval_metric="mlogloss",
-        random_state=42
+    y = le.fit_transform(df["phase_simple"]).astype(int)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    groups = df["id"].to_numpy()
+    print(f"Training on {len(X)} rows from {len(np.unique(groups))} participants "
+          f"({n_jobs} threads, {workers} worker processes)")
+
+    # Test participants are held out of everything that picks the model
+    dev_idx, test_idx = grouped_split(groups, TEST_FRACTION)
+    X_dev, y_dev, groups_dev = X[dev_idx], y[dev_idx], groups[dev_idx]
+
+    # Grouped K-fold hyperparameter search
+    stage = time.perf_counter()
+    if run_search:
+        keys = sorted(PARAM_GRID)
+        candidates = [dict(zip(keys, values)) for values in itertools.product(*(PARAM_GRID[k] for k in keys))]
+    else:
+        candidates = [DEFAULT_PARAMS]
+    cv_results = search(X_dev, y_dev, groups_dev, candidates, folds, workers, n_jobs)
+    best = max(cv_results, key=lambda r: r["mean_accuracy"])
+    timings["search_seconds"] = round(time.perf_counter() - stage, 3)
+
+    # Early stopping on held-out participants picks the tree count, then refit on everything
+    stage = time.perf_counter()
+    model, _ = fit_early_stopped(best["params"], X_dev, y_dev, groups_dev, n_jobs)
+    n_estimators = int(model.best_iteration) + 1
+    test_accuracy = float(accuracy_score(y[test_idx], model.predict(X[test_idx])))
+    model = XGBClassifier(**{**BASE_PARAMS, "n_estimators": n_estimators}, **best["params"], n_jobs=n_jobs)
+    model.fit(X, y)
+    timings["final_fit_seconds"] = round(time.perf_counter() - stage, 3)
+
+    # Passthrough scaler: keeps the artifact layout, transform is the identity
+    scaler = StandardScaler(with_mean=False, with_std=False).fit(X)
+
+    joblib.dump(le, os.path.join(out_dir, "label_encoder.joblib"))
+    joblib.dump(scaler, os.path.join(out_dir, "scaler.joblib"))
+    joblib.dump(model, os.path.join(out_dir, "model.joblib"))
+
+    # Native bundle: loads without unpickling and independent of sklearn versions.
+    # The joblib files stay alongside for ML_MODEL_FORMAT=joblib and older backends.
+    write_native_bundle(out_dir, model, scaler, le, FEATURES)
+
+    report = {
+        "version": version,
+        "data_path": data_path,
+        "missing_sources": missing_sources,
+        "rows": len(X),
+        "participants": int(len(np.unique(groups))),
+        "classes": [str(c) for c in le.classes_],
+        "n_jobs": n_jobs,
+        "workers": workers,
+        "folds": folds,
+        "base_params": BASE_PARAMS,
+        "best_params": best["params"],
+        "cv_accuracy": best["mean_accuracy"],
+        "cv_results": cv_results,
+        "test_participants": int(len(np.unique(groups[test_idx]))),
+        "test_accuracy": test_accuracy,
+        "n_estimators": n_estimators,
+        "inference": inference_latency(out_dir, X),
+        "timings": {**timings, "total_seconds": round(time.perf_counter() - started, 3)}
+    }
+    with open(os.path.join(out_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    publish(
+        version, out_dir,
+        ["model.joblib", "scaler.joblib", "label_encoder.joblib", NATIVE_MODEL_FILE, PREPROCESS_FILE, REPORT_FILE],
+        data_path, data_sha256,
+        native={"model": NATIVE_MODEL_FILE, "preprocess": PREPROCESS_FILE}
     )
-    
-    model.fit(X_scaled, y)
-    
-    # Save Model
-    joblib.dump(model, os.path.join(MODEL_DIR, "model.joblib"))
-    print("Model, Scaler, and LabelEncoder saved successfully in", MODEL_DIR)
+    print(f"Best params {best['params']}: CV accuracy {best['mean_accuracy']:.4f}, "
+          f"test {test_accuracy:.4f}, {n_estimators} trees")
+    print("Model, Scaler, and LabelEncoder saved successfully in", out_dir,
+          f"(version {version}, {report['timings']['total_seconds']:.1f}s)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DATA_PATH, help="final_dataset.csv or a feature_pipeline.py output directory")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="processes for the CV search (default: n-jobs)")
+    parser.add_argument("--n-jobs", type=int, default=None, help="total threads (default: all cores)")
+    parser.add_argument("--no-search", action="store_true", help=f"cross-validate only {DEFAULT_PARAMS}")
+    args = parser.parse_args()
+    train(args.data, args.folds, args.workers, args.n_jobs, not args.no_search)
+
 
 if __name__ == "__main__":
     # Ensure we are in the backend directory context
-    train()
+    main()
@@ -0,0 +1,11 @@
+"""
+Production entry point:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+run.py starts the Flask development server; this module only builds the
+app. With preload_app (gunicorn.conf.py) it is imported once in the
+gunicorn master, so the ML model bundle is loaded before the workers fork.
+"""
+from app import create_app
+
+app = create_app()